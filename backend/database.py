@@ -1,11 +1,90 @@
 import os
+import logging
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "auto_printer_db")
+# Finished print job records are removed by MongoDB after this many days
+PRINT_JOB_RETENTION_DAYS = int(os.getenv("PRINT_JOB_RETENTION_DAYS", "30"))
+STATS_ROLLUP_RETENTION_DAYS = int(os.getenv("STATS_ROLLUP_RETENTION_DAYS", "90"))
+DB_CHECK_QUERY_PLANS = os.getenv("DB_CHECK_QUERY_PLANS", "true").lower() == "true"
+
+# Indexes ensured on startup, per collection
+INDEXES = {
+    "documents": [
+        # Listings page newest first on (upload_time, _id), see services/documents.py
+        IndexModel([("user_id", ASCENDING), ("upload_time", DESCENDING), ("_id", DESCENDING)], name="user_id_upload_time"),
+        IndexModel([("machine_id", ASCENDING), ("upload_time", DESCENDING), ("_id", DESCENDING)], name="machine_id_upload_time"),
+        IndexModel([("upload_time", DESCENDING), ("_id", DESCENDING)], name="upload_time"),
+        # Status counts
+        IndexModel([("status", ASCENDING)], name="status"),
+        # Per-machine status lookups
+        IndexModel([("machine_id", ASCENDING), ("status", ASCENDING)], name="machine_id_status"),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email", unique=True),
+    ],
+    "print_jobs": [
+        # Workers claim the oldest runnable job; the scheduler counts open jobs
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+        # Round robin between kiosks: oldest queued job of one machine
+        IndexModel(
+            [("status", ASCENDING), ("machine_id", ASCENDING), ("created_at", ASCENDING)],
+            name="status_machine_id_created_at"
+        ),
+        IndexModel(
+            [("finished_at", ASCENDING)],
+            name="finished_at_ttl",
+            expireAfterSeconds=PRINT_JOB_RETENTION_DAYS * 24 * 3600
+        ),
+    ],
+    "upload_sessions": [
+        # Expired sessions are removed by the API, which also deletes their temp files
+        IndexModel([("expires_at", ASCENDING)], name="expires_at"),
+    ],
+    "blobs": [
+        # Garbage collection: unreferenced blobs past the grace period
+        IndexModel([("refcount", ASCENDING), ("last_used", ASCENDING)], name="refcount_last_used"),
+    ],
+    "stats_rollups": [
+        IndexModel([("bucket", ASCENDING), ("machine_id", ASCENDING)], name="bucket_machine_id", unique=True),
+        IndexModel(
+            [("bucket", ASCENDING)],
+            name="bucket_ttl",
+            expireAfterSeconds=STATS_ROLLUP_RETENTION_DAYS * 24 * 3600
+        ),
+    ],
+}
+
+# Hot queries that must be answered from an index: (collection, filter, sort)
+KEY_QUERIES = [
+    ("documents", {"user_id": ""}, [("upload_time", DESCENDING), ("_id", DESCENDING)]),
+    ("documents", {}, [("upload_time", DESCENDING), ("_id", DESCENDING)]),
+    ("documents", {"status": "completed"}, None),
+    ("documents", {"machine_id": "", "status": "queued"}, None),
+    ("users", {"email": ""}, None),
+    ("print_jobs", {"status": "queued"}, [("created_at", ASCENDING)]),
+]
+
+def _plan_stages(plan) -> set:
+    """Every stage name in an explain() plan tree."""
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            stages |= _plan_stages(value)
+    return stages
 
 class Database:
     client: AsyncIOMotorClient = None
@@ -15,6 +94,36 @@ class Database:
         self.client = AsyncIOMotorClient(MONGO_URL)
         self.db = self.client[DB_NAME]
         print(f"Connected to MongoDB: {DB_NAME}")
+        await self.ensure_indexes()
+        if DB_CHECK_QUERY_PLANS:
+            await self.check_query_plans()
+
+    async def ensure_indexes(self):
+        # Existing indexes are left alone, so this is cheap after the first start.
+        # A failure (e.g. duplicate emails blocking the unique index) is logged
+        # rather than stopping the API.
+        for collection, indexes in INDEXES.items():
+            try:
+                await self.db[collection].create_indexes(indexes)
+            except PyMongoError as e:
+                logger.error(f"Could not create indexes on {collection}: {e}")
+
+    async def check_query_plans(self) -> list:
+        """Log and return the key queries whose winning plan is a collection scan."""
+        scans = []
+        for collection, query, sort in KEY_QUERIES:
+            cursor = self.db[collection].find(query).limit(1)
+            if sort:
+                cursor = cursor.sort(sort)
+            try:
+                plan = (await cursor.explain()).get("queryPlanner", {})
+            except PyMongoError as e:
+                logger.warning(f"Could not explain query on {collection}: {e}")
+                continue
+            if "COLLSCAN" in _plan_stages(plan.get("winningPlan")):
+                logger.warning(f"Query on {collection} {query} sort={sort} uses a collection scan")
+                scans.append((collection, query, sort))
+        return scans
 
     async def close(self):
         if self.client:
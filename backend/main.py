@@ -1,8 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
+from services.rate_limit import limiter
 
 app = FastAPI(
     title="Automatic Document Printing Machine API",
@@ -10,11 +11,21 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Rate Limiting
-limiter = Limiter(key_func=get_remote_address)
+# Rate Limiting (policies and storage in services/rate_limit.py)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Login storms are shed by the password hasher rather than queued without bound
+from services.passwords import PasswordHasherBusy, password_hasher
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # CORS
 origins = [
     "http://localhost:5173",  # Vite default
@@ -33,9 +44,10 @@ app.add_middleware(
 async def root():
     return {"message": "Automatic Document Printing Machine API is running"}
 
-from routers import upload, print as print_router, status, websocket, admin, user, machine
+from routers import upload, upload_sessions, print as print_router, status, websocket, admin, user, machine
 
 app.include_router(upload.router)
+app.include_router(upload_sessions.router)
 app.include_router(print_router.router)
 app.include_router(status.router)
 app.include_router(websocket.router)
@@ -44,13 +56,32 @@ app.include_router(user.router)
 app.include_router(machine.router)
 
 from database import db
+from services.print_queue import print_queue
+from services.printer import printer_service
+from services.conversion_engine import conversion_engine
+from services.blob_store import blob_store
+from services.event_bus import event_bus
+from services.stats import stats_counters
+from services.upload_sessions import session_sweeper
 
 @app.on_event("startup")
 async def startup_db_client():
     await db.connect()
+    await stats_counters.ensure_counters(db.db)
+    await event_bus.start(db.db)
+    await print_queue.start(db.db)
+    await blob_store.start(db.db)
+    await session_sweeper.start(db.db)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await print_queue.stop()
+    await blob_store.stop()
+    await session_sweeper.stop()
+    await event_bus.stop()
+    printer_service.shutdown()
+    password_hasher.shutdown()
+    conversion_engine.shutdown()
     await db.close()
 
 if __name__ == "__main__":
@@ -1,7 +1,8 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_validator
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
+from services.page_ranges import parse_page_range
 
 class PrintStatus(str, Enum):
     UPLOADED = "uploaded"
@@ -20,6 +21,17 @@ class PrintOptions(BaseModel):
     color_mode: ColorMode = ColorMode.BW
     page_range: Optional[str] = None  # e.g., "1-5, 8"
 
+class PrintOptionsInput(PrintOptions):
+    """Print options sent by a client; stored documents are not re-validated."""
+
+    @field_validator("page_range")
+    @classmethod
+    def validate_page_range(cls, value):
+        if value is None or not value.strip():
+            return None
+        parse_page_range(value)
+        return value
+
 class DocumentBase(BaseModel):
     filename: str
     original_filename: str
@@ -29,9 +41,13 @@ class DocumentBase(BaseModel):
     status: PrintStatus = PrintStatus.UPLOADED
     print_options: PrintOptions
     machine_id: Optional[str] = None
+    # Signed-in uploader (see routers/user.py get_optional_user); None for kiosk guests
+    user_id: Optional[str] = None
+    page_count: Optional[int] = None
 
 class DocumentCreate(DocumentBase):
     file_path: str
+    blob_id: Optional[str] = None  # SHA-256 of the stored file, see services/blob_store.py
 
 class Document(DocumentBase):
     id: str = Field(..., alias="_id")
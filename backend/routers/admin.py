@@ -1,27 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-import bcrypt
 from database import get_database
+from services.passwords import verify_password, password_hasher
 from models import AdminUser, PrintStatus
-import os
+from services.printer import printer_service
+from services.conversion_cache import conversion_cache
+from services.document_cache import document_cache
+from services.auth import auth_cache, SECRET_KEY, ALGORITHM
+from services.stats import stats_counters
+from services.rate_limit import limiter, ip_limit, address_key, LOGIN_RATE_LIMIT
+from services.analytics import analytics
+from services.documents import document_filter, list_documents, list_fields, MAX_PAGE_SIZE, delete_document, DocumentInUse
+from bson.errors import InvalidId
+from typing import Optional
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 # Security Config
-SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="admin/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-
-def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -45,7 +46,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = auth_cache.decode(token, SECRET_KEY, ALGORITHM)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -57,9 +58,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     return username
 
 @router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+@limiter.limit(LOGIN_RATE_LIMIT, key_func=address_key)
+@ip_limit
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     user_password_hash = MOCK_ADMIN_DB.get(form_data.username)
-    if not user_password_hash or not verify_password(form_data.password, user_password_hash):
+    if not user_password_hash or not await verify_password(form_data.password, user_password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -73,21 +76,75 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
 @router.get("/stats")
 async def get_stats(current_user: str = Depends(get_current_user), db = Depends(get_database)):
-    total_docs = await db["documents"].count_documents({})
-    completed_docs = await db["documents"].count_documents({"status": PrintStatus.COMPLETED})
-    failed_docs = await db["documents"].count_documents({"status": PrintStatus.FAILED})
+    # Counters are maintained on every status transition (services/stats.py)
+    counters = await stats_counters.get_stats(db)
     
-    # Get recent documents
-    cursor = db["documents"].find().sort("upload_time", -1).limit(10)
-    recent_docs = await cursor.to_list(length=10)
-    
-    # Convert ObjectId to str for JSON response
-    for doc in recent_docs:
-        doc["_id"] = str(doc["_id"])
+    # Get recent documents (listing fields only, see GET /admin/documents for more)
+    recent_docs, _ = await list_documents(db, {}, limit=10)
 
     return {
-        "total_documents": total_docs,
-        "completed_prints": completed_docs,
-        "failed_prints": failed_docs,
-        "recent_documents": recent_docs
+        "total_documents": counters["global"]["documents"],
+        "completed_prints": counters["global"]["status"][PrintStatus.COMPLETED.value],
+        "failed_prints": counters["global"]["status"][PrintStatus.FAILED.value],
+        "pages_printed": counters["global"]["pages"],
+        "copies_printed": counters["global"]["copies"],
+        "status_counts": counters["global"]["status"],
+        "today": counters["today"],
+        "machines": counters["machines"],
+        # Counter updates that failed since startup; non-zero means the counters drifted
+        "stats_write_failures": counters["write_failures"],
+        "recent_documents": recent_docs,
+        "spooler": printer_service.get_metrics(),
+        "conversion_cache": conversion_cache.get_stats(),
+        "document_cache": document_cache.get_stats(),
+        "auth_cache": auth_cache.get_stats(),
+        "password_hasher": password_hasher.get_metrics()
     }
+
+@router.get("/documents")
+async def get_documents(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status_filter: Optional[PrintStatus] = Query(None, alias="status"),
+    machine_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    current_user: str = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """Every document, newest first, a page at a time (keyset pagination via next_cursor)."""
+    query = document_filter(user_id, status_filter, machine_id, since, until)
+    try:
+        documents, next_cursor = await list_documents(db, query, limit, cursor, list_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"documents": documents, "next_cursor": next_cursor}
+
+@router.delete("/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_document(document_id: str, current_user: str = Depends(get_current_user), db = Depends(get_database)):
+    """Delete a document that is not queued or printing; its file goes once no other document shares it."""
+    try:
+        deleted = await delete_document(db, document_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid Document ID")
+    except DocumentInUse as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+@router.get("/analytics")
+async def get_analytics(
+    window_minutes: int = Query(60, ge=1, le=7 * 24 * 60),
+    interval_seconds: int = Query(300, ge=60, le=24 * 3600),
+    machine_id: str = None,
+    current_user: str = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """
+    Throughput and latency over the last `window_minutes`, in steps of
+    `interval_seconds`: uploads per minute, queue wait, print duration and
+    failure rate, overall and per machine.
+    """
+    return await analytics.get(db, window_minutes, interval_seconds, machine_id)
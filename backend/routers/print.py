@@ -1,60 +1,154 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+import os
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional
 from database import get_database
-from models import PrintStatus
-from services.printer import printer_service
+from models import PrintStatus, PrintOptionsInput, ColorMode
+from services.print_queue import print_queue
+from services.scheduler import PrinterBusyError
+from services.status_machine import InvalidTransition, sources_for
+from services.admission import admission_controller, AdmissionRejected
+from services.rate_limit import limiter, ip_limit, PRINT_RATE_LIMIT
+from services.documents import find_document, find_documents
+from services.page_ranges import parse_page_range
 from bson import ObjectId
-from datetime import datetime
+from bson.errors import InvalidId
 
 router = APIRouter()
 
+PRINT_BATCH_MAX_ITEMS = int(os.getenv("PRINT_BATCH_MAX_ITEMS", "100"))
+
 class PrintRequest(BaseModel):
     document_id: str
 
-@router.post("/print")
-async def trigger_print(request: PrintRequest, db = Depends(get_database)):
+class BatchPrintItem(BaseModel):
+    document_id: str
+    # Override the options chosen at upload
+    copies: Optional[int] = None
+    color_mode: Optional[ColorMode] = None
+    page_range: Optional[str] = None
+
+class BatchPrintRequest(BaseModel):
+    items: List[BatchPrintItem] = Field(..., min_length=1, max_length=PRINT_BATCH_MAX_ITEMS)
+
+@router.post("/print", status_code=status.HTTP_202_ACCEPTED)
+@limiter.limit(PRINT_RATE_LIMIT)
+@ip_limit
+async def trigger_print(request: Request, print_request: PrintRequest, db = Depends(get_database)):
     # 1. Get Document
     try:
-        doc = await db["documents"].find_one({"_id": ObjectId(request.document_id)})
-    except:
+        doc = await find_document(db, print_request.document_id)
+    except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid Document ID")
-        
+
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # 2. Update Status to QUEUED
-    await db["documents"].update_one(
-        {"_id": doc["_id"]},
-        {"$set": {"status": PrintStatus.QUEUED}}
-    )
-
-    # 3. Trigger Print (Async)
-    # In a real app, we might use BackgroundTasks or a Celery queue.
-    # For this demo, we await it (blocking the request slightly) or just fire and forget?
-    # Let's await it to report immediate errors, but ideally it should be background.
-    
+    # 2. Enqueue the job, if the kiosk and user are within their page quotas.
+    # Workers in services/print_queue.py drive it through
+    # PRINTING -> COMPLETED/FAILED, so the request returns immediately.
     try:
-        await db["documents"].update_one(
-            {"_id": doc["_id"]},
-            {"$set": {"status": PrintStatus.PRINTING}}
+        async with admission_controller.admit(db, doc):
+            job_id = await print_queue.enqueue(doc)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
-        
-        # Use options from document
-        copies = doc["print_options"]["copies"]
-        
-        await printer_service.print_file(doc["file_path"], copies=copies)
-        
-        # 4. Update Status to COMPLETED
-        await db["documents"].update_one(
-            {"_id": doc["_id"]},
-            {"$set": {"status": PrintStatus.COMPLETED}}
+    except PrinterBusyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
-        
-        return {"message": "Print job completed successfully", "status": "completed"}
-        
-    except Exception as e:
-        await db["documents"].update_one(
-            {"_id": doc["_id"]},
-            {"$set": {"status": PrintStatus.FAILED, "error_message": str(e)}}
+    except InvalidTransition as e:
+        # Already queued or printing (e.g. a concurrent /print for the same document)
+        if e.current is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return {"message": "Print job queued", "status": PrintStatus.QUEUED, "job_id": job_id}
+
+def _item_error(result: dict, status_code: int, detail: str):
+    result.update({"status": "rejected", "status_code": status_code, "error": detail})
+
+@router.post("/print/batch", status_code=status.HTTP_202_ACCEPTED)
+@limiter.limit(PRINT_RATE_LIMIT)
+@ip_limit
+async def trigger_print_batch(request: Request, batch: BatchPrintRequest, db = Depends(get_database)):
+    """
+    Queue several documents in one request, each with optional print option
+    overrides. All items are validated first, loading every document with a
+    single $in query; if any item is invalid nothing is queued and the 422
+    response carries the per-item results. Admission and printer capacity
+    are checked for the batch as a whole (429 / 503).
+    """
+    # 1. Validate every item before queueing anything
+    records = await find_documents(db, [item.document_id for item in batch.items])
+    queueable = sources_for(PrintStatus.QUEUED)
+    results, ready, seen = [], [], set()
+    for item in batch.items:
+        result = {"document_id": item.document_id}
+        results.append(result)
+        doc = records.get(item.document_id)
+        if item.document_id in seen:
+            _item_error(result, 422, "Document appears more than once in the batch")
+        elif not ObjectId.is_valid(item.document_id):
+            _item_error(result, 400, "Invalid Document ID")
+        elif doc is None:
+            _item_error(result, 404, "Document not found")
+        elif PrintStatus(doc["status"]) not in queueable:
+            _item_error(result, 409, f"Document is already {PrintStatus(doc['status']).value}")
+        else:
+            overrides = item.dict(exclude={"document_id"}, exclude_none=True)
+            try:
+                options = PrintOptionsInput(**{**doc["print_options"], **overrides})
+                if options.page_range and doc.get("page_count"):
+                    parse_page_range(options.page_range, doc["page_count"])
+            except ValidationError as e:
+                _item_error(result, 422, "; ".join(error["msg"] for error in e.errors()))
+            except ValueError as e:
+                _item_error(result, 422, f"{e} (document has {doc['page_count']} pages)")
+            else:
+                result["status"] = "valid"
+                ready.append((result, {**doc, "print_options": options.dict()}))
+        seen.add(item.document_id)
+
+    if len(ready) < len(results):
+        raise HTTPException(
+            status_code=422,
+            detail={"message": "Batch rejected, nothing was queued", "results": results}
+        )
+
+    # 2. Admit and enqueue the whole batch
+    docs = [doc for _, doc in ready]
+    try:
+        async with admission_controller.admit(db, *docs):
+            outcomes = await print_queue.enqueue_many(docs)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
-        raise HTTPException(status_code=500, detail=f"Printing failed: {str(e)}")
+    except PrinterBusyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    # A document can still be taken by a concurrent /print between validation
+    # and queueing; those items are reported individually
+    queued = 0
+    for (result, _), outcome in zip(ready, outcomes):
+        if isinstance(outcome, InvalidTransition):
+            _item_error(result, 409, str(outcome))
+        elif isinstance(outcome, Exception):
+            _item_error(result, 500, str(outcome))
+        else:
+            result.update({"status": PrintStatus.QUEUED, "job_id": outcome})
+            queued += 1
+
+    return {"message": f"{queued} of {len(results)} print jobs queued", "queued": queued, "results": results}
@@ -1,21 +1,75 @@
-from fastapi import APIRouter, HTTPException, Depends
+import json
+import asyncio
+import hashlib
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query
 from database import get_database
-from bson import ObjectId
+from bson.errors import InvalidId
 from models import Document
+from services.status_versions import status_versions
+from services.documents import find_document
+from services.document_cache import document_cache
 
 router = APIRouter()
 
-@router.get("/status/{document_id}", response_model=Document)
-async def get_status(document_id: str, db = Depends(get_database)):
+MAX_STATUS_WAIT_SECONDS = 30
+
+def _etag(doc: dict) -> str:
+    return '"' + hashlib.sha1(json.dumps(doc, default=str, sort_keys=True).encode()).hexdigest()[:20] + '"'
+
+async def _load_document(db, document_id: str) -> tuple:
+    """The document and its ETag."""
+    generation = document_cache.generation()
     try:
-        doc = await db["documents"].find_one({"_id": ObjectId(document_id)})
-    except:
+        doc = await find_document(db, document_id)
+    except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid Document ID")
-        
+
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
-    
+
     # Convert ObjectId to string for serialization
     doc["_id"] = str(doc["_id"])
-        
+    etag = _etag(doc)
+    status_versions.set_etag(doc["_id"], etag, generation)
+    return doc, etag
+
+@router.get("/status/{document_id}", response_model=Document)
+async def get_status(
+    document_id: str,
+    request: Request,
+    response: Response,
+    wait: float = Query(0, ge=0, le=MAX_STATUS_WAIT_SECONDS),
+    db = Depends(get_database)
+):
+    """
+    Supports If-None-Match: returns 304 while the document is unchanged,
+    answered from the in-memory ETag map without touching MongoDB.
+    With ?wait=N the request is parked for up to N seconds until the
+    document changes (long-poll).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    # Register before checking so a change in between is not missed
+    changed = status_versions.watch(document_id)
+    try:
+        doc = None
+        etag = status_versions.get_etag(document_id)
+        if etag is None:
+            doc, etag = await _load_document(db, document_id)
+
+        if if_none_match == etag and wait:
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=wait)
+                doc, etag = await _load_document(db, document_id)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        status_versions.release(document_id, changed)
+
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if doc is None:
+        doc, etag = await _load_document(db, document_id)
+
+    response.headers["ETag"] = etag
     return Document(**doc)
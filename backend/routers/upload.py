@@ -1,22 +1,31 @@
 import os
 import shutil
 import uuid
+import asyncio
 import aiofiles
-import magic
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Depends
 from fastapi.responses import JSONResponse
 from datetime import datetime
-from typing import List
-from models import Document, DocumentCreate, PrintStatus, PrintOptions, ColorMode
+from typing import List, Optional
+from pydantic import ValidationError
+from models import Document, DocumentCreate, PrintStatus, PrintOptions, PrintOptionsInput, ColorMode
 from database import get_database
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from services.converter import converter_service
+from services.rate_limit import limiter, ip_limit, UPLOAD_RATE_LIMIT, MERGE_RATE_LIMIT
+from services.converter import converter_service, ConversionError
+from services.conversion_engine import CONVERSION_WORKERS
+from services.blob_store import blob_store
+from services.conversion_cache import hash_file
+from services.streaming_upload import receive_upload, UploadError
+from services.pages import count_pages
+from services.page_ranges import parse_page_range
+from services.documents import create_document
+from routers.user import get_optional_user
 
 router = APIRouter()
 
 UPLOAD_DIR = "uploads"
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+MERGE_CONVERSION_CONCURRENCY = int(os.getenv("MERGE_CONVERSION_CONCURRENCY", str(CONVERSION_WORKERS)))
 ALLOWED_MIME_TYPES = [
     "application/pdf",
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document", # .docx
@@ -28,72 +37,103 @@ ALLOWED_MIME_TYPES = [
 # Ensure upload directory exists
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-@router.post("/upload", response_model=Document)
-@Limiter(key_func=get_remote_address).limit("5/minute")
+async def count_and_check_pages(file_path: str, mime_type: str, page_range: str = None):
+    """
+    Count the pages of an upload and make sure the requested page range
+    selects at least one of them. Returns the page count (None if unknown).
+    """
+    page_count = await count_pages(file_path, mime_type)
+    if page_range and page_count:
+        try:
+            parse_page_range(page_range, page_count)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"{e} (document has {page_count} pages)")
+    return page_count
+
+# /upload reads the multipart body itself (see services/streaming_upload.py), so
+# describe it for the OpenAPI docs explicitly
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+@router.post("/upload", response_model=Document, openapi_extra=UPLOAD_REQUEST_BODY)
+@limiter.limit(UPLOAD_RATE_LIMIT)
+@ip_limit
 async def upload_file(
     request: Request,
-    file: UploadFile = File(...),
     copies: int = 1,
     color_mode: ColorMode = ColorMode.BW,
     page_range: str = None,
     machine_id: str = None,
+    current_user: Optional[dict] = Depends(get_optional_user),
     db = Depends(get_database)
 ):
-    # 1. Validate File Size
-    file.file.seek(0, 2)
-    file_size = file.file.tell()
-    file.file.seek(0)
-    
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail="File too large (max 10MB)")
-
-    # 2. Validate File Type (Magic Number)
-    # Read first 2KB for magic number check
-    header = file.file.read(2048)
-    file.file.seek(0)
-    mime_type = magic.from_buffer(header, mime=True)
-    
-    if mime_type not in ALLOWED_MIME_TYPES:
-        raise HTTPException(status_code=400, detail=f"Invalid file type: {mime_type}. Only PDF, DOCX, JPG allowed.")
+    # 1. Stream the body straight into the blob store in one pass: the type is
+    # sniffed from the first bytes, the size limit is enforced as bytes arrive
+    # and the content hash is computed on the way through
+    try:
+        upload = await receive_upload(request, blob_store.new_temp_path(), MAX_FILE_SIZE, ALLOWED_MIME_TYPES)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-    # 3. Secure Filename & Save
-    file_ext = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
+    # 2. Print options may also be sent as form fields (the web frontend does this)
+    try:
+        print_options = PrintOptionsInput(
+            copies=upload.fields.get("copies", copies),
+            color_mode=upload.fields.get("color_mode", color_mode),
+            page_range=upload.fields.get("page_range", page_range)
+        )
+        page_count = await count_and_check_pages(upload.path, upload.mime_type, print_options.page_range)
+    except ValidationError as e:
+        os.remove(upload.path)
+        raise HTTPException(status_code=422, detail=e.errors(include_context=False))
+    except HTTPException:
+        os.remove(upload.path)
+        raise
+    machine_id = upload.fields.get("machine_id", machine_id)
 
-    async with aiofiles.open(file_path, 'wb') as out_file:
-        while content := await file.read(1024 * 1024):  # Read in chunks
-            await out_file.write(content)
+    # 3. Move into the content-addressed blob store
+    file_ext = os.path.splitext(upload.filename)[1]
+    file_path = await blob_store.commit(db, upload.path, upload.sha256, file_ext, upload.size)
+    unique_filename = os.path.basename(file_path)
 
     # 4. Create DB Record
     doc_data = DocumentCreate(
         filename=unique_filename,
-        original_filename=file.filename,
-        file_size=file_size,
-        file_type=mime_type,
+        original_filename=upload.filename,
+        file_size=upload.size,
+        file_type=upload.mime_type,
         file_path=file_path,
-        print_options=PrintOptions(
-            copies=copies,
-            color_mode=color_mode,
-            page_range=page_range
-        ),
-        machine_id=machine_id
+        blob_id=upload.sha256,
+        print_options=print_options,
+        machine_id=machine_id,
+        user_id=current_user["_id"] if current_user else None,
+        page_count=page_count
     )
     
-    new_doc = await db["documents"].insert_one(doc_data.dict(by_alias=True))
-    created_doc = await db["documents"].find_one({"_id": new_doc.inserted_id})
-    
-    # Convert ObjectId to string for serialization
-    created_doc["_id"] = str(created_doc["_id"])
-    
-    return Document(**created_doc)
+    return await create_document(db, doc_data)
 
 @router.post("/merge-and-upload", response_model=Document)
+@limiter.limit(MERGE_RATE_LIMIT)
+@ip_limit
 async def merge_and_upload(
+    request: Request,
     files: List[UploadFile] = File(...),
     copies: int = 1,
     color_mode: ColorMode = ColorMode.BW,
     machine_id: str = None,
+    current_user: Optional[dict] = Depends(get_optional_user),
     db = Depends(get_database)
 ):
     """
@@ -102,66 +142,80 @@ async def merge_and_upload(
     if len(files) < 2:
         raise HTTPException(status_code=400, detail="At least 2 files required for merging")
     
+    # Validate all sizes up front so nothing is written for a request that will be rejected
+    for file in files:
+        file.file.seek(0, 2)
+        file_size = file.file.tell()
+        file.file.seek(0)
+        
+        if file_size > MAX_FILE_SIZE:
+            raise HTTPException(status_code=413, detail=f"File {file.filename} too large (max 10MB)")
+    
     converted_pdfs = []
     temp_files = []
+    merged_path = None
+    semaphore = asyncio.Semaphore(MERGE_CONVERSION_CONCURRENCY)
     
-    try:
-        # Step 1: Upload and convert each file to PDF
-        for file in files:
-            # Validate file size
-            file.file.seek(0, 2)
-            file_size = file.file.tell()
-            file.file.seek(0)
-            
-            if file_size > MAX_FILE_SIZE:
-                raise HTTPException(status_code=413, detail=f"File {file.filename} too large (max 10MB)")
-            
+    async def save_and_convert(file: UploadFile) -> str:
+        async with semaphore:
             # Save temporary file
             file_ext = os.path.splitext(file.filename)[1]
             temp_filename = f"{uuid.uuid4()}{file_ext}"
             temp_path = os.path.join(UPLOAD_DIR, temp_filename)
+            temp_files.append(temp_path)
             
             async with aiofiles.open(temp_path, 'wb') as out_file:
                 while content := await file.read(1024 * 1024):
                     await out_file.write(content)
             
-            temp_files.append(temp_path)
-            
             # Convert to PDF
             pdf_path = await converter_service.convert_to_pdf(temp_path)
             converted_pdfs.append(pdf_path)
+            return pdf_path
+    
+    try:
+        # Step 1: Save and convert all files concurrently; gather keeps the upload order
+        results = await asyncio.gather(*(save_and_convert(file) for file in files), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        ordered_pdfs = list(results)
         
         # Step 2: Merge all PDFs
-        merged_filename = f"{uuid.uuid4()}_merged.pdf"
-        merged_path = os.path.join(UPLOAD_DIR, merged_filename)
+        merged_path = blob_store.new_temp_path(".pdf")
         
-        await converter_service.merge_pdfs(converted_pdfs, merged_path)
+        await converter_service.merge_pdfs(ordered_pdfs, merged_path)
         
-        # Step 3: Get merged file size
+        # Step 3: Get merged file size and page count
         merged_size = os.path.getsize(merged_path)
+        page_count = await count_pages(merged_path, "application/pdf")
+        
+        # Step 4: Move into the blob store, so merging the same files again shares one copy
+        loop = asyncio.get_running_loop()
+        blob_id = await loop.run_in_executor(None, hash_file, merged_path)
+        file_path = await blob_store.commit(db, merged_path, blob_id, ".pdf", merged_size)
         
-        # Step 4: Create DB record
+        # Step 5: Create DB record
         doc_data = DocumentCreate(
-            filename=merged_filename,
+            filename=os.path.basename(file_path),
             original_filename=f"merged_{len(files)}_files.pdf",
             file_size=merged_size,
             file_type="application/pdf",
-            file_path=merged_path,
+            file_path=file_path,
+            blob_id=blob_id,
             print_options=PrintOptions(
                 copies=copies,
                 color_mode=color_mode
             ),
-            machine_id=machine_id
+            machine_id=machine_id,
+            user_id=current_user["_id"] if current_user else None,
+            page_count=page_count
         )
         
-        new_doc = await db["documents"].insert_one(doc_data.dict(by_alias=True))
-        created_doc = await db["documents"].find_one({"_id": new_doc.inserted_id})
-        
-        # Convert ObjectId to string
-        created_doc["_id"] = str(created_doc["_id"])
-        
-        return Document(**created_doc)
+        return await create_document(db, doc_data)
         
+    except ConversionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         # Clean up on error
         for temp_file in temp_files:
@@ -170,12 +224,11 @@ async def merge_and_upload(
         raise HTTPException(status_code=500, detail=f"Merge failed: {str(e)}")
     
     finally:
-        # Clean up temporary converted PDFs (keep only merged file)
-        for pdf_path in converted_pdfs:
-            if pdf_path != merged_path and os.path.exists(pdf_path):
+        # Clean up uploaded parts, temporary converted PDFs and the merged file
+        # if it never made it into the blob store
+        for pdf_path in temp_files + converted_pdfs + [merged_path]:
+            if pdf_path and os.path.exists(pdf_path):
                 try:
                     os.remove(pdf_path)
                 except:
                     pass
-    
-    return Document(**created_doc)
@@ -0,0 +1,193 @@
+import os
+import uuid
+import asyncio
+import aiofiles
+import magic
+from fastapi import APIRouter, HTTPException, Request, Depends, status
+from pydantic import BaseModel, Field, ValidationError
+from datetime import datetime, timedelta
+from typing import Optional
+from models import Document, DocumentCreate, PrintOptions, PrintOptionsInput, ColorMode
+from database import get_database
+from services.blob_store import blob_store
+from services.conversion_cache import hash_file
+from services.streaming_upload import SNIFF_BYTES
+from services.upload_sessions import SESSION_DIR, UPLOAD_SESSION_TTL_HOURS, remove_temp_file
+from services.rate_limit import limiter, ip_limit, UPLOAD_RATE_LIMIT, UPLOAD_CHUNK_RATE_LIMIT
+from routers.upload import ALLOWED_MIME_TYPES, count_and_check_pages
+from services.documents import create_document
+from routers.user import get_optional_user
+
+# Resumable uploads: init -> PUT chunks at offsets -> finalize.
+# Chunks are written directly into place, so a dropped connection only
+# costs the chunk in flight; clients resume from the offset GET reports.
+
+router = APIRouter(prefix="/upload/sessions", tags=["upload"])
+
+RESUMABLE_MAX_FILE_SIZE = int(os.getenv("RESUMABLE_MAX_FILE_SIZE_MB", "100")) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Suggested chunk size for clients
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    file_size: int = Field(..., gt=0)
+    copies: int = Field(1, ge=1, le=100)
+    color_mode: ColorMode = ColorMode.BW
+    page_range: Optional[str] = None
+    machine_id: Optional[str] = None
+
+async def _get_session(db, session_id: str) -> dict:
+    session = await db["upload_sessions"].find_one({"_id": session_id})
+    if not session or session["expires_at"] < datetime.utcnow():
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    return session
+
+# Expired sessions are removed by services/upload_sessions.py on a schedule
+
+@router.post("", status_code=status.HTTP_201_CREATED)
+@limiter.limit(UPLOAD_RATE_LIMIT)
+@ip_limit
+async def create_upload_session(
+    request: Request,
+    session_request: UploadSessionCreate,
+    current_user: Optional[dict] = Depends(get_optional_user),
+    db = Depends(get_database)
+):
+    if session_request.file_size > RESUMABLE_MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large (max {RESUMABLE_MAX_FILE_SIZE // (1024 * 1024)}MB)"
+        )
+
+    try:
+        print_options = PrintOptionsInput(
+            copies=session_request.copies,
+            color_mode=session_request.color_mode,
+            page_range=session_request.page_range
+        )
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_context=False))
+
+    session_id = uuid.uuid4().hex
+    temp_path = os.path.join(SESSION_DIR, f"{session_id}.part")
+    async with aiofiles.open(temp_path, 'wb'):
+        pass
+
+    now = datetime.utcnow()
+    await db["upload_sessions"].insert_one({
+        "_id": session_id,
+        "filename": session_request.filename,
+        "file_size": session_request.file_size,
+        "received": 0,
+        "mime_type": None,
+        "temp_path": temp_path,
+        "print_options": print_options.dict(),
+        "machine_id": session_request.machine_id,
+        "user_id": current_user["_id"] if current_user else None,
+        "created_at": now,
+        "expires_at": now + timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+    })
+
+    return {"session_id": session_id, "received": 0, "chunk_size": UPLOAD_CHUNK_SIZE}
+
+@router.get("/{session_id}")
+async def get_upload_session(session_id: str, db = Depends(get_database)):
+    session = await _get_session(db, session_id)
+    return {
+        "session_id": session_id,
+        "file_size": session["file_size"],
+        "received": session["received"],
+        "expires_at": session["expires_at"]
+    }
+
+@router.put("/{session_id}")
+@limiter.limit(UPLOAD_CHUNK_RATE_LIMIT)
+async def upload_chunk(session_id: str, offset: int, request: Request, db = Depends(get_database)):
+    """Write the raw request body at `offset`. Offsets must continue from `received`."""
+    session = await _get_session(db, session_id)
+
+    if offset != session["received"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Expected offset {session['received']}",
+            headers={"Upload-Offset": str(session["received"])}
+        )
+
+    written = 0
+    mime_type = session["mime_type"]
+    head = bytearray()
+
+    async with aiofiles.open(session["temp_path"], 'r+b') as out_file:
+        if mime_type is None and offset:
+            # Earlier chunks were too short to sniff; they start the head
+            head.extend(await out_file.read(offset))
+        await out_file.seek(offset)
+        async for chunk in request.stream():
+            written += len(chunk)
+            if offset + written > session["file_size"]:
+                raise HTTPException(status_code=413, detail="Chunk exceeds declared file size")
+
+            # Validate the magic number once SNIFF_BYTES (or the whole file) arrived
+            if mime_type is None:
+                head.extend(chunk)
+                if len(head) >= SNIFF_BYTES or offset + written == session["file_size"]:
+                    mime_type = magic.from_buffer(bytes(head[:SNIFF_BYTES]), mime=True)
+                    if mime_type not in ALLOWED_MIME_TYPES:
+                        raise HTTPException(status_code=400, detail=f"Invalid file type: {mime_type}. Only PDF, DOCX, JPG allowed.")
+
+            await out_file.write(chunk)
+
+    updated = await db["upload_sessions"].update_one(
+        {"_id": session_id, "received": offset},
+        {"$set": {"received": offset + written, "mime_type": mime_type}}
+    )
+    if updated.modified_count == 0 and written:
+        raise HTTPException(status_code=409, detail="Concurrent upload to the same offset")
+
+    return {"session_id": session_id, "received": offset + written}
+
+@router.post("/{session_id}/finalize", response_model=Document)
+@limiter.limit(UPLOAD_RATE_LIMIT)
+@ip_limit
+async def finalize_upload_session(request: Request, session_id: str, db = Depends(get_database)):
+    session = await _get_session(db, session_id)
+
+    if session["received"] != session["file_size"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload incomplete ({session['received']} of {session['file_size']} bytes)",
+            headers={"Upload-Offset": str(session["received"])}
+        )
+
+    page_count = await count_and_check_pages(
+        session["temp_path"], session["mime_type"], session["print_options"].get("page_range")
+    )
+
+    # Claim the session so a retried finalize cannot create a second document
+    claimed = await db["upload_sessions"].find_one_and_delete({"_id": session_id})
+    if not claimed:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+
+    # The session record is gone, so the sweeper no longer owns the file
+    try:
+        loop = asyncio.get_running_loop()
+        blob_id = await loop.run_in_executor(None, hash_file, session["temp_path"])
+        file_ext = os.path.splitext(session["filename"])[1]
+        file_path = await blob_store.commit(db, session["temp_path"], blob_id, file_ext, session["file_size"])
+
+        doc_data = DocumentCreate(
+            filename=os.path.basename(file_path),
+            original_filename=session["filename"],
+            file_size=session["file_size"],
+            file_type=session["mime_type"],
+            file_path=file_path,
+            blob_id=blob_id,
+            print_options=PrintOptions(**session["print_options"]),
+            machine_id=session["machine_id"],
+            user_id=session.get("user_id"),
+            page_count=page_count
+        )
+
+        return await create_document(db, doc_data)
+    finally:
+        # Moved into the blob store on success
+        remove_temp_file(session["temp_path"])
@@ -1,39 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-import bcrypt
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
 from database import get_database
+from services.passwords import verify_password, get_password_hash
+from models import PrintStatus
+from services.auth import auth_cache, SECRET_KEY, ALGORITHM
+from services.rate_limit import limiter, ip_limit, address_key, LOGIN_RATE_LIMIT
+from services.documents import document_filter, list_documents, list_fields, MAX_PAGE_SIZE
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-import os
 
 router = APIRouter(prefix="/user", tags=["user"])
 
 # Security Config
-SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours for users
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="user/login")
+# Uploads work without signing in
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="user/login", auto_error=False)
 
 class UserRegister(BaseModel):
     name: str
     email: EmailStr
     password: str
 
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
 class UserResponse(BaseModel):
     id: str
     name: str
     email: EmailStr
     created_at: datetime
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-
-def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -50,20 +54,44 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # Claims and profiles come from services/auth.py's short-lived cache, so
+    # most authenticated requests never touch MongoDB here
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = auth_cache.decode(token, SECRET_KEY, ALGORITHM)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+        user = await auth_cache.get_user(db, user_id)
+    except (JWTError, InvalidId):
         raise credentials_exception
     
-    from bson import ObjectId
-    user = await db["users"].find_one({"_id": ObjectId(user_id)})
-    if user is None:
+    # Logout and password changes bump token_version, revoking older tokens
+    if user is None or payload.get("ver", 0) != user.get("token_version", 0):
         raise credentials_exception
     
-    user["_id"] = str(user["_id"])
+    return user
+
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme), db = Depends(get_database)):
+    """The signed-in user, or None for requests without a token. Invalid tokens are still rejected."""
+    if token is None:
+        return None
+    return await get_current_user(token, db)
+
+def create_user_token(user: dict) -> str:
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    return create_access_token(
+        data={"sub": str(user["_id"]), "ver": user.get("token_version", 0)}, expires_delta=access_token_expires
+    )
+
+async def revoke_tokens(db, user_id: str, fields: dict = None):
+    """Invalidate every token issued to the user so far, optionally updating other fields too."""
+    update = {"$inc": {"token_version": 1}}
+    if fields:
+        update["$set"] = fields
+    user = await db["users"].find_one_and_update(
+        {"_id": ObjectId(user_id)}, update, return_document=ReturnDocument.AFTER
+    )
+    auth_cache.invalidate_user(user_id)
     return user
 
 @router.post("/register")
@@ -77,13 +105,14 @@ async def register(user_data: UserRegister, db = Depends(get_database)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     new_user = {
         "name": user_data.name,
         "email": user_data.email,
         "password_hash": hashed_password,
         "created_at": datetime.utcnow(),
-        "total_prints": 0
+        "total_prints": 0,
+        "token_version": 0
     }
     
     result = await db["users"].insert_one(new_user)
@@ -94,11 +123,13 @@ async def register(user_data: UserRegister, db = Depends(get_database)):
     }
 
 @router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_database)):
+@limiter.limit(LOGIN_RATE_LIMIT, key_func=address_key)
+@ip_limit
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_database)):
     # Find user by email (username field contains email)
     user = await db["users"].find_one({"email": form_data.username})
     
-    if not user or not verify_password(form_data.password, user["password_hash"]):
+    if not user or not await verify_password(form_data.password, user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -106,10 +137,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(g
         )
     
     # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user["_id"])}, expires_delta=access_token_expires
-    )
+    access_token = create_user_token(user)
     
     return {
         "access_token": access_token,
@@ -121,6 +149,37 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(g
         }
     }
 
+@router.post("/logout")
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    # Signs out every session of this user, since tokens are revoked by version
+    await revoke_tokens(db, current_user["_id"])
+    auth_cache.invalidate_token(token)
+    return {"message": "Logged out"}
+
+@router.post("/change-password")
+async def change_password(
+    request: PasswordChange,
+    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    user = await db["users"].find_one({"_id": ObjectId(current_user["_id"])}, {"password_hash": 1})
+    if not user or not await verify_password(request.current_password, user["password_hash"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect password"
+        )
+    
+    user = await revoke_tokens(db, current_user["_id"], {"password_hash": await get_password_hash(request.new_password)})
+    auth_cache.invalidate_token(token)
+    
+    # Other sessions are signed out; this one continues with a fresh token
+    return {"access_token": create_user_token(user), "token_type": "bearer"}
+
 @router.get("/me")
 async def get_user_profile(current_user: dict = Depends(get_current_user)):
     return {
@@ -132,16 +191,27 @@ async def get_user_profile(current_user: dict = Depends(get_current_user)):
     }
 
 @router.get("/my-documents")
-async def get_user_documents(current_user: dict = Depends(get_current_user), db = Depends(get_database)):
-    # Get documents uploaded by this user
-    cursor = db["documents"].find({"user_id": current_user["_id"]}).sort("upload_time", -1).limit(20)
-    documents = await cursor.to_list(length=20)
-    
-    # Convert ObjectId to string
-    for doc in documents:
-        doc["_id"] = str(doc["_id"])
+async def get_user_documents(
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status_filter: Optional[PrintStatus] = Query(None, alias="status"),
+    machine_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    # Get documents uploaded by this user, newest first. Pass next_cursor back
+    # as ?cursor= for the following page.
+    query = document_filter(current_user["_id"], status_filter, machine_id, since, until)
+    try:
+        documents, next_cursor = await list_documents(db, query, limit, cursor, list_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "total": len(documents),
-        "documents": documents
+        "documents": documents,
+        "next_cursor": next_cursor
     }
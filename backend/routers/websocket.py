@@ -1,38 +1,44 @@
+import json
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List
+from jose import JWTError
+from typing import Optional
+from services.auth import auth_cache, SECRET_KEY, ALGORITHM
+from services.status_hub import manager, status_topics
 
 router = APIRouter()
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
-
-manager = ConnectionManager()
+def _user_id_from_token(token: str) -> Optional[str]:
+    try:
+        return auth_cache.decode(token, SECRET_KEY, ALGORITHM).get("sub")
+    except JWTError:
+        return None
 
 @router.websocket("/ws/status")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    document_id: str = None,
+    machine_id: str = None,
+    token: str = None
+):
+    # Subscribe with ?document_id=...&machine_id=... or a user token; no filter
+    # receives every status update
+    user_id = _user_id_from_token(token) if token else None
+    subscriber = await manager.connect(websocket, status_topics(document_id, machine_id, user_id))
     try:
         while True:
-            # Keep connection alive or listen for client messages (if any)
+            # Clients may change subscriptions:
+            # {"action": "subscribe" | "unsubscribe", "document_id": ..., "machine_id": ...}
             data = await websocket.receive_text()
-            # Echo or process if needed
+            try:
+                request = json.loads(data)
+                topics = status_topics(request.get("document_id"), request.get("machine_id"))
+            except (ValueError, AttributeError):
+                continue
+            if request.get("action") == "subscribe":
+                manager.subscribe(subscriber, topics)
+            elif request.get("action") == "unsubscribe":
+                manager.unsubscribe(subscriber, topics)
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
-
-# Helper to be used by other modules to push updates
-async def push_status_update(document_id: str, status: str):
-    import json
-    message = json.dumps({"document_id": document_id, "status": status})
-    await manager.broadcast(message)
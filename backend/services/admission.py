@@ -0,0 +1,181 @@
+import os
+import logging
+from contextlib import asynccontextmanager
+from typing import Iterable, Optional
+from models import PrintStatus
+from services.stats import printed_pages
+from services.scheduler import JOB_UNKNOWN
+
+logger = logging.getLogger(__name__)
+
+# Unfinished (queued or printing) pages allowed per kiosk and per user. A single
+# job larger than this is still admitted when nothing else is in flight.
+ADMISSION_MACHINE_MAX_PAGES = int(os.getenv("ADMISSION_MACHINE_MAX_PAGES", "500"))
+ADMISSION_USER_MAX_PAGES = int(os.getenv("ADMISSION_USER_MAX_PAGES", "200"))
+# Unfinished pages across the fleet beyond which kiosks only get their fair share
+ADMISSION_CAPACITY_PAGES = int(os.getenv("ADMISSION_CAPACITY_PAGES", "1000"))
+# Rough printing speed, used to tell rejected clients when to retry
+ADMISSION_SECONDS_PER_PAGE = float(os.getenv("ADMISSION_SECONDS_PER_PAGE", "2"))
+ADMISSION_MIN_RETRY_AFTER = 5
+ADMISSION_MAX_RETRY_AFTER = 300
+
+def _parse_weights(value: str) -> dict:
+    """Parse "kiosk-1=3,kiosk-2=2" into {"kiosk-1": 3, "kiosk-2": 2}."""
+    weights = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() and weight.strip():
+            try:
+                weights[name.strip()] = max(1, int(weight))
+            except ValueError:
+                logger.warning(f"Ignoring invalid machine weight '{item}'")
+    return weights
+
+# Relative share of print capacity per kiosk; unlisted machines weigh 1
+MACHINE_WEIGHTS = _parse_weights(os.getenv("MACHINE_WEIGHTS", ""))
+
+def machine_weight(machine_id: Optional[str]) -> int:
+    return MACHINE_WEIGHTS.get(machine_id, 1)
+
+class AdmissionRejected(Exception):
+    """Raised when a print job would exceed a machine's or user's quota."""
+
+    def __init__(self, message: str, retry_after: int = ADMISSION_MIN_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _retry_after(excess_pages: int) -> int:
+    seconds = int(excess_pages * ADMISSION_SECONDS_PER_PAGE)
+    return max(ADMISSION_MIN_RETRY_AFTER, min(ADMISSION_MAX_RETRY_AFTER, seconds))
+
+class WeightedRoundRobin:
+    """
+    Picks the next machine to serve: machines take turns in a fixed order,
+    each getting as many consecutive turns as its weight.
+    """
+
+    _START = object()
+
+    def __init__(self):
+        self._last = self._START
+        self._credit = 0
+
+    @staticmethod
+    def _key(machine_id):
+        return (machine_id is None, str(machine_id))
+
+    def pick(self, candidates: Iterable[Optional[str]]) -> Optional[str]:
+        ordered = sorted(set(candidates), key=self._key)
+        if not ordered:
+            return None
+        if self._last in ordered and self._credit > 0:
+            self._credit -= 1
+            return self._last
+        # Next machine after the last one served, wrapping around
+        choice = ordered[0]
+        if self._last is not self._START:
+            last_key = self._key(self._last)
+            choice = next((m for m in ordered if self._key(m) > last_key), ordered[0])
+        self._last = choice
+        self._credit = machine_weight(choice) - 1
+        return choice
+
+class AdmissionController:
+    """
+    Admission control in front of the print queue. Unfinished pages per
+    machine and per user are read from `print_jobs` (so every API process
+    sees the same load) plus reservations for jobs being enqueued by this
+    process. A job is rejected when it would push its user or machine over
+    quota, or, once the fleet is above ADMISSION_CAPACITY_PAGES, its machine
+    over its weighted fair share of that capacity. Small jobs from lightly
+    loaded kiosks therefore still get in while a heavy kiosk is throttled.
+    """
+
+    def __init__(self):
+        self._reserved = {}  # ("machine" | "user", id) -> pages being enqueued
+
+    async def get_in_flight(self, db) -> dict:
+        """{"total": pages, "machines": {machine_id: pages}, "users": {user_id: pages}}"""
+        pipeline = [
+            # Parked jobs may still be printing
+            {"$match": {"status": {"$in": [PrintStatus.QUEUED, PrintStatus.PRINTING, JOB_UNKNOWN]}}},
+            {"$group": {
+                "_id": {"machine_id": "$machine_id", "user_id": "$user_id"},
+                "pages": {"$sum": "$pages"}
+            }}
+        ]
+        load = {"total": 0, "machines": {}, "users": {}}
+        async for row in db["print_jobs"].aggregate(pipeline):
+            machine_id, user_id = row["_id"].get("machine_id"), row["_id"].get("user_id")
+            load["total"] += row["pages"]
+            load["machines"][machine_id] = load["machines"].get(machine_id, 0) + row["pages"]
+            if user_id:
+                load["users"][user_id] = load["users"].get(user_id, 0) + row["pages"]
+
+        for (kind, key), pages in self._reserved.items():
+            if kind == "machine":
+                load["total"] += pages
+                load["machines"][key] = load["machines"].get(key, 0) + pages
+            else:
+                load["users"][key] = load["users"].get(key, 0) + pages
+        return load
+
+    def _check(self, load: dict, machine_id: Optional[str], user_id: Optional[str], pages: int):
+        if user_id:
+            user_pages = load["users"].get(user_id, 0)
+            if user_pages and user_pages + pages > ADMISSION_USER_MAX_PAGES:
+                raise AdmissionRejected(
+                    f"Too many pages in progress for this user ({user_pages})",
+                    _retry_after(user_pages + pages - ADMISSION_USER_MAX_PAGES)
+                )
+
+        machine_pages = load["machines"].get(machine_id, 0)
+        if machine_pages and machine_pages + pages > ADMISSION_MACHINE_MAX_PAGES:
+            raise AdmissionRejected(
+                f"Too many pages in progress for this machine ({machine_pages})",
+                _retry_after(machine_pages + pages - ADMISSION_MACHINE_MAX_PAGES)
+            )
+
+        if load["total"] + pages > ADMISSION_CAPACITY_PAGES:
+            active = {m for m, p in load["machines"].items() if p} | {machine_id}
+            share = ADMISSION_CAPACITY_PAGES * machine_weight(machine_id) / sum(machine_weight(m) for m in active)
+            if machine_pages and machine_pages + pages > share:
+                raise AdmissionRejected(
+                    "Printers are saturated, this machine is above its fair share",
+                    _retry_after(machine_pages + pages - share)
+                )
+
+    @asynccontextmanager
+    async def admit(self, db, *docs: dict):
+        """
+        Reserve the documents' pages while they are being enqueued. Several
+        documents are admitted together, each counted against the quotas
+        along with the ones before it.
+        Raises AdmissionRejected when any of them is over quota.
+        """
+        load = await self.get_in_flight(db)
+        reservations = {}
+        for doc in docs:
+            pages = printed_pages(doc)
+            machine_id, user_id = doc.get("machine_id"), doc.get("user_id")
+            self._check(load, machine_id, user_id, pages)
+
+            load["total"] += pages
+            load["machines"][machine_id] = load["machines"].get(machine_id, 0) + pages
+            reservations[("machine", machine_id)] = reservations.get(("machine", machine_id), 0) + pages
+            if user_id:
+                load["users"][user_id] = load["users"].get(user_id, 0) + pages
+                reservations[("user", user_id)] = reservations.get(("user", user_id), 0) + pages
+
+        for key, pages in reservations.items():
+            self._reserved[key] = self._reserved.get(key, 0) + pages
+        try:
+            yield
+        finally:
+            # Once enqueued the jobs are counted from print_jobs instead
+            for key, pages in reservations.items():
+                self._reserved[key] -= pages
+                if self._reserved[key] <= 0:
+                    del self._reserved[key]
+
+admission_controller = AdmissionController()
@@ -0,0 +1,103 @@
+import os
+import time
+import copy
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from services.stats import ROLLUPS, STATS_ROLLUP_BUCKET_SECONDS, EPOCH, bucket_start
+
+# How long a computed window is served from memory
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "30"))
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "256"))
+
+# Rollup counters summed per interval and per machine
+METRICS = [
+    "uploads", "queued", "started", "completed", "failed", "pages", "copies",
+    "queue_wait_seconds", "print_seconds", "print_count"
+]
+
+def _sums() -> dict:
+    return {metric: {"$sum": {"$ifNull": [f"${metric}", 0]}} for metric in METRICS}
+
+def _derive(row: dict, minutes: float) -> dict:
+    """Turn summed rollup counters into rates and averages."""
+    finished = row["completed"] + row["failed"]
+    return {
+        **{metric: row[metric] for metric in ("uploads", "queued", "started", "completed", "failed", "pages", "copies")},
+        "uploads_per_minute": row["uploads"] / minutes if minutes else 0.0,
+        "failure_rate": row["failed"] / finished if finished else 0.0,
+        "avg_queue_wait_seconds": row["queue_wait_seconds"] / row["started"] if row["started"] else None,
+        "avg_print_seconds": row["print_seconds"] / row["print_count"] if row["print_count"] else None
+    }
+
+class Analytics:
+    """
+    Throughput and latency trends computed with aggregation pipelines over
+    the `stats_rollups` buckets (see services/stats.py), never over raw
+    documents. Computed windows are cached in memory for
+    ANALYTICS_CACHE_TTL_SECONDS, so dashboards polling the same window share
+    one pipeline run.
+    """
+
+    def __init__(self):
+        self._cache = OrderedDict()  # (window, interval, machine_id) -> (result, stored_at)
+
+    async def get(self, db, window_minutes: int, interval_seconds: int, machine_id: str = None) -> dict:
+        # Intervals are whole rollup buckets
+        interval_seconds = max(STATS_ROLLUP_BUCKET_SECONDS, interval_seconds // STATS_ROLLUP_BUCKET_SECONDS * STATS_ROLLUP_BUCKET_SECONDS)
+        key = (window_minutes, interval_seconds, machine_id)
+        entry = self._cache.get(key)
+        if entry is not None and time.monotonic() - entry[1] <= ANALYTICS_CACHE_TTL_SECONDS:
+            self._cache.move_to_end(key)
+            return copy.deepcopy(entry[0])
+
+        result = await self._compute(db, window_minutes, interval_seconds, machine_id)
+        self._cache[key] = (result, time.monotonic())
+        self._cache.move_to_end(key)
+        while len(self._cache) > ANALYTICS_CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+        return copy.deepcopy(result)
+
+    async def _compute(self, db, window_minutes: int, interval_seconds: int, machine_id: str = None) -> dict:
+        end = bucket_start(datetime.utcnow()) + timedelta(seconds=STATS_ROLLUP_BUCKET_SECONDS)
+        start = end - timedelta(minutes=window_minutes)
+        match = {"bucket": {"$gte": start, "$lt": end}}
+        if machine_id:
+            match["machine_id"] = machine_id
+
+        interval_ms = interval_seconds * 1000
+        pipeline = [
+            {"$match": match},
+            {"$facet": {
+                "series": [
+                    {"$group": {
+                        # Start of the interval: bucket minus its offset (in ms since the epoch) into the interval
+                        "_id": {"$subtract": ["$bucket", {"$mod": [{"$subtract": ["$bucket", EPOCH]}, interval_ms]}]},
+                        **_sums()
+                    }},
+                    {"$sort": {"_id": 1}}
+                ],
+                "machines": [
+                    {"$group": {"_id": "$machine_id", **_sums()}},
+                    {"$sort": {"_id": 1}}
+                ],
+                "totals": [
+                    {"$group": {"_id": None, **_sums()}}
+                ]
+            }}
+        ]
+        rows = await db[ROLLUPS].aggregate(pipeline).to_list(length=1)
+        facets = rows[0] if rows else {"series": [], "machines": [], "totals": []}
+
+        interval_minutes = interval_seconds / 60
+        empty = {metric: 0 for metric in METRICS}
+        return {
+            "window_start": start,
+            "window_end": end,
+            "interval_seconds": interval_seconds,
+            "machine_id": machine_id,
+            "totals": _derive(facets["totals"][0] if facets["totals"] else empty, window_minutes),
+            "series": [{"time": row["_id"], **_derive(row, interval_minutes)} for row in facets["series"]],
+            "machines": {row["_id"] or "unassigned": _derive(row, window_minutes) for row in facets["machines"]}
+        }
+
+analytics = Analytics()
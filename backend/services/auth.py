@@ -0,0 +1,103 @@
+import os
+import time
+import copy
+from collections import OrderedDict
+from typing import Optional
+from bson import ObjectId
+from jose import jwt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Signing key and algorithm of user and admin tokens
+SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
+ALGORITHM = "HS256"
+
+# Verified tokens and user profiles are trusted from memory for this long. It
+# also bounds how long a logout or password change made through another
+# worker process takes to reach this one.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+# Never cached: handlers that need it read it from the database
+PRIVATE_USER_FIELDS = {"password_hash"}
+
+class _TTLCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() > entry[1]:
+            if entry is not None:
+                del self._entries[key]
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return copy.deepcopy(entry[0])
+
+    def put(self, key, value, ttl: float):
+        self._entries[key] = (copy.deepcopy(value), time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key):
+        self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+class AuthCache:
+    """
+    Short-lived, bounded caches for the authentication path: verified JWT
+    claims keyed by token and user profiles keyed by id. Tokens carry the
+    user's token_version ("ver"); logout and password changes bump it, so
+    every older token is rejected as soon as the profile is reloaded.
+    """
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.claims = _TTLCache(max_entries)
+        self.users = _TTLCache(max_entries)
+
+    def decode(self, token: str, secret_key: str, algorithm: str) -> dict:
+        """jwt.decode() with caching. Raises JWTError for invalid or expired tokens."""
+        claims = self.claims.get(token)
+        if claims is None:
+            claims = jwt.decode(token, secret_key, algorithms=[algorithm])
+            # Never serve a token from cache past its own expiry
+            ttl = self.ttl
+            if "exp" in claims:
+                ttl = min(ttl, claims["exp"] - time.time())
+            if ttl > 0:
+                self.claims.put(token, claims, ttl)
+        return claims
+
+    async def get_user(self, db, user_id: str) -> Optional[dict]:
+        """User record with a string _id and without private fields, or None."""
+        user = self.users.get(user_id)
+        if user is None:
+            user = await db["users"].find_one({"_id": ObjectId(user_id)}, {field: 0 for field in PRIVATE_USER_FIELDS})
+            if user is None:
+                return None
+            user["_id"] = str(user["_id"])
+            self.users.put(user_id, user, self.ttl)
+        return user
+
+    def invalidate_user(self, user_id: str):
+        self.users.pop(user_id)
+
+    def invalidate_token(self, token: str):
+        self.claims.pop(token)
+
+    def get_stats(self) -> dict:
+        return {
+            "claims": {**self.claims.stats, "entries": len(self.claims)},
+            "users": {**self.users.stats, "entries": len(self.users)}
+        }
+
+auth_cache = AuthCache()
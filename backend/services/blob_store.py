@@ -0,0 +1,133 @@
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = os.getenv("BLOB_DIR", os.path.join("uploads", "blobs"))
+BLOB_GC_INTERVAL_SECONDS = float(os.getenv("BLOB_GC_INTERVAL_SECONDS", "3600"))
+# Blobs (and abandoned temp files) younger than this are never collected
+BLOB_GC_GRACE_SECONDS = float(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))
+
+class BlobStore:
+    """
+    Content-addressed storage for uploaded files.
+    Files live at <BLOB_DIR>/<sha[:2]>/<sha><ext> and are tracked in the `blobs`
+    collection with a reference count of the `documents` pointing at them
+    (via `blob_id`): commit() takes a reference and release() drops it when
+    the document is deleted. Byte-identical uploads share one file on disk,
+    and a periodic garbage collector removes blobs whose count reached zero.
+    """
+
+    def __init__(self, root: str = BLOB_DIR):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.db = None
+        self._gc_task = None
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def new_temp_path(self, suffix: str = ".part") -> str:
+        """Path to stream a new upload into before its hash is known."""
+        return os.path.join(self.tmp_dir, f"{uuid.uuid4()}{suffix}")
+
+    def path_for(self, blob_id: str, ext: str) -> str:
+        return os.path.join(self.root, blob_id[:2], f"{blob_id}{ext.lower()}")
+
+    async def commit(self, db, temp_path: str, blob_id: str, ext: str, size: int) -> str:
+        """
+        Move a fully written temp file into the store, or drop it if an
+        identical blob already exists, and take a reference on the blob.
+        Returns the blob's final path.
+        """
+        now = datetime.utcnow()
+
+        # Take the reference first so the collector leaves the blob alone
+        blob = await db["blobs"].find_one_and_update(
+            {"_id": blob_id},
+            {
+                "$inc": {"refcount": 1},
+                "$set": {"last_used": now},
+                "$setOnInsert": {"path": self.path_for(blob_id, ext), "size": size, "created_at": now}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        final_path = blob["path"]
+
+        if os.path.exists(final_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(temp_path, final_path)
+
+        return final_path
+
+    async def release(self, db, blob_id: str):
+        """Drop a reference taken by commit(); the collector removes the blob once unused."""
+        await db["blobs"].update_one(
+            {"_id": blob_id},
+            {"$inc": {"refcount": -1}, "$set": {"last_used": datetime.utcnow()}}
+        )
+
+    async def start(self, db):
+        self.db = db
+        self._gc_task = asyncio.create_task(self._gc_loop())
+
+    async def stop(self):
+        if self._gc_task:
+            self._gc_task.cancel()
+            await asyncio.gather(self._gc_task, return_exceptions=True)
+            self._gc_task = None
+
+    async def _gc_loop(self):
+        while True:
+            await asyncio.sleep(BLOB_GC_INTERVAL_SECONDS)
+            try:
+                await self.collect_garbage()
+            except Exception as e:
+                logger.error(f"Blob garbage collection failed: {e}")
+
+    async def collect_garbage(self) -> int:
+        """
+        Delete blobs (and stale temp files) that no document has referenced
+        for BLOB_GC_GRACE_SECONDS. Returns the number of blobs removed.
+        """
+        db = self.db
+        cutoff = datetime.utcnow() - timedelta(seconds=BLOB_GC_GRACE_SECONDS)
+        unused = {"refcount": {"$lte": 0}, "last_used": {"$lt": cutoff}}
+
+        removed = 0
+        async for blob in db["blobs"].find(unused, {"_id": 1}):
+            deleted = await db["blobs"].find_one_and_delete({"_id": blob["_id"], **unused})
+            if deleted and await self._remove_file(db, deleted):
+                removed += 1
+
+        for name in os.listdir(self.tmp_dir):
+            tmp_path = os.path.join(self.tmp_dir, name)
+            if datetime.utcfromtimestamp(os.path.getmtime(tmp_path)) < cutoff:
+                os.remove(tmp_path)
+
+        if removed:
+            logger.info(f"Blob GC removed {removed} unreferenced blob(s)")
+        return removed
+
+    async def _remove_file(self, db, blob: dict) -> bool:
+        # A concurrent commit() of the same content may have recreated the
+        # record after the delete and kept the existing file instead of its
+        # own copy. Move the file aside first and put it back if so; the
+        # content is identical either way.
+        trash_path = self.new_temp_path(".trash")
+        try:
+            os.replace(blob["path"], trash_path)
+        except FileNotFoundError:
+            return True
+        if await db["blobs"].find_one({"_id": blob["_id"]}, {"_id": 1}):
+            os.replace(trash_path, blob["path"])
+            return False
+        os.remove(trash_path)
+        return True
+
+blob_store = BlobStore()
@@ -0,0 +1,156 @@
+import os
+import shutil
+import asyncio
+import hashlib
+import logging
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CONVERSION_CACHE_DIR = os.getenv("CONVERSION_CACHE_DIR", os.path.join("uploads", ".conversion_cache"))
+CONVERSION_CACHE_MAX_BYTES = int(os.getenv("CONVERSION_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+def hash_file(file_path: str, salt: str = "") -> str:
+    """SHA-256 hex digest of `salt` followed by the file's content (blocking)."""
+    digest = hashlib.sha256(salt.encode("utf-8"))
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _copy(src: str, dst: str):
+    """
+    Atomically place a copy of src at dst. Not a hard link: the target would
+    share its inode with the cache entry, and writing to one would change both.
+    """
+    tmp_path = f"{dst}.{uuid.uuid4().hex}.tmp"
+    try:
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _fetch_file(cached_path: str, target_path: str):
+    _copy(cached_path, target_path)
+    # Mark as recently used for the index rebuilt on the next start
+    os.utime(cached_path)
+
+def _store_file(pdf_path: str, cached_path: str) -> int:
+    _copy(pdf_path, cached_path)
+    return os.path.getsize(cached_path)
+
+def _remove_files(paths: list):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _scan(cache_dir: str) -> list:
+    """(mtime, key, size) of every cache entry on disk."""
+    os.makedirs(cache_dir, exist_ok=True)
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".pdf"):
+            continue
+        st = os.stat(os.path.join(cache_dir, name))
+        entries.append((st.st_mtime, name[:-4], st.st_size))
+    return entries
+
+class ConversionCache:
+    """
+    Content-addressed cache of converted PDFs.
+    Entries are keyed by SHA-256 of the input bytes plus converter version and
+    options, stored as <key>.pdf under CONVERSION_CACHE_DIR and evicted in LRU
+    order once the directory exceeds CONVERSION_CACHE_MAX_BYTES. All file
+    system work runs on the default thread pool, off the event loop.
+    """
+
+    def __init__(self, cache_dir: str = CONVERSION_CACHE_DIR, max_bytes: int = CONVERSION_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = None  # key -> size, least recently used first
+        self._total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    async def _load_index(self):
+        if self._entries is not None:
+            return
+        loop = asyncio.get_running_loop()
+        entries = await loop.run_in_executor(None, _scan, self.cache_dir)
+        if self._entries is not None:
+            # Loaded by a concurrent request meanwhile
+            return
+        entries.sort()
+        self._entries = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(self._entries.values())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    async def key_for(self, file_path: str, version: str, options: str = "") -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, hash_file, file_path, f"{version}:{options}:")
+
+    async def fetch(self, key: str, target_path: str):
+        """
+        Place the cached PDF for key at target_path.
+        Returns target_path on a hit, None on a miss.
+        """
+        await self._load_index()
+        cached_path = self._path(key)
+
+        if key in self._entries:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, _fetch_file, cached_path, target_path)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return target_path
+            except FileNotFoundError:
+                # Evicted by another process
+                self._total_bytes -= self._entries.pop(key, 0)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def store(self, key: str, pdf_path: str):
+        await self._load_index()
+        loop = asyncio.get_running_loop()
+        try:
+            size = await loop.run_in_executor(None, _store_file, pdf_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not cache converted PDF {pdf_path}: {e}")
+            return
+
+        self._total_bytes += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+        self.stats["stores"] += 1
+        await self._evict()
+
+    async def _evict(self):
+        evicted = []
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.stats["evictions"] += 1
+            evicted.append(self._path(key))
+        if evicted:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, _remove_files, evicted)
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries or {}),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0
+        }
+
+conversion_cache = ConversionCache()
@@ -0,0 +1,125 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+CONVERSION_WORKERS = int(os.getenv("CONVERSION_WORKERS", str(os.cpu_count() or 2)))
+CONVERSION_TIMEOUT_SECONDS = float(os.getenv("CONVERSION_TIMEOUT_SECONDS", "120"))
+CONVERSION_MEMORY_LIMIT_MB = int(os.getenv("CONVERSION_MEMORY_LIMIT_MB", "1024"))
+# Extra wait for a worker that misses its own timeout (no SIGALRM, stuck in native code)
+CONVERSION_TIMEOUT_GRACE_SECONDS = float(os.getenv("CONVERSION_TIMEOUT_GRACE_SECONDS", "5"))
+# Workers are never forked from the API process: forking a process that
+# already runs threads (spooler pool, MongoDB driver) can deadlock the child
+CONVERSION_START_METHOD = os.getenv(
+    "CONVERSION_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+def _init_worker(memory_limit_mb: int):
+    """Cap the address space of each conversion process (POSIX only)."""
+    try:
+        import resource
+    except ImportError:
+        return
+    if memory_limit_mb > 0:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _on_alarm(signum, frame):
+    raise TimeoutError("Conversion timed out")
+
+def _run_task(func, args, timeout: float):
+    """Run func inside the worker, interrupting it with SIGALRM once the timeout passes."""
+    import signal
+    if not hasattr(signal, "SIGALRM"):
+        return func(*args)
+
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+class ConversionEngine:
+    """
+    Runs CPU-heavy conversion functions in a ProcessPoolExecutor so the event
+    loop stays responsive. Functions must be module-level (picklable).
+    A conversion that times out retires the pool it ran in: new work goes to
+    a fresh pool, the other conversions in the old one finish normally and
+    only the processes still busy after that (the wedged ones) are killed.
+    """
+
+    def __init__(self, workers: int = CONVERSION_WORKERS):
+        self.workers = workers
+        self._executor = None
+        # Conversions running or queued, per pool
+        self._in_flight = {}
+        self._reapers = set()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(CONVERSION_START_METHOD),
+                initializer=_init_worker,
+                initargs=(CONVERSION_MEMORY_LIMIT_MB,)
+            )
+            self._in_flight[self._executor] = set()
+        return self._executor
+
+    def _retire(self, executor: ProcessPoolExecutor):
+        """Stop sending work to a pool and kill its wedged workers once the rest finished."""
+        if self._executor is executor:
+            self._executor = None
+        # shutdown() forgets the pool's processes
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False)
+        reaper = asyncio.create_task(self._reap(executor, processes))
+        self._reapers.add(reaper)
+        reaper.add_done_callback(self._reapers.discard)
+
+    async def _reap(self, executor: ProcessPoolExecutor, processes: list):
+        others = self._in_flight.pop(executor, None)
+        if others:
+            # Every conversion enforces its own timeout, so this wait is bounded
+            await asyncio.wait(others, timeout=CONVERSION_TIMEOUT_SECONDS + CONVERSION_TIMEOUT_GRACE_SECONDS)
+        for process in processes:
+            try:
+                process.kill()
+            except (OSError, ValueError):
+                # Already exited or closed
+                pass
+
+    async def run(self, func, *args, timeout: float = CONVERSION_TIMEOUT_SECONDS):
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        future = loop.run_in_executor(executor, _run_task, func, args, timeout)
+        in_flight = self._in_flight[executor]
+        in_flight.add(future)
+        try:
+            # The worker enforces the timeout itself; the grace period covers platforms without SIGALRM
+            return await asyncio.wait_for(future, timeout=timeout + CONVERSION_TIMEOUT_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            logger.error(f"Conversion {func.__name__} did not finish within {timeout:.0f}s, retiring its pool")
+            self._retire(executor)
+            raise TimeoutError(f"Conversion timed out after {timeout:.0f}s")
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for exceeding the memory cap); every
+            # conversion in the pool failed with it
+            logger.error(f"Conversion worker crashed while running {func.__name__}, recycling pool")
+            self._retire(executor)
+            raise
+        finally:
+            in_flight.discard(future)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+conversion_engine = ConversionEngine()
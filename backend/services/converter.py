@@ -2,9 +2,85 @@ import os
 from pathlib import Path
 from typing import List
 import logging
+from services.conversion_engine import conversion_engine
+from services.conversion_cache import conversion_cache
 
 logger = logging.getLogger(__name__)
 
+# Bump when rendering output changes so cached conversions are not reused
+CONVERTER_VERSION = "1"
+
+class ConversionError(Exception):
+    """A document could not be converted (or merged) to PDF."""
+
+# The render functions below run inside conversion worker processes, so they
+# are plain module-level functions that raise on failure.
+
+def _convert_docx2pdf(docx_path: str) -> str:
+    """Convert DOCX to PDF using docx2pdf library (Windows only)"""
+    from docx2pdf import convert
+    pdf_path = docx_path.rsplit('.', 1)[0] + '.pdf'
+    convert(docx_path, pdf_path)
+    return pdf_path
+
+def _convert_docx_simple(docx_path: str) -> str:
+    """Simple DOCX to PDF conversion using reportlab"""
+    from docx import Document
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    # Read DOCX
+    doc = Document(docx_path)
+
+    # Create PDF
+    pdf_path = docx_path.rsplit('.', 1)[0] + '.pdf'
+    pdf_doc = SimpleDocTemplate(pdf_path, pagesize=letter)
+
+    styles = getSampleStyleSheet()
+    story = []
+
+    for para in doc.paragraphs:
+        if para.text.strip():
+            p = Paragraph(para.text, styles['Normal'])
+            story.append(p)
+            story.append(Spacer(1, 12))
+
+    pdf_doc.build(story)
+    return pdf_path
+
+def _convert_image(image_path: str) -> str:
+    """Convert image (JPG/PNG) to PDF"""
+    from PIL import Image
+
+    # Open image
+    img = Image.open(image_path)
+
+    # Convert RGBA to RGB if necessary
+    if img.mode == 'RGBA':
+        bg = Image.new('RGB', img.size, (255, 255, 255))
+        bg.paste(img, mask=img.split()[3])
+        img = bg
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Save as PDF
+    pdf_path = image_path.rsplit('.', 1)[0] + '.pdf'
+    img.save(pdf_path, 'PDF', resolution=100.0)
+    return pdf_path
+
+def _merge_pdfs(pdf_paths: List[str], output_path: str) -> str:
+    from PyPDF2 import PdfMerger
+
+    merger = PdfMerger()
+
+    for pdf_path in pdf_paths:
+        merger.append(pdf_path)
+
+    merger.write(output_path)
+    merger.close()
+    return output_path
+
 class DocumentConverter:
     """Convert various document formats to PDF"""
     
@@ -14,7 +90,7 @@ class DocumentConverter:
     async def convert_to_pdf(self, file_path: str) -> str:
         """
         Convert document to PDF format.
-        Returns the path to the PDF file.
+        Returns the path to the PDF file. Raises ConversionError on failure.
         """
         file_ext = Path(file_path).suffix.lower()
         
@@ -23,107 +99,77 @@ class DocumentConverter:
             return file_path
         
         elif file_ext in ['.docx', '.doc']:
-            return await self._convert_docx_to_pdf(file_path)
+            convert = self._convert_docx_to_pdf
         
         elif file_ext in ['.jpg', '.jpeg', '.png']:
-            return await self._convert_image_to_pdf(file_path)
+            convert = self._convert_image_to_pdf
         
         else:
             raise ValueError(f"Unsupported file format: {file_ext}")
+
+        # Repeat uploads of the same content are served from the conversion cache
+        pdf_path = file_path.rsplit('.', 1)[0] + '.pdf'
+        cache_key = await conversion_cache.key_for(file_path, CONVERTER_VERSION, file_ext)
+        if await conversion_cache.fetch(cache_key, pdf_path):
+            logger.info(f"Conversion cache hit: {pdf_path}")
+            return pdf_path
+
+        result = await convert(file_path)
+        await conversion_cache.store(cache_key, result)
+        return result
     
     async def _convert_docx_to_pdf(self, docx_path: str) -> str:
         """Convert DOCX to PDF using docx2pdf library"""
         try:
             # Try using docx2pdf (Windows only)
-            from docx2pdf import convert
-            pdf_path = docx_path.rsplit('.', 1)[0] + '.pdf'
-            convert(docx_path, pdf_path)
-            logger.info(f"Converted DOCX to PDF: {pdf_path}")
-            return pdf_path
+            import docx2pdf
         except ImportError:
             logger.warning("docx2pdf not available, trying alternative method")
             # Alternative: Use python-docx to extract text and create simple PDF
             return await self._convert_docx_simple(docx_path)
     
+        try:
+            pdf_path = await conversion_engine.run(_convert_docx2pdf, docx_path)
+        except Exception as e:
+            logger.error(f"Failed to convert DOCX: {e}")
+            raise ConversionError(f"Could not convert {os.path.basename(docx_path)} to PDF: {e}")
+        logger.info(f"Converted DOCX to PDF: {pdf_path}")
+        return pdf_path
+
     async def _convert_docx_simple(self, docx_path: str) -> str:
         """Simple DOCX to PDF conversion using reportlab"""
         try:
-            from docx import Document
-            from reportlab.lib.pagesizes import letter
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-            from reportlab.lib.styles import getSampleStyleSheet
-            
-            # Read DOCX
-            doc = Document(docx_path)
-            
-            # Create PDF
-            pdf_path = docx_path.rsplit('.', 1)[0] + '.pdf'
-            pdf_doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-            
-            styles = getSampleStyleSheet()
-            story = []
-            
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    p = Paragraph(para.text, styles['Normal'])
-                    story.append(p)
-                    story.append(Spacer(1, 12))
-            
-            pdf_doc.build(story)
+            pdf_path = await conversion_engine.run(_convert_docx_simple, docx_path)
             logger.info(f"Converted DOCX to PDF (simple): {pdf_path}")
             return pdf_path
         except Exception as e:
             logger.error(f"Failed to convert DOCX: {e}")
-            # If all else fails, return original (printer might handle it)
-            return docx_path
+            raise ConversionError(f"Could not convert {os.path.basename(docx_path)} to PDF: {e}")
     
     async def _convert_image_to_pdf(self, image_path: str) -> str:
         """Convert image (JPG/PNG) to PDF"""
         try:
-            from PIL import Image
-            
-            # Open image
-            img = Image.open(image_path)
-            
-            # Convert RGBA to RGB if necessary
-            if img.mode == 'RGBA':
-                bg = Image.new('RGB', img.size, (255, 255, 255))
-                bg.paste(img, mask=img.split()[3])
-                img = bg
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Save as PDF
-            pdf_path = image_path.rsplit('.', 1)[0] + '.pdf'
-            img.save(pdf_path, 'PDF', resolution=100.0)
-            
+            pdf_path = await conversion_engine.run(_convert_image, image_path)
             logger.info(f"Converted image to PDF: {pdf_path}")
             return pdf_path
         except Exception as e:
             logger.error(f"Failed to convert image: {e}")
-            return image_path
+            raise ConversionError(f"Could not convert {os.path.basename(image_path)} to PDF: {e}")
     
     async def merge_pdfs(self, pdf_paths: List[str], output_path: str) -> str:
         """Merge multiple PDF files into one"""
         try:
-            from PyPDF2 import PdfMerger
-            
-            merger = PdfMerger()
-            
-            for pdf_path in pdf_paths:
-                merger.append(pdf_path)
-            
-            merger.write(output_path)
-            merger.close()
-            
-            logger.info(f"Merged {len(pdf_paths)} PDFs into: {output_path}")
-            return output_path
+            import PyPDF2
         except ImportError:
             logger.error("PyPDF2 not installed. Cannot merge PDFs.")
-            # Return first file if merge fails
-            return pdf_paths[0] if pdf_paths else ""
+            raise ConversionError("PDF merging is not available")
+
+        try:
+            await conversion_engine.run(_merge_pdfs, pdf_paths, output_path)
+            logger.info(f"Merged {len(pdf_paths)} PDFs into: {output_path}")
+            return output_path
         except Exception as e:
             logger.error(f"Failed to merge PDFs: {e}")
-            return pdf_paths[0] if pdf_paths else ""
+            raise ConversionError(f"Could not merge PDFs: {e}")
 
 converter_service = DocumentConverter()
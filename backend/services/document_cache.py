@@ -0,0 +1,93 @@
+import os
+import copy
+import time
+from collections import OrderedDict
+from typing import Optional
+from services.event_bus import event_bus
+
+DOCUMENT_CACHE_MAX_ENTRIES = int(os.getenv("DOCUMENT_CACHE_MAX_ENTRIES", "2000"))
+DOCUMENT_CACHE_TTL_SECONDS = float(os.getenv("DOCUMENT_CACHE_TTL_SECONDS", "60"))
+
+class DocumentCache:
+    """
+    Bounded TTL + LRU cache of raw `documents` records keyed by id.
+    Writers store the record returned by their update (write-through), and
+    status events from the event bus (including other workers) drop cached
+    entries older than the event's document `version`.
+
+    Every event also bumps a generation counter. Callers take generation()
+    before reading a document and pass it to put(), which refuses the record
+    if an event for that document arrived while the read was in flight, so
+    a slow reader cannot put back a stale record.
+    """
+
+    def __init__(self, max_entries: int = DOCUMENT_CACHE_MAX_ENTRIES, ttl: float = DOCUMENT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # document_id -> (doc, stored_at)
+        self._generation = 0
+        self._changed = OrderedDict()  # document_id -> generation of its last event
+        # Generation of the newest change forgotten from _changed
+        self._changed_floor = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "stale_puts": 0}
+
+    def generation(self) -> int:
+        return self._generation
+
+    def changed_since(self, document_id, generation: int) -> bool:
+        """Whether an event for the document arrived after generation() returned `generation`."""
+        return self._changed.get(str(document_id), self._changed_floor) > generation
+
+    def get(self, document_id) -> Optional[dict]:
+        key = str(document_id)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return copy.deepcopy(entry[0])
+
+    def put(self, doc: dict, generation: int):
+        """Cache a record read after generation() returned `generation`."""
+        key = str(doc["_id"])
+        cached = self._entries.get(key)
+        if self.changed_since(key, generation) or (cached and cached[0].get("version", 0) > doc.get("version", 0)):
+            self.stats["stale_puts"] += 1
+            return
+        self._entries[key] = (copy.deepcopy(doc), time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, document_id):
+        self._entries.pop(str(document_id), None)
+
+    async def handle_event(self, event: dict):
+        key = str(event["document_id"])
+        self._generation += 1
+        self._changed[key] = self._generation
+        self._changed.move_to_end(key)
+        while len(self._changed) > self.max_entries:
+            _, generation = self._changed.popitem(last=False)
+            self._changed_floor = max(self._changed_floor, generation)
+
+        # Keep the entry only if the writer already stored this version
+        entry = self._entries.get(key)
+        version = event.get("version")
+        if entry is None or version is None or entry[0].get("version", 0) < version:
+            self.invalidate(key)
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0
+        }
+
+document_cache = DocumentCache()
+event_bus.subscribe(document_cache.handle_event)
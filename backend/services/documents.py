@@ -0,0 +1,198 @@
+import os
+import json
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from models import Document, DocumentCreate, PrintStatus
+from services.blob_store import blob_store
+from services.document_cache import document_cache
+from services.status_machine import history_entry
+from services.stats import stats_counters
+from services.status_hub import push_status_update
+
+# Repository for the `documents` collection. Writes build the response from
+# the inserted payload and inserted_id instead of reading the record back.
+
+# Fields returned by listings unless a caller asks for fewer (never file paths
+# or the status history)
+LIST_FIELDS = [
+    "filename", "original_filename", "file_size", "file_type", "upload_time", "status",
+    "print_options", "machine_id", "user_id", "page_count", "error_message"
+]
+MAX_PAGE_SIZE = 100
+
+class DocumentInUse(Exception):
+    """The document is queued or printing and cannot be deleted."""
+
+def to_document(record: dict) -> Document:
+    """Build the API model from a raw record (ObjectId _id)."""
+    return Document(**{**record, "_id": str(record["_id"])})
+
+async def find_document(db, document_id) -> Optional[dict]:
+    """
+    Raw record by id, served from the document cache when possible.
+    Raises bson.errors.InvalidId for malformed ids.
+    """
+    record = document_cache.get(document_id)
+    if record is None:
+        generation = document_cache.generation()
+        record = await db["documents"].find_one({"_id": ObjectId(document_id)})
+        if record is not None:
+            document_cache.put(record, generation)
+    return record
+
+def _record(doc_data: DocumentCreate) -> dict:
+    record = doc_data.dict(by_alias=True)
+    record["status_history"] = [history_entry(record["status"])]
+    # Bumped by every status transition
+    record["version"] = 1
+    return record
+
+async def find_documents(db, document_ids: List[str]) -> dict:
+    """
+    Raw records by id for several documents: cached ones from memory, the
+    rest with a single $in query. Malformed or unknown ids are left out.
+    """
+    records, missing = {}, []
+    for document_id in document_ids:
+        record = document_cache.get(document_id)
+        if record is not None:
+            records[document_id] = record
+        elif ObjectId.is_valid(document_id):
+            missing.append(ObjectId(document_id))
+    if missing:
+        generation = document_cache.generation()
+        async for record in db["documents"].find({"_id": {"$in": missing}}):
+            document_cache.put(record, generation)
+            records[str(record["_id"])] = record
+    return records
+
+async def create_document(db, doc_data: DocumentCreate) -> Document:
+    record = _record(doc_data)
+    try:
+        result = await db["documents"].insert_one(record)
+    except Exception:
+        # Give back the reference the upload took on its blob
+        if record.get("blob_id"):
+            await blob_store.release(db, record["blob_id"])
+        raise
+    record["_id"] = result.inserted_id
+    await _created(db, record)
+    return to_document(record)
+
+async def create_documents(db, docs: List[DocumentCreate]) -> List[Document]:
+    """Insert several documents in one round trip, preserving order."""
+    if not docs:
+        return []
+    records = [_record(doc_data) for doc_data in docs]
+    result = await db["documents"].insert_many(records, ordered=True)
+    for record, inserted_id in zip(records, result.inserted_ids):
+        record["_id"] = inserted_id
+        await _created(db, record)
+    return [to_document(record) for record in records]
+
+async def _created(db, record: dict):
+    # Nothing can have changed a document that was just inserted
+    document_cache.put(record, document_cache.generation())
+    await stats_counters.record_created(db, record)
+    await push_status_update(
+        str(record["_id"]), record["status"], machine_id=record.get("machine_id"), user_id=record.get("user_id"),
+        version=record["version"]
+    )
+
+async def delete_document(db, document_id) -> Optional[dict]:
+    """
+    Delete a document and drop its reference on the blob holding its file.
+    Returns the deleted record, or None if there was none. Raises
+    DocumentInUse while it is queued or printing, bson.errors.InvalidId for
+    malformed ids.
+    """
+    busy = [PrintStatus.QUEUED, PrintStatus.PRINTING]
+    record = await db["documents"].find_one_and_delete({"_id": ObjectId(document_id), "status": {"$nin": busy}})
+    if record is None:
+        if await db["documents"].find_one({"_id": ObjectId(document_id)}, {"_id": 1}):
+            raise DocumentInUse(f"Document {document_id} is queued or printing")
+        return None
+
+    document_cache.invalidate(document_id)
+    if record.get("blob_id"):
+        await blob_store.release(db, record["blob_id"])
+    elif record.get("file_path"):
+        # Uploads from before the blob store own their file
+        try:
+            os.remove(record["file_path"])
+        except FileNotFoundError:
+            pass
+    await stats_counters.record_deleted(db, record)
+    return record
+
+def document_filter(user_id: str = None, status=None, machine_id: str = None,
+                    since: datetime = None, until: datetime = None) -> dict:
+    query = {}
+    if user_id is not None:
+        query["user_id"] = user_id
+    if status is not None:
+        query["status"] = status
+    if machine_id is not None:
+        query["machine_id"] = machine_id
+    if since is not None or until is not None:
+        query["upload_time"] = {}
+        if since is not None:
+            query["upload_time"]["$gte"] = since
+        if until is not None:
+            query["upload_time"]["$lt"] = until
+    return query
+
+def encode_cursor(record: dict) -> str:
+    position = {"t": record["upload_time"].isoformat(), "id": str(record["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(token: str) -> Tuple[datetime, ObjectId]:
+    """Raises ValueError for a cursor that was not produced by encode_cursor()."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return datetime.fromisoformat(position["t"]), ObjectId(position["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError("Invalid cursor")
+
+def list_fields(fields: str = None) -> List[str]:
+    """Validate a comma separated field selection against LIST_FIELDS."""
+    if not fields:
+        return LIST_FIELDS
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in LIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return selected
+
+async def list_documents(db, query: dict, limit: int = 20, cursor: str = None,
+                         fields: List[str] = LIST_FIELDS) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of documents, newest first, using keyset pagination on
+    (upload_time, _id): each page continues strictly after the last record of
+    the previous one, so deep pages cost the same as the first.
+    Returns the records (with string ids) and the cursor of the next page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        upload_time, last_id = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"upload_time": {"$lt": upload_time}},
+            {"upload_time": upload_time, "_id": {"$lt": last_id}}
+        ]}]}
+
+    # upload_time is always fetched: the next cursor is built from it
+    projection = {field: 1 for field in fields}
+    projection["upload_time"] = 1
+    results = db["documents"].find(query, projection).sort([("upload_time", -1), ("_id", -1)]).limit(limit + 1)
+    records = await results.to_list(length=limit + 1)
+
+    next_cursor = encode_cursor(records[limit - 1]) if len(records) > limit else None
+    records = records[:limit]
+    for record in records:
+        record["_id"] = str(record["_id"])
+        if "upload_time" not in fields:
+            del record["upload_time"]
+    return records, next_cursor
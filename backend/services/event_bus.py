@@ -0,0 +1,116 @@
+import os
+import uuid
+import asyncio
+import logging
+from typing import Callable, Awaitable, List
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+# "memory" for a single process, "mongo" to share events between uvicorn workers
+EVENT_BUS = os.getenv("EVENT_BUS", "memory")
+EVENT_BUS_COLLECTION = "status_events"
+EVENT_BUS_CAPPED_BYTES = int(os.getenv("EVENT_BUS_CAPPED_MB", "16")) * 1024 * 1024
+EVENT_BUS_RETRY_SECONDS = 0.5
+
+Handler = Callable[[dict], Awaitable[None]]
+
+class InMemoryEventBus:
+    """Delivers status events to handlers in this process only."""
+
+    def __init__(self):
+        self.handlers: List[Handler] = []
+
+    def subscribe(self, handler: Handler):
+        self.handlers.append(handler)
+
+    async def publish(self, event: dict):
+        await self._dispatch(event)
+
+    async def _dispatch(self, event: dict):
+        for handler in self.handlers:
+            try:
+                await handler(event)
+            except Exception as e:
+                logger.error(f"Event handler failed: {e}")
+
+    async def start(self, db):
+        pass
+
+    async def stop(self):
+        pass
+
+class MongoEventBus(InMemoryEventBus):
+    """
+    Shares status events between processes through a capped MongoDB
+    collection. Every process appends the events it publishes and tails
+    the collection for events published by the others. Capped collections
+    with tailable cursors work on standalone servers, unlike change streams
+    which need a replica set.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.origin = uuid.uuid4().hex
+        self.collection = None
+        self._tail_task = None
+
+    async def start(self, db):
+        try:
+            await db.create_collection(EVENT_BUS_COLLECTION, capped=True, size=EVENT_BUS_CAPPED_BYTES)
+        except CollectionInvalid:
+            pass
+        self.collection = db[EVENT_BUS_COLLECTION]
+        # Start after the newest existing event so history is not replayed.
+        # Looked up here rather than in the task, which may first run after
+        # events were already published
+        last = await self.collection.find_one({}, sort=[("$natural", -1)])
+        self._tail_task = asyncio.create_task(self._tail(last["_id"] if last else None))
+
+    async def stop(self):
+        if self._tail_task:
+            self._tail_task.cancel()
+            await asyncio.gather(self._tail_task, return_exceptions=True)
+            self._tail_task = None
+
+    async def publish(self, event: dict):
+        # Deliver locally right away; other processes pick it up from the collection
+        await self._dispatch(event)
+        await self.collection.insert_one({"origin": self.origin, "event": event})
+
+    async def _tail(self, last_id):
+        while True:
+            # Resume in insertion order: ObjectIds from different processes
+            # are not ordered, so re-tail from the oldest event and skip up to
+            # the last one seen. If it has already rolled out of the capped
+            # collection, everything left is newer.
+            try:
+                skipping = last_id is not None and await self.collection.find_one({"_id": last_id}) is not None
+                if last_id is not None and not skipping:
+                    logger.warning("Event bus fell behind the capped collection, some events may have been missed")
+                cursor = self.collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                async for record in cursor:
+                    if skipping:
+                        skipping = record["_id"] != last_id
+                        continue
+                    last_id = record["_id"]
+                    if record.get("origin") != self.origin:
+                        await self._dispatch(record["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event bus tail failed: {e}")
+            # Tailable cursors die on an empty collection, a dropped connection
+            # or when their position is overwritten (the check above then
+            # finds last_id gone)
+            await asyncio.sleep(EVENT_BUS_RETRY_SECONDS)
+
+def create_event_bus():
+    if EVENT_BUS == "mongo":
+        return MongoEventBus()
+    if EVENT_BUS != "memory":
+        logger.warning(f"Unknown EVENT_BUS '{EVENT_BUS}', using in-memory bus")
+    return InMemoryEventBus()
+
+event_bus = create_event_bus()
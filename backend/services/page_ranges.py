@@ -0,0 +1,55 @@
+from typing import List, Optional, Tuple
+
+# Pure page range helpers, importable from models without pulling in the
+# conversion process pool (see services/pages.py for page counting)
+
+def parse_page_range(page_range: str, page_count: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Parse a page range such as "1-5, 8" into sorted, merged, 1-based inclusive
+    (start, end) tuples. When page_count is given, ranges are clipped to the
+    document. Raises ValueError on malformed input or when nothing is selected.
+    """
+    ranges = []
+    for part in page_range.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        bounds = part.split("-")
+        if len(bounds) > 2 or not all(b.strip().isdigit() for b in bounds):
+            raise ValueError(f"Invalid page range: '{part}'")
+        start = int(bounds[0])
+        end = int(bounds[-1])
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range: '{part}'")
+        if page_count is not None:
+            if start > page_count:
+                continue
+            end = min(end, page_count)
+        ranges.append((start, end))
+
+    if not ranges:
+        raise ValueError("Page range selects no pages")
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def format_page_ranges(ranges: List[Tuple[int, int]]) -> str:
+    """Format ranges for the CUPS `page-ranges` option, e.g. "1-5,8"."""
+    return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+def selected_page_count(page_range: Optional[str], page_count: Optional[int]) -> Optional[int]:
+    """Number of pages a print job will actually produce per copy, if known."""
+    if not page_range:
+        return page_count
+    try:
+        ranges = parse_page_range(page_range, page_count)
+    except ValueError:
+        return page_count
+    return sum(end - start + 1 for start, end in ranges)
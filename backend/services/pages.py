@@ -0,0 +1,43 @@
+import logging
+from typing import List, Optional, Tuple
+from services.conversion_engine import conversion_engine
+
+logger = logging.getLogger(__name__)
+
+# Worker functions, run in the conversion process pool
+
+def _count_pdf_pages(pdf_path: str) -> int:
+    from PyPDF2 import PdfReader
+    return len(PdfReader(pdf_path).pages)
+
+def _extract_pdf_pages(pdf_path: str, ranges: List[Tuple[int, int]], output_path: str) -> str:
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    for start, end in ranges:
+        for index in range(start - 1, min(end, len(reader.pages))):
+            writer.add_page(reader.pages[index])
+
+    with open(output_path, "wb") as f:
+        writer.write(f)
+    return output_path
+
+async def count_pages(file_path: str, mime_type: str) -> Optional[int]:
+    """
+    Count pages of a stored upload. Returns None when the format cannot be
+    counted without converting it first (e.g. DOCX).
+    """
+    if mime_type == "application/pdf":
+        try:
+            return await conversion_engine.run(_count_pdf_pages, file_path)
+        except Exception as e:
+            logger.warning(f"Could not count pages of {file_path}: {e}")
+            return None
+    if mime_type.startswith("image/"):
+        return 1
+    return None
+
+async def extract_pages(pdf_path: str, ranges: List[Tuple[int, int]], output_path: str) -> str:
+    """Write only the selected pages of pdf_path to output_path."""
+    return await conversion_engine.run(_extract_pdf_pages, pdf_path, ranges, output_path)
@@ -0,0 +1,80 @@
+import os
+import time
+import asyncio
+import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+
+# bcrypt (cost 12) takes ~250 ms of CPU per call; it runs on these threads so
+# the event loop keeps serving uploads and websockets during a login burst
+PASSWORD_HASH_THREADS = int(os.getenv("PASSWORD_HASH_THREADS", "2"))
+# Hash/verify calls allowed to run or wait at once; beyond that requests are shed
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "5"))
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already pending."""
+
+    def __init__(self, message: str, retry_after: int = PASSWORD_HASH_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool with a bounded backlog.
+    When PASSWORD_HASH_MAX_PENDING calls are already running or queued, new
+    ones fail fast with PasswordHasherBusy instead of piling up.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_THREADS, thread_name_prefix="bcrypt")
+        self.metrics = {
+            "calls": 0,
+            "rejected": 0,
+            "pending": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0
+        }
+
+    async def _run(self, func, *args):
+        if self.metrics["pending"] >= PASSWORD_HASH_MAX_PENDING:
+            self.metrics["rejected"] += 1
+            raise PasswordHasherBusy("Too many sign-in requests, try again shortly")
+
+        loop = asyncio.get_running_loop()
+        self.metrics["calls"] += 1
+        self.metrics["pending"] += 1
+        started = time.monotonic()
+        try:
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            elapsed = time.monotonic() - started
+            self.metrics["pending"] -= 1
+            self.metrics["total_seconds"] += elapsed
+            self.metrics["max_seconds"] = max(self.metrics["max_seconds"], elapsed)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(bcrypt.checkpw, plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+        return hashed.decode('utf-8')
+
+    def get_metrics(self) -> dict:
+        calls = self.metrics["calls"]
+        return {
+            **self.metrics,
+            "threads": PASSWORD_HASH_THREADS,
+            "max_pending": PASSWORD_HASH_MAX_PENDING,
+            "avg_seconds": self.metrics["total_seconds"] / calls if calls else 0.0
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher()
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.hash(password)
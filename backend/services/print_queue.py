@@ -0,0 +1,427 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from bson import ObjectId
+from typing import List
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from models import PrintStatus
+from services.printer import printer_service, PrintSubmitUnknown
+from services.scheduler import printer_scheduler, JOB_UNKNOWN
+from services.blob_store import blob_store
+from services.pages import extract_pages
+from services.page_ranges import parse_page_range, format_page_ranges
+from services.stats import printed_pages
+from services.status_machine import transition, InvalidTransition
+from services.admission import WeightedRoundRobin
+
+logger = logging.getLogger(__name__)
+
+# Comma separated printer names to run workers for. Empty means every printer in the
+# scheduler inventory, or the system default printer when none are reported.
+PRINT_QUEUE_PRINTERS = [p.strip() for p in os.getenv("PRINT_QUEUE_PRINTERS", "").split(",") if p.strip()]
+PRINT_WORKERS_PER_PRINTER = int(os.getenv("PRINT_WORKERS_PER_PRINTER", "1"))
+# Renewed every third of its length while a worker holds the job
+PRINT_JOB_LEASE_SECONDS = int(os.getenv("PRINT_JOB_LEASE_SECONDS", "600"))
+PRINT_JOB_MAX_ATTEMPTS = int(os.getenv("PRINT_JOB_MAX_ATTEMPTS", "3"))
+PRINT_QUEUE_POLL_SECONDS = float(os.getenv("PRINT_QUEUE_POLL_SECONDS", "2"))
+# How long after a timed-out submission to look the job up in the spooler
+PRINT_JOB_RECONCILE_SECONDS = int(os.getenv("PRINT_JOB_RECONCILE_SECONDS", "120"))
+
+def spooler_title(job: dict) -> str:
+    """Unique spooler job name, used to find the job again after a timeout."""
+    return f"Kiosk Print Job {job['_id']}"
+
+class PrintQueue:
+    """
+    Durable print job queue.
+    Jobs are persisted in the `print_jobs` collection and drained by a pool of
+    asyncio workers per printer. Jobs are claimed atomically with a lease, so
+    several API processes can share the queue and jobs orphaned by a crash or
+    restart are picked up again once their lease expires.
+    """
+
+    def __init__(self):
+        self.db = None
+        self._workers = []
+        self._printers = []
+        self._wakeup = None  # Condition workers wait on for new jobs
+        self._wakeups = 0  # Bumped on every wake(), so a worker notices one it was not waiting for
+        self._running = False
+        self._rotation = WeightedRoundRobin()
+
+    async def start(self, db):
+        self.db = db
+        self._wakeup = asyncio.Condition()
+        self._running = True
+
+        inventory = await printer_scheduler.get_inventory(force=True)
+        self._printers = PRINT_QUEUE_PRINTERS or list(inventory.keys()) or [None]
+        for printer_name in self._printers:
+            for _ in range(PRINT_WORKERS_PER_PRINTER):
+                self._workers.append(asyncio.create_task(self._worker(printer_name)))
+
+        logger.info(f"Print queue started with {len(self._workers)} worker(s)")
+
+    async def stop(self):
+        self._running = False
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Print queue stopped")
+
+    async def enqueue(self, doc: dict, printer_name: str = None) -> str:
+        """
+        Persist a print job for the given document and wake up a worker.
+        The scheduler picks a printer unless one is given.
+        Returns the job id. Raises PrinterBusyError when all printers are full.
+        """
+        options = doc["print_options"]
+        if printer_name is None:
+            printer_name = await printer_scheduler.select_printer(
+                self.db,
+                color_mode=options.get("color_mode"),
+                allowed=[p for p in self._printers if p]
+            )
+
+        # Claim the document first: the conditional status update lets exactly
+        # one of several concurrent requests queue it
+        job_id = ObjectId()
+        claimed = await transition(
+            self.db, doc["_id"], PrintStatus.QUEUED, fields={"print_job_id": str(job_id), "print_options": options}
+        )
+
+        job = self._new_job(job_id, claimed, printer_name)
+        try:
+            await self.db["print_jobs"].insert_one(job)
+        except Exception as e:
+            await transition(self.db, doc["_id"], PrintStatus.FAILED, error_message=f"Could not queue print job: {e}")
+            raise
+
+        await self._wake()
+        return str(job_id)
+
+    async def enqueue_many(self, docs: List[dict]) -> list:
+        """
+        Enqueue several documents with one printer load lookup and a single
+        insert_many. Printers are chosen for every job before anything is
+        written, so a PrinterBusyError leaves nothing queued. Returns, per
+        document, the job id or the exception that kept it from being queued
+        (e.g. InvalidTransition when a concurrent /print took it first).
+        """
+        allowed = [p for p in self._printers if p]
+        load = await printer_scheduler.get_load(self.db)
+        printers = []
+        for doc in docs:
+            printer_name = await printer_scheduler.select_printer(
+                self.db, color_mode=doc["print_options"].get("color_mode"), allowed=allowed, load=load
+            )
+            # Later jobs in the batch see the ones already placed
+            printer_load = load.setdefault(printer_name, {"jobs": 0, "pages": 0})
+            printer_load["jobs"] += 1
+            printer_load["pages"] += printed_pages(doc)
+            printers.append(printer_name)
+
+        results, jobs, positions = [], [], []
+        for doc, printer_name in zip(docs, printers):
+            job_id = ObjectId()
+            try:
+                claimed = await transition(
+                    self.db, doc["_id"], PrintStatus.QUEUED,
+                    fields={"print_job_id": str(job_id), "print_options": doc["print_options"]}
+                )
+            except InvalidTransition as e:
+                results.append(e)
+                continue
+            positions.append(len(results))
+            jobs.append(self._new_job(job_id, claimed, printer_name))
+            results.append(str(job_id))
+
+        if jobs:
+            failed = {}
+            try:
+                await self.db["print_jobs"].insert_many(jobs, ordered=False)
+            except BulkWriteError as e:
+                failed = {error["index"]: e for error in e.details.get("writeErrors", [])}
+            except Exception as e:
+                failed = {index: e for index in range(len(jobs))}
+            for index, error in failed.items():
+                await transition(
+                    self.db, jobs[index]["document_id"], PrintStatus.FAILED,
+                    error_message=f"Could not queue print job: {error}"
+                )
+                results[positions[index]] = error
+            await self._wake(len(jobs))
+        return results
+
+    async def _wake(self, jobs: int = 1):
+        """Wake up to `jobs` idle workers."""
+        if self._wakeup is None:
+            return
+        async with self._wakeup:
+            self._wakeups += 1
+            self._wakeup.notify(jobs)
+
+    async def _wait_for_work(self, seen: int):
+        """Sleep until woken or the poll interval passes, unless a wake-up came after `seen`."""
+        async with self._wakeup:
+            if self._wakeups != seen:
+                return
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=PRINT_QUEUE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _new_job(self, job_id: ObjectId, doc: dict, printer_name: str) -> dict:
+        options = doc["print_options"]
+        return {
+            "_id": job_id,
+            "document_id": doc["_id"],
+            "machine_id": doc.get("machine_id"),
+            "user_id": doc.get("user_id"),
+            "file_path": doc["file_path"],
+            "printer_name": printer_name,
+            "copies": options["copies"],
+            "color_mode": options.get("color_mode"),
+            "page_range": options.get("page_range"),
+            "pages": printed_pages(doc),
+            "status": PrintStatus.QUEUED,
+            "attempts": 0,
+            "created_at": datetime.utcnow(),
+            "lease_until": None,
+            "error_message": None
+        }
+
+    async def _claim(self, printer_name: str):
+        """
+        Atomically claim the next runnable job for this printer. Jobs whose
+        lease expired are recovered first; otherwise kiosks are served in
+        weighted round robin, oldest job first within a kiosk, so one kiosk
+        with a long backlog cannot starve the others.
+        """
+        now = datetime.utcnow()
+        printers = {"$in": [printer_name, None]}
+
+        job = await self._claim_one(
+            {"printer_name": printers, "status": PrintStatus.PRINTING, "lease_until": {"$lt": now}}, now
+        )
+        if job is not None:
+            return job
+
+        queued = {"printer_name": printers, "status": PrintStatus.QUEUED}
+        machines = await self.db["print_jobs"].distinct("machine_id", queued)
+        if not machines:
+            return None
+        job = await self._claim_one({**queued, "machine_id": self._rotation.pick(machines)}, now)
+        if job is None:
+            # Another worker took that kiosk's last job: fall back to the oldest one
+            job = await self._claim_one(queued, now)
+        return job
+
+    async def _claim_one(self, query: dict, now: datetime):
+        return await self.db["print_jobs"].find_one_and_update(
+            query,
+            {
+                "$set": {
+                    "status": PrintStatus.PRINTING,
+                    "started_at": now,
+                    "lease_until": now + timedelta(seconds=PRINT_JOB_LEASE_SECONDS)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    @asynccontextmanager
+    async def _hold(self, job_id: ObjectId, status: str, field: str):
+        """
+        Keep pushing `field` (the lease_until of a PRINTING job, the
+        reconcile_at of an unknown one) forward while the block runs, so a
+        slow print is not taken over by another worker when it expires.
+        """
+        async def renew():
+            while True:
+                await asyncio.sleep(PRINT_JOB_LEASE_SECONDS / 3)
+                try:
+                    await self.db["print_jobs"].update_one(
+                        {"_id": job_id, "status": status},
+                        {"$set": {field: datetime.utcnow() + timedelta(seconds=PRINT_JOB_LEASE_SECONDS)}}
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not renew the lease of print job {job_id}: {e}")
+
+        task = asyncio.create_task(renew())
+        try:
+            yield
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _close(self, job: dict, status: PrintStatus, error_message: str = None):
+        """Mark the job record finished; finished_at is what the retention TTL index expires on."""
+        fields = {"status": status, "finished_at": datetime.utcnow(), "lease_until": None}
+        if error_message:
+            fields["error_message"] = error_message
+        await self.db["print_jobs"].update_one({"_id": job["_id"]}, {"$set": fields})
+
+    async def _finish(self, job: dict, status: PrintStatus, error_message: str = None):
+        await self._close(job, status, error_message)
+
+        doc_fields = {"error_message": error_message} if error_message else None
+        # Abandoned jobs fail straight from QUEUED/PRINTING; only a running job completes
+        expected = [PrintStatus.PRINTING] if status == PrintStatus.COMPLETED else [PrintStatus.QUEUED, PrintStatus.PRINTING]
+        try:
+            await transition(
+                self.db, job["document_id"], status, expected=expected,
+                fields=doc_fields, error_message=error_message
+            )
+        except InvalidTransition as e:
+            logger.warning(f"Print job {job['_id']}: {e}")
+
+    async def _run(self, job: dict, printer_name: str):
+        if job["attempts"] > PRINT_JOB_MAX_ATTEMPTS:
+            await self._finish(job, PrintStatus.FAILED, "Print job abandoned after repeated interruptions")
+            return
+
+        try:
+            await transition(self.db, job["document_id"], PrintStatus.PRINTING)
+        except InvalidTransition as e:
+            # The document moved on without this job (e.g. it was deleted)
+            logger.warning(f"Dropping print job {job['_id']}: {e}")
+            await self._close(job, PrintStatus.FAILED, str(e))
+            return
+
+        if job.get("spooler_job_id") is not None:
+            # Re-claimed after the job already reached the spooler: do not print it twice
+            await self._await_spooler(job, job["spooler_job_id"])
+            return
+
+        print_path = job["file_path"]
+        page_ranges = None
+        trimmed_path = None
+        # The spooler thread may still be reading the trimmed copy
+        submit_pending = False
+
+        try:
+            # Only spool the requested pages: trim PDFs, let CUPS filter anything else
+            if job.get("page_range"):
+                ranges = parse_page_range(job["page_range"])
+                if print_path.lower().endswith(".pdf"):
+                    trimmed_path = blob_store.new_temp_path(".pdf")
+                    print_path = await extract_pages(print_path, ranges, trimmed_path)
+                else:
+                    page_ranges = format_page_ranges(ranges)
+
+            spooler_job_id = await printer_service.print_file(
+                print_path,
+                printer_name=job.get("printer_name") or printer_name,
+                copies=job["copies"],
+                color_mode=job.get("color_mode"),
+                page_ranges=page_ranges,
+                title=spooler_title(job)
+            )
+        except PrintSubmitUnknown as e:
+            submit_pending = True
+            # Failing here would let a retry print the document twice
+            await self._park(job, e)
+            return
+        except Exception as e:
+            logger.error(f"Print job {job['_id']} failed: {e}")
+            await self._finish(job, PrintStatus.FAILED, str(e))
+            return
+        finally:
+            # Windows hands the file to another application asynchronously and a
+            # timed-out submit may still be reading it; the blob store collector
+            # removes the trimmed copy in both cases instead
+            if trimmed_path and not submit_pending and not printer_service.is_windows and os.path.exists(trimmed_path):
+                os.remove(trimmed_path)
+
+        await self._await_spooler(job, spooler_job_id)
+
+    async def _park(self, job: dict, error: Exception):
+        """Set a job whose outcome the spooler has not settled aside for _reconcile()."""
+        logger.warning(f"Print job {job['_id']} outcome unknown, reconciling later: {error}")
+        await self.db["print_jobs"].update_one(
+            {"_id": job["_id"]},
+            {"$set": {
+                "status": JOB_UNKNOWN,
+                "lease_until": None,
+                "reconcile_at": datetime.utcnow() + timedelta(seconds=PRINT_JOB_RECONCILE_SECONDS),
+                "error_message": str(error)
+            }}
+        )
+
+    async def _await_spooler(self, job: dict, spooler_job_id):
+        """Record the spooler job, wait for it to finish and finish the print job."""
+        try:
+            if spooler_job_id is not None:
+                await self.db["print_jobs"].update_one(
+                    {"_id": job["_id"]},
+                    {"$set": {"spooler_job_id": spooler_job_id}}
+                )
+            await printer_service.wait_for_job(spooler_job_id)
+        except TimeoutError as e:
+            # Still pending (or the spooler did not answer): it may yet print
+            await self._park(job, e)
+            return
+        except Exception as e:
+            logger.error(f"Print job {job['_id']} failed: {e}")
+            await self._finish(job, PrintStatus.FAILED, str(e))
+            return
+        await self._finish(job, PrintStatus.COMPLETED)
+
+    async def _reconcile(self, printer_name: str) -> bool:
+        """
+        Settle one job whose outcome was unknown (submission or spooler wait
+        timed out): wait for it if the spooler has it, fail it (so it may be
+        reprinted) if not. Returns whether a job was due.
+        """
+        now = datetime.utcnow()
+        job = await self.db["print_jobs"].find_one_and_update(
+            {"printer_name": {"$in": [printer_name, None]}, "status": JOB_UNKNOWN, "reconcile_at": {"$lte": now}},
+            # Also keeps other workers off this job while it is being settled
+            {"$set": {"reconcile_at": now + timedelta(seconds=PRINT_JOB_LEASE_SECONDS)}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            return False
+
+        try:
+            spooler_job_id = job.get("spooler_job_id")
+            if spooler_job_id is None:
+                spooler_job_id = await printer_service.find_job(spooler_title(job))
+        except Exception as e:
+            logger.warning(f"Could not look up print job {job['_id']} in the spooler: {e}")
+            return True
+        if spooler_job_id is None:
+            await self._finish(job, PrintStatus.FAILED, "Print job did not reach the spooler")
+        else:
+            logger.info(f"Print job {job['_id']} found in the spooler as {spooler_job_id}")
+            async with self._hold(job["_id"], JOB_UNKNOWN, "reconcile_at"):
+                await self._await_spooler(job, spooler_job_id)
+        return True
+
+    async def _worker(self, printer_name: str):
+        while self._running:
+            try:
+                seen = self._wakeups
+                if await self._reconcile(printer_name):
+                    continue
+                job = await self._claim(printer_name)
+                if job is None:
+                    await self._wait_for_work(seen)
+                    continue
+                async with self._hold(job["_id"], PrintStatus.PRINTING, "lease_until"):
+                    await self._run(job, printer_name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep the worker alive on transient database errors
+                logger.error(f"Print worker error: {e}")
+                await asyncio.sleep(PRINT_QUEUE_POLL_SECONDS)
+
+print_queue = PrintQueue()
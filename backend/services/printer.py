@@ -1,19 +1,200 @@
 import sys
 import os
+import time
 import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Blocking spooler calls (CUPS / win32) run on this many dedicated threads
+SPOOLER_THREADS = int(os.getenv("SPOOLER_THREADS", "4"))
+SPOOLER_CALL_TIMEOUT_SECONDS = float(os.getenv("SPOOLER_CALL_TIMEOUT_SECONDS", "30"))
+
+CUPS_JOB_POLL_SECONDS = float(os.getenv("CUPS_JOB_POLL_SECONDS", "2"))
+CUPS_JOB_TIMEOUT_SECONDS = float(os.getenv("CUPS_JOB_TIMEOUT_SECONDS", "600"))
+
+# IPP job-state values (RFC 8011)
+IPP_JOB_CANCELED = 7
+IPP_JOB_ABORTED = 8
+IPP_JOB_COMPLETED = 9
+# CUPS printer-type capability bit for color printing
+CUPS_PRINTER_COLOR = 0x0004
+
+class PrintSubmitUnknown(Exception):
+    """
+    Submitting a job timed out or failed midway. The job may or may not have
+    reached the spooler; look it up by title with find_job() later.
+    """
+
+    def __init__(self, message: str, title: str):
+        super().__init__(message)
+        self.title = title
+
 class PrinterService:
     def __init__(self):
         self.platform = sys.platform
         self.is_windows = self.platform == "win32"
         self.is_linux = self.platform.startswith("linux")
+        self._executor = ThreadPoolExecutor(max_workers=SPOOLER_THREADS, thread_name_prefix="spooler")
+        # One CUPS connection per spooler thread, reused across calls
+        self._local = threading.local()
+        self.metrics = {
+            "calls": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "in_flight": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0
+        }
+
+    def _cups_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import cups
+            conn = cups.Connection()
+            self._local.conn = conn
+        return conn
+
+    def _call_cups(self, method: str, *args, retry: bool = True, **kwargs):
+        """
+        Call a method on this thread's CUPS connection, reconnecting once if it
+        went stale. Pass retry=False for calls that must not run twice: the
+        connection is still reset, but the error is raised.
+        """
+        import cups
+        try:
+            return getattr(self._cups_connection(), method)(*args, **kwargs)
+        except cups.HTTPError:
+            self._local.conn = None
+            if not retry:
+                raise
+            return getattr(self._cups_connection(), method)(*args, **kwargs)
+
+    async def _run_blocking(self, func, *args, timeout: float = SPOOLER_CALL_TIMEOUT_SECONDS):
+        """Run a blocking spooler call on the dedicated thread pool with a timeout."""
+        loop = asyncio.get_running_loop()
+        self.metrics["calls"] += 1
+        self.metrics["in_flight"] += 1
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, func, *args), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            raise TimeoutError(f"Spooler call {getattr(func, '__name__', func)} timed out after {timeout:.0f}s")
+        except Exception:
+            self.metrics["failures"] += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            self.metrics["in_flight"] -= 1
+            self.metrics["total_seconds"] += elapsed
+            self.metrics["max_seconds"] = max(self.metrics["max_seconds"], elapsed)
+
+    def get_metrics(self) -> dict:
+        calls = self.metrics["calls"]
+        return {
+            **self.metrics,
+            "threads": SPOOLER_THREADS,
+            "avg_seconds": self.metrics["total_seconds"] / calls if calls else 0.0
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    async def get_printers(self) -> dict:
+        """
+        Returns the attached printers as {name: {"color": bool, "accepting": bool}}.
+        An empty dict means only the system default printer (or simulation) is available.
+        """
+        if self.is_linux:
+            try:
+                import cups
+            except ImportError:
+                return {}
+            return await self._run_blocking(self._get_printers_linux_sync)
+        elif self.is_windows:
+            try:
+                import win32print
+            except ImportError:
+                return {}
+            return await self._run_blocking(self._get_printers_windows_sync)
+        return {}
+
+    def _get_printers_linux_sync(self) -> dict:
+        printers = self._call_cups("getPrinters")
+        return {
+            name: {
+                "color": bool(attrs.get("printer-type", 0) & CUPS_PRINTER_COLOR),
+                "accepting": attrs.get("printer-is-accepting-jobs", True)
+            }
+            for name, attrs in printers.items()
+        }
+
+    def _get_printers_windows_sync(self) -> dict:
+        import win32print
+        flags = win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS
+        # Color capability is driver specific on Windows; treat every printer as capable
+        return {p[2]: {"color": True, "accepting": True} for p in win32print.EnumPrinters(flags)}
 
-    async def print_file(self, file_path: str, printer_name: str = None, copies: int = 1):
+    async def wait_for_job(self, job_id):
+        """
+        Polls the spooler until the submitted job reaches a terminal state.
+        Raises if the job was canceled, aborted or did not finish in time.
+        """
+        if not self.is_linux or job_id is None:
+            # Windows ShellExecute printing does not expose a job handle
+            return
+
+        deadline = time.monotonic() + CUPS_JOB_TIMEOUT_SECONDS
+
+        while True:
+            attrs = await self._run_blocking(self._get_job_attributes_sync, job_id)
+            state = attrs.get("job-state")
+
+            if state == IPP_JOB_COMPLETED:
+                logger.info(f"CUPS job {job_id} completed")
+                return
+            if state in (IPP_JOB_CANCELED, IPP_JOB_ABORTED):
+                reason = attrs.get("job-state-message") or ("canceled" if state == IPP_JOB_CANCELED else "aborted")
+                raise Exception(f"CUPS job {job_id} did not complete: {reason}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"CUPS job {job_id} still pending after {CUPS_JOB_TIMEOUT_SECONDS:.0f}s")
+
+            await asyncio.sleep(CUPS_JOB_POLL_SECONDS)
+
+    def _get_job_attributes_sync(self, job_id) -> dict:
+        return self._call_cups("getJobAttributes", job_id, requested_attributes=["job-state", "job-state-message"])
+
+    async def find_job(self, title: str):
+        """Spooler job id of the job submitted with this title, or None if there is none."""
+        if not self.is_linux:
+            # ShellExecute jobs cannot be looked up
+            return None
+        return await self._run_blocking(self._find_job_sync, title)
+
+    def _find_job_sync(self, title: str):
+        jobs = self._call_cups("getJobs", which_jobs="all", requested_attributes=["job-id", "job-name"])
+        matches = [job_id for job_id, attrs in jobs.items() if attrs.get("job-name") == title]
+        return max(matches) if matches else None
+
+    async def print_file(
+        self,
+        file_path: str,
+        printer_name: str = None,
+        copies: int = 1,
+        color_mode: str = None,
+        page_ranges: str = None,
+        title: str = "Kiosk Print Job"
+    ):
         """
         Sends a file to the printer.
+        page_ranges is passed to CUPS as-is (e.g. "1-5,8"); callers trim PDFs themselves.
+        Returns the spooler job id, or None when the platform does not provide one.
+        Raises PrintSubmitUnknown when submission timed out or the connection
+        broke mid-submit; the job may then exist under `title` (give each job
+        a unique title).
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
@@ -22,24 +203,26 @@ class PrinterService:
 
         try:
             if self.is_windows:
-                await self._print_windows(file_path, printer_name, copies)
+                await self._print_windows(file_path, printer_name, copies, title)
+                return None
             elif self.is_linux:
-                await self._print_linux(file_path, printer_name, copies)
+                return await self._print_linux(file_path, printer_name, copies, color_mode, page_ranges, title)
             else:
                 # Mock for other platforms (e.g. macOS dev)
                 logger.warning(f"Printing not supported on {self.platform}. Simulating print.")
-                await asyncio.sleep(2) 
+                await asyncio.sleep(2)
+                return None
         except Exception as e:
             logger.error(f"Print failed: {e}")
             raise e
 
-    async def _print_windows(self, file_path: str, printer_name: str, copies: int):
+    async def _print_windows(self, file_path: str, printer_name: str, copies: int, title: str):
         try:
             import win32api
             import win32print
             
             if not printer_name:
-                printer_name = win32print.GetDefaultPrinter()
+                printer_name = await self._run_blocking(win32print.GetDefaultPrinter)
             
             logger.info(f"Using Windows printer: {printer_name}")
             
@@ -52,9 +235,10 @@ class PrinterService:
             # WARNING: This might open a window. 
             # In a real embedded kiosk, we'd likely use Ghostscript or raw socket printing.
             
-            # Simulating async execution
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self._windows_print_sync, file_path, printer_name)
+            try:
+                await self._run_blocking(self._windows_print_sync, file_path, printer_name)
+            except TimeoutError as e:
+                raise PrintSubmitUnknown(str(e), title)
             
         except ImportError:
             logger.error("pywin32 not installed. Cannot print on Windows.")
@@ -64,24 +248,50 @@ class PrinterService:
         import win32api
         win32api.ShellExecute(0, "printto", file_path, f'"{printer_name}"', ".", 0)
 
-    async def _print_linux(self, file_path: str, printer_name: str, copies: int):
+    async def _print_linux(
+        self,
+        file_path: str,
+        printer_name: str,
+        copies: int,
+        color_mode: str = None,
+        page_ranges: str = None,
+        title: str = "Kiosk Print Job"
+    ):
         try:
             import cups
-            conn = cups.Connection()
-            printers = conn.getPrinters()
-            
-            if not printer_name:
-                if not printers:
-                    raise Exception("No printers found on CUPS")
-                printer_name = list(printers.keys())[0]
-            
-            logger.info(f"Using CUPS printer: {printer_name}")
-            
-            job_id = conn.printFile(printer_name, file_path, "Kiosk Print Job", {"copies": str(copies)})
-            logger.info(f"CUPS Job ID: {job_id}")
-            
         except ImportError:
             logger.error("pycups not installed. Cannot print on Linux.")
             raise
 
+        options = {"copies": str(copies)}
+        if color_mode:
+            options["print-color-mode"] = "color" if color_mode == "color" else "monochrome"
+        if page_ranges:
+            options["page-ranges"] = page_ranges
+
+        try:
+            job_id = await self._run_blocking(self._print_linux_sync, file_path, printer_name, options, title)
+        except TimeoutError as e:
+            # printFile keeps running on the spooler thread (still reading the
+            # file) and may still submit the job; look it up once it settled
+            raise PrintSubmitUnknown(str(e), title)
+        except cups.HTTPError as e:
+            # The request may have reached the server before the connection broke
+            raise PrintSubmitUnknown(f"CUPS connection failed while submitting: {e}", title)
+        logger.info(f"CUPS Job ID: {job_id}")
+        return job_id
+
+    def _print_linux_sync(self, file_path: str, printer_name: str, options: dict, title: str):
+        if not printer_name:
+            printer_name = self._call_cups("getDefault")
+        if not printer_name:
+            printers = self._call_cups("getPrinters")
+            if not printers:
+                raise Exception("No printers found on CUPS")
+            printer_name = list(printers.keys())[0]
+
+        logger.info(f"Using CUPS printer: {printer_name}")
+        # Not retried: the first request may have created the job
+        return self._call_cups("printFile", printer_name, file_path, title, options, retry=False)
+
 printer_service = PrinterService()
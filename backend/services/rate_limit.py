@@ -0,0 +1,63 @@
+import os
+from fastapi import Request
+from jose import JWTError
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from services.auth import auth_cache, SECRET_KEY, ALGORITHM
+
+# Where counters live. "memory://" is per process; point every worker at a
+# shared store (e.g. "mongodb://localhost:27017") so limits hold across
+# workers and restarts. Any storage supported by the `limits` package works.
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+# fixed-window, moving-window or sliding-window-counter
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "moving-window")
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+# Per-route policies
+UPLOAD_RATE_LIMIT = os.getenv("UPLOAD_RATE_LIMIT", "5/minute")
+# Resumable upload chunks: a large file takes many requests, so chunks are
+# not counted against IP_RATE_LIMIT
+UPLOAD_CHUNK_RATE_LIMIT = os.getenv("UPLOAD_CHUNK_RATE_LIMIT", "600/minute")
+MERGE_RATE_LIMIT = os.getenv("MERGE_RATE_LIMIT", "3/minute")
+PRINT_RATE_LIMIT = os.getenv("PRINT_RATE_LIMIT", "10/minute")
+LOGIN_RATE_LIMIT = os.getenv("LOGIN_RATE_LIMIT", "10/minute")
+# Ceiling per client address shared by all limited routes, so rotating
+# machine ids does not escape the per-route limits
+IP_RATE_LIMIT = os.getenv("IP_RATE_LIMIT", "60/minute")
+
+def user_key(request: Request):
+    """Subject of a valid bearer token, if the request carries one."""
+    authorization = request.headers.get("authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        subject = auth_cache.decode(authorization[7:], SECRET_KEY, ALGORITHM).get("sub")
+    except JWTError:
+        return None
+    return f"user:{subject}" if subject else None
+
+def machine_key(request: Request):
+    """Kiosk id from the X-Machine-ID header or the machine_id query parameter."""
+    machine_id = request.headers.get("x-machine-id") or request.query_params.get("machine_id")
+    return f"machine:{machine_id}" if machine_id else None
+
+def client_key(request: Request) -> str:
+    """Signed-in user, then kiosk, then client address."""
+    return user_key(request) or machine_key(request) or f"ip:{get_remote_address(request)}"
+
+def address_key(request: Request) -> str:
+    return f"ip:{get_remote_address(request)}"
+
+# The one limiter every route uses (also installed as app.state.limiter). If
+# the shared store is unreachable, requests are limited in memory instead of
+# failing.
+limiter = Limiter(
+    key_func=client_key,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+    enabled=RATE_LIMIT_ENABLED,
+    swallow_errors=True,
+    in_memory_fallback_enabled=RATE_LIMIT_STORAGE_URI != "memory://"
+)
+
+ip_limit = limiter.shared_limit(IP_RATE_LIMIT, scope="ip", key_func=address_key)
@@ -0,0 +1,129 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Optional, List
+from models import PrintStatus, ColorMode
+from services.printer import printer_service
+
+logger = logging.getLogger(__name__)
+
+PRINTER_INVENTORY_TTL = float(os.getenv("PRINTER_INVENTORY_TTL", "30"))
+PRINTER_MAX_QUEUE_DEPTH = int(os.getenv("PRINTER_MAX_QUEUE_DEPTH", "10"))
+PRINTER_BUSY_RETRY_AFTER = int(os.getenv("PRINTER_BUSY_RETRY_AFTER", "30"))
+
+# print_jobs status of a job whose submission or spooler wait timed out: it may
+# or may not print, so it is neither retried nor failed until reconciled
+JOB_UNKNOWN = "unknown"
+
+class PrinterBusyError(Exception):
+    """Raised when no eligible printer can take another job."""
+
+    def __init__(self, message: str, retry_after: int = PRINTER_BUSY_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class PrinterScheduler:
+    """
+    Chooses a printer for each print job.
+    Keeps a cached printer inventory, balances jobs by queue depth and pending
+    pages, matches color jobs to color-capable printers and refuses new work
+    once all eligible printers are at PRINTER_MAX_QUEUE_DEPTH.
+    """
+
+    def __init__(self):
+        self._inventory = {}
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return bool(self._inventory) and time.monotonic() - self._refreshed_at < PRINTER_INVENTORY_TTL
+
+    async def get_inventory(self, force: bool = False) -> dict:
+        if not force and self._is_fresh():
+            return self._inventory
+
+        async with self._lock:
+            if force or not self._is_fresh():
+                try:
+                    self._inventory = await printer_service.get_printers()
+                except Exception as e:
+                    # Keep serving the stale inventory rather than failing jobs
+                    logger.error(f"Failed to refresh printer inventory: {e}")
+                self._refreshed_at = time.monotonic()
+
+        return self._inventory
+
+    async def get_load(self, db) -> dict:
+        """
+        Returns {printer_name: {"jobs": int, "pages": int}} for unfinished jobs,
+        counting jobs parked as JOB_UNKNOWN since they may still be printing.
+        """
+        pipeline = [
+            {"$match": {"status": {"$in": [PrintStatus.QUEUED, PrintStatus.PRINTING, JOB_UNKNOWN]}}},
+            {"$group": {"_id": "$printer_name", "jobs": {"$sum": 1}, "pages": {"$sum": "$pages"}}}
+        ]
+        load = {}
+        async for row in db["print_jobs"].aggregate(pipeline):
+            load[row["_id"]] = {"jobs": row["jobs"], "pages": row["pages"]}
+        return load
+
+    async def select_printer(
+        self,
+        db,
+        color_mode: str = ColorMode.BW,
+        allowed: Optional[List[str]] = None,
+        load: Optional[dict] = None
+    ) -> Optional[str]:
+        """
+        Pick the least loaded eligible printer.
+        `load` (as returned by get_load) is read from the database unless given.
+        Returns None when the inventory is empty and only the system default
+        printer is available. Raises PrinterBusyError when every eligible
+        printer is full, none is accepting jobs, or none of `allowed` is in
+        the inventory.
+        """
+        inventory = await self.get_inventory()
+        if load is None:
+            load = await self.get_load(db)
+
+        candidates = [
+            name for name, info in inventory.items()
+            if info.get("accepting", True) and (not allowed or name in allowed)
+        ]
+
+        if not inventory:
+            if load.get(None, {}).get("jobs", 0) >= PRINTER_MAX_QUEUE_DEPTH:
+                raise PrinterBusyError("Printer queue is full")
+            return None
+
+        if not candidates:
+            known = [name for name in inventory if not allowed or name in allowed]
+            if not known:
+                logger.warning(f"None of the configured printers {allowed} are in the inventory {list(inventory)}")
+                raise PrinterBusyError("None of the configured printers is available")
+            raise PrinterBusyError("No printer is accepting jobs")
+
+        if color_mode == ColorMode.COLOR:
+            color_capable = [name for name in candidates if inventory[name].get("color")]
+            if color_capable:
+                candidates = color_capable
+            else:
+                logger.warning("No color-capable printer available, color job will print in grayscale")
+
+        available = [
+            name for name in candidates
+            if load.get(name, {}).get("jobs", 0) < PRINTER_MAX_QUEUE_DEPTH
+        ]
+        if not available:
+            raise PrinterBusyError("All printers are busy")
+
+        def sort_key(name):
+            printer_load = load.get(name, {})
+            # Keep color printers free for color work when a mono printer can take a B&W job
+            prefer_mono = color_mode != ColorMode.COLOR and inventory[name].get("color", False)
+            return (printer_load.get("jobs", 0), printer_load.get("pages", 0), prefer_mono)
+
+        return min(available, key=sort_key)
+
+printer_scheduler = PrinterScheduler()
@@ -0,0 +1,183 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo import UpdateOne
+from models import PrintStatus
+from services.page_ranges import selected_page_count
+
+logger = logging.getLogger(__name__)
+
+# Width of a stats_rollups bucket
+STATS_ROLLUP_BUCKET_SECONDS = int(os.getenv("STATS_ROLLUP_BUCKET_SECONDS", "60"))
+
+COUNTERS = "stats_counters"
+ROLLUPS = "stats_rollups"
+EPOCH = datetime(1970, 1, 1)
+
+def _status(value) -> str:
+    return PrintStatus(value).value
+
+def bucket_start(moment: datetime) -> datetime:
+    """Start of the rollup bucket containing a naive UTC datetime."""
+    seconds = int((moment - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % STATS_ROLLUP_BUCKET_SECONDS)
+
+def printed_pages(doc: dict) -> int:
+    options = doc.get("print_options") or {}
+    copies = options.get("copies", 1)
+    return copies * (selected_page_count(options.get("page_range"), doc.get("page_count")) or 1)
+
+class StatsCounters:
+    """
+    Incrementally maintained dashboard statistics.
+    `stats_counters` holds one record for the whole fleet ("global"), one per
+    machine ("machine:<id>") and one per UTC day ("day:YYYY-MM-DD"), each with
+    the number of documents currently in every status plus cumulative
+    uploads, completed/failed prints, pages and copies. `stats_rollups` holds
+    the same activity in STATS_ROLLUP_BUCKET_SECONDS buckets per machine, with
+    queue wait and print duration sums. Both are updated with $inc as part of
+    every status transition, so reading them never scans `documents`.
+    """
+
+    def __init__(self):
+        # Counter updates that failed since startup (the counters drifted)
+        self.write_failures = 0
+
+    async def record_created(self, db, doc: dict):
+        status = _status(doc["status"])
+        await self._apply(db, doc, doc["upload_time"], {"documents": 1, f"status.{status}": 1}, {"uploads": 1})
+
+    async def record_deleted(self, db, doc: dict):
+        status = _status(doc["status"])
+        # Uploads and prints already counted stay counted
+        await self._apply(db, doc, datetime.utcnow(), {"documents": -1, f"status.{status}": -1}, {}, activity=False)
+
+    async def record_transition(self, db, doc: dict, previous_status, previous_at: Optional[datetime] = None):
+        """
+        Account for the transition that produced the last status_history entry
+        of `doc`, from `previous_status` (entered at `previous_at`, if known).
+        """
+        entry = doc["status_history"][-1]
+        target = _status(entry["status"])
+        previous = _status(previous_status)
+        at = entry["at"]
+
+        counters = {f"status.{target}": 1}
+        counters[f"status.{previous}"] = counters.get(f"status.{previous}", 0) - 1
+        rollup = {}
+        elapsed = (at - previous_at).total_seconds() if previous_at else None
+
+        if target == PrintStatus.QUEUED:
+            rollup["queued"] = 1
+        elif target == PrintStatus.PRINTING and previous == PrintStatus.QUEUED and elapsed is not None:
+            rollup["started"] = 1
+            rollup["queue_wait_seconds"] = elapsed
+        elif target in (PrintStatus.COMPLETED, PrintStatus.FAILED):
+            counters[f"prints_{target}"] = 1
+            rollup[target] = 1
+            if previous == PrintStatus.PRINTING and elapsed is not None:
+                rollup["print_seconds"] = elapsed
+                rollup["print_count"] = 1
+            if target == PrintStatus.COMPLETED:
+                pages = printed_pages(doc)
+                copies = (doc.get("print_options") or {}).get("copies", 1)
+                counters.update({"pages": pages, "copies": copies})
+                rollup.update({"pages": pages, "copies": copies})
+
+        counters = {key: value for key, value in counters.items() if value}
+        await self._apply(db, doc, at, counters, rollup)
+
+    async def _apply(self, db, doc: dict, at: datetime, counters: dict, rollup: dict, activity: bool = True):
+        # Statistics must never fail the status change they describe; failed
+        # writes leave the counters behind, so they are logged and counted
+        machine_id = doc.get("machine_id")
+        try:
+            writes = [UpdateOne({"_id": "global"}, {"$inc": counters}, upsert=True)]
+            if machine_id:
+                writes.append(UpdateOne({"_id": f"machine:{machine_id}"}, {"$inc": counters}, upsert=True))
+            # Day records count activity, not documents currently in a status
+            day = {key: value for key, value in counters.items() if not key.startswith("status.")}
+            if day and activity:
+                writes.append(UpdateOne({"_id": f"day:{at.strftime('%Y-%m-%d')}"}, {"$inc": day}, upsert=True))
+
+            tasks = [db[COUNTERS].bulk_write(writes, ordered=False)] if counters else []
+            if rollup:
+                tasks.append(db[ROLLUPS].update_one(
+                    {"bucket": bucket_start(at), "machine_id": machine_id},
+                    {"$inc": rollup},
+                    upsert=True
+                ))
+            await asyncio.gather(*tasks)
+        except Exception:
+            self.write_failures += 1
+            logger.exception(f"Could not update stats counters for document {doc.get('_id')}")
+
+    async def ensure_counters(self, db):
+        """
+        Build the counters from the documents collection if they do not exist
+        yet (first start with existing data). Pages ignore page ranges here.
+        """
+        if await db[COUNTERS].find_one({"_id": "global"}, {"_id": 1}):
+            return
+
+        logger.info("Building stats counters from existing documents")
+        for key, record in (await self._count_documents(db)).items():
+            await db[COUNTERS].replace_one({"_id": key}, {"_id": key, **record}, upsert=True)
+
+    async def _count_documents(self, db) -> dict:
+        """Counter records ("global", "machine:<id>") computed from `documents`."""
+        counters = {"global": {"documents": 0, "status": {}}}
+        pipeline = [
+            {"$group": {
+                "_id": {"machine_id": "$machine_id", "status": "$status"},
+                "documents": {"$sum": 1},
+                "copies": {"$sum": "$print_options.copies"},
+                "pages": {"$sum": {"$multiply": ["$print_options.copies", {"$ifNull": ["$page_count", 1]}]}}
+            }}
+        ]
+        async for row in db["documents"].aggregate(pipeline):
+            status = _status(row["_id"]["status"])
+            keys = ["global"]
+            if row["_id"].get("machine_id"):
+                keys.append(f"machine:{row['_id']['machine_id']}")
+            for key in keys:
+                record = counters.setdefault(key, {"documents": 0, "status": {}})
+                record["documents"] += row["documents"]
+                record["status"][status] = record["status"].get(status, 0) + row["documents"]
+                if status in (PrintStatus.COMPLETED, PrintStatus.FAILED):
+                    record[f"prints_{status}"] = record.get(f"prints_{status}", 0) + row["documents"]
+                if status == PrintStatus.COMPLETED:
+                    record["pages"] = record.get("pages", 0) + row["pages"]
+                    record["copies"] = record.get("copies", 0) + row["copies"]
+        return counters
+
+    async def get_stats(self, db) -> dict:
+        """Current counters for the fleet, today and every machine."""
+        today = f"day:{datetime.utcnow().strftime('%Y-%m-%d')}"
+        records = {}
+        async for record in db[COUNTERS].find({"_id": {"$in": ["global", today]}}):
+            records[record["_id"]] = record
+        machines = {}
+        async for record in db[COUNTERS].find({"_id": {"$regex": "^machine:"}}):
+            machines[record["_id"][len("machine:"):]] = _summary(record)
+        return {
+            "global": _summary(records.get("global", {})),
+            # Day records only count activity
+            "today": {key: value for key, value in _summary(records.get(today, {})).items() if key != "status"},
+            "machines": machines,
+            "write_failures": self.write_failures
+        }
+
+def _summary(record: dict) -> dict:
+    return {
+        "documents": record.get("documents", 0),
+        "status": {status.value: record.get("status", {}).get(status.value, 0) for status in PrintStatus},
+        "prints_completed": record.get("prints_completed", 0),
+        "prints_failed": record.get("prints_failed", 0),
+        "pages": record.get("pages", 0),
+        "copies": record.get("copies", 0)
+    }
+
+stats_counters = StatsCounters()
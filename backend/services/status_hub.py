@@ -0,0 +1,144 @@
+import os
+import json
+import asyncio
+import logging
+from fastapi import WebSocket
+from typing import Dict, Set, Iterable, Optional
+from services.event_bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+# Messages buffered per connection before it is treated as a slow consumer and dropped
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "5"))
+
+def status_topics(document_id: str = None, machine_id: str = None, user_id: str = None) -> list:
+    topics = []
+    if document_id:
+        topics.append(f"document:{document_id}")
+    if machine_id:
+        topics.append(f"machine:{machine_id}")
+    if user_id:
+        topics.append(f"user:{user_id}")
+    return topics
+
+class Subscriber:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.topics: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.sender: Optional[asyncio.Task] = None
+        self.closed = False
+
+class ConnectionManager:
+    """
+    Topic based fan-out to websocket clients.
+    Clients subscribe to documents, machines or their user; connections
+    without a subscription receive every event. Each connection has its own
+    bounded send queue drained by its own task, so a dead or slow client
+    never blocks publishing and is evicted once its queue fills up.
+    """
+
+    def __init__(self):
+        self.active_connections: Dict[WebSocket, Subscriber] = {}
+        self.topics: Dict[str, Set[Subscriber]] = {}
+        self.unfiltered: Set[Subscriber] = set()
+
+    async def connect(self, websocket: WebSocket, topics: Iterable[str] = ()) -> Subscriber:
+        await websocket.accept()
+        subscriber = Subscriber(websocket)
+        self.active_connections[websocket] = subscriber
+        topics = list(topics)
+        if topics:
+            self.subscribe(subscriber, topics)
+        else:
+            self.unfiltered.add(subscriber)
+        subscriber.sender = asyncio.create_task(self._sender(subscriber))
+        return subscriber
+
+    def subscribe(self, subscriber: Subscriber, topics: Iterable[str]):
+        for topic in topics:
+            subscriber.topics.add(topic)
+            self.topics.setdefault(topic, set()).add(subscriber)
+            self.unfiltered.discard(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber, topics: Iterable[str]):
+        for topic in topics:
+            subscriber.topics.discard(topic)
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.topics[topic]
+
+    def disconnect(self, websocket: WebSocket):
+        subscriber = self.active_connections.pop(websocket, None)
+        if subscriber is None:
+            return
+        self.unsubscribe(subscriber, list(subscriber.topics))
+        self.unfiltered.discard(subscriber)
+        subscriber.closed = True
+        if subscriber.sender and subscriber.sender is not asyncio.current_task():
+            subscriber.sender.cancel()
+
+    def publish(self, message: str, topics: Iterable[str] = ()):
+        """Queue a message for every connection subscribed to any of the topics."""
+        targets = set(self.unfiltered)
+        for topic in topics:
+            targets.update(self.topics.get(topic, ()))
+        for subscriber in targets:
+            self._enqueue(subscriber, message)
+
+    async def handle_event(self, event: dict):
+        """Event bus handler: forward a status event to matching local connections."""
+        topics = status_topics(event.get("document_id"), event.get("machine_id"), event.get("user_id"))
+        message = {key: value for key, value in event.items() if key != "user_id"}
+        self.publish(json.dumps(message), topics)
+
+    async def broadcast(self, message: str):
+        for subscriber in list(self.active_connections.values()):
+            self._enqueue(subscriber, message)
+
+    def _enqueue(self, subscriber: Subscriber, message: str):
+        try:
+            subscriber.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Evicting slow websocket consumer")
+            self.disconnect(subscriber.websocket)
+            asyncio.create_task(self._close(subscriber.websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            # 1013: try again later
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+
+    async def _sender(self, subscriber: Subscriber):
+        try:
+            # wait_for may swallow a cancel that lands as a send completes
+            # (Python < 3.12), so also stop once disconnected
+            while not subscriber.closed:
+                message = await subscriber.queue.get()
+                await asyncio.wait_for(subscriber.websocket.send_text(message), timeout=WS_SEND_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Closed socket or a send that timed out: drop the connection
+            self.disconnect(subscriber.websocket)
+            await self._close(subscriber.websocket)
+
+manager = ConnectionManager()
+event_bus.subscribe(manager.handle_event)
+
+# Used by the services that change documents. Events go through the event
+# bus so sockets held by other worker processes receive them too.
+async def push_status_update(
+    document_id: str,
+    status: str,
+    machine_id: str = None,
+    user_id: str = None,
+    **extra
+):
+    event = {"document_id": document_id, "status": status, "machine_id": machine_id, "user_id": user_id, **extra}
+    await event_bus.publish(event)
@@ -0,0 +1,112 @@
+import os
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+from pymongo import ReturnDocument
+from models import PrintStatus
+from services.document_cache import document_cache
+from services.stats import stats_counters
+from services.status_hub import push_status_update
+
+logger = logging.getLogger(__name__)
+
+# Entries kept in a document's status_history
+STATUS_HISTORY_LIMIT = int(os.getenv("STATUS_HISTORY_LIMIT", "50"))
+
+# Allowed moves between document statuses. PRINTING -> PRINTING is a job being
+# re-claimed after its lease expired; COMPLETED/FAILED -> QUEUED is a reprint.
+TRANSITIONS = {
+    PrintStatus.UPLOADED: {PrintStatus.QUEUED, PrintStatus.FAILED},
+    PrintStatus.DOWNLOADING: {PrintStatus.UPLOADED, PrintStatus.FAILED},
+    PrintStatus.QUEUED: {PrintStatus.PRINTING, PrintStatus.FAILED},
+    PrintStatus.PRINTING: {PrintStatus.PRINTING, PrintStatus.COMPLETED, PrintStatus.FAILED},
+    PrintStatus.COMPLETED: {PrintStatus.QUEUED},
+    PrintStatus.FAILED: {PrintStatus.QUEUED},
+}
+
+class InvalidTransition(Exception):
+    """The document is not in a status it may move to the target status from."""
+
+    def __init__(self, document_id, target: PrintStatus, current: Optional[str] = None):
+        self.document_id = document_id
+        self.target = target
+        self.current = current
+        if current is None:
+            message = f"Document {document_id} not found"
+        else:
+            message = f"Cannot move document from '{PrintStatus(current).value}' to '{target.value}'"
+        super().__init__(message)
+
+def sources_for(target: PrintStatus) -> set:
+    """Every status the target status can be reached from."""
+    return {status for status, targets in TRANSITIONS.items() if target in targets}
+
+def history_entry(status: PrintStatus, **extra) -> dict:
+    return {"status": status, "at": datetime.utcnow(), **extra}
+
+async def transition(
+    db,
+    document_id,
+    target: PrintStatus,
+    expected: Iterable[PrintStatus] = None,
+    fields: dict = None,
+    **event
+) -> dict:
+    """
+    Move a document to `target` in a single conditional find_one_and_update.
+    The update only matches while the document is still in one of the
+    `expected` statuses (default: every legal source of `target`), so of two
+    concurrent callers exactly one wins and the other gets InvalidTransition.
+    Extra `fields` are $set in the same write and the document's `version` is
+    incremented. Updates the document cache and
+    the stats counters, publishes the status event and returns the updated
+    record; failures of those side effects are logged, not raised.
+    """
+    sources = sources_for(target)
+    expected = set(expected) if expected is not None else sources
+    if not expected or not expected <= sources:
+        raise ValueError(f"Illegal transition to '{target.value}' from {sorted(s.value for s in expected)}")
+
+    entry = history_entry(target, **({"error_message": event["error_message"]} if event.get("error_message") else {}))
+    generation = document_cache.generation()
+    # The record as it was before the update tells exactly which status the
+    # document left; the updated record is derived from it below
+    before = await db["documents"].find_one_and_update(
+        {"_id": document_id, "status": {"$in": list(expected)}},
+        {
+            "$set": {"status": target, **(fields or {})},
+            "$push": {"status_history": {"$each": [entry], "$slice": -STATUS_HISTORY_LIMIT}},
+            "$inc": {"version": 1}
+        },
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        # Lost the race or an illegal move: report what the document is now
+        current = await db["documents"].find_one({"_id": document_id}, {"status": 1})
+        raise InvalidTransition(document_id, target, current["status"] if current else None)
+
+    history = before.get("status_history") or []
+    doc = {
+        **before,
+        "status": target.value,
+        **(fields or {}),
+        "status_history": (history + [entry])[-STATUS_HISTORY_LIMIT:],
+        "version": before.get("version", 0) + 1
+    }
+
+    document_cache.put(doc, generation)
+    # The transition is committed: a failing side effect must not reach the
+    # caller, which would act as if it had not happened (e.g. enqueue would
+    # leave the document QUEUED without a print job)
+    try:
+        await stats_counters.record_transition(db, doc, before["status"], history[-1]["at"] if history else None)
+    except Exception as e:
+        logger.error(f"Could not record transition of document {document_id} in stats: {e}")
+    try:
+        await push_status_update(
+            str(document_id), target, machine_id=doc.get("machine_id"), user_id=doc.get("user_id"),
+            version=doc["version"], **event
+        )
+    except Exception as e:
+        logger.error(f"Could not publish status update for document {document_id}: {e}")
+    return doc
@@ -0,0 +1,75 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Optional
+from services.event_bus import event_bus
+from services.document_cache import document_cache
+
+STATUS_VERSION_MAX_ENTRIES = int(os.getenv("STATUS_VERSION_MAX_ENTRIES", "10000"))
+# Bounds how long a cached ETag is trusted without re-reading the document, in
+# case a change was made by a process this one does not hear events from
+STATUS_ETAG_TTL_SECONDS = float(os.getenv("STATUS_ETAG_TTL_SECONDS", "30"))
+
+class StatusVersions:
+    """
+    In-memory map of the current ETag per document, plus wake-ups for
+    requests long-polling on a document. Every status event on the event bus
+    invalidates the document's ETag and releases its waiters.
+    """
+
+    def __init__(self):
+        self._etags = OrderedDict()  # document_id -> (etag, stored_at)
+        self._waiters = {}  # document_id -> [asyncio.Event, number of waiters]
+
+    def get_etag(self, document_id: str) -> Optional[str]:
+        entry = self._etags.get(document_id)
+        if entry is None:
+            return None
+        etag, stored_at = entry
+        if time.monotonic() - stored_at > STATUS_ETAG_TTL_SECONDS:
+            del self._etags[document_id]
+            return None
+        self._etags.move_to_end(document_id)
+        return etag
+
+    def set_etag(self, document_id: str, etag: str, generation: int):
+        """
+        Remember the ETag of a document read after document_cache.generation()
+        returned `generation`. Skipped if the document changed since, so a slow
+        read cannot leave an outdated ETag behind (and answer false 304s).
+        """
+        if document_cache.changed_since(document_id, generation):
+            return
+        self._etags[document_id] = (etag, time.monotonic())
+        self._etags.move_to_end(document_id)
+        while len(self._etags) > STATUS_VERSION_MAX_ENTRIES:
+            self._etags.popitem(last=False)
+
+    def watch(self, document_id: str) -> asyncio.Event:
+        """Event that is set on the next change to the document. Pair with release()."""
+        entry = self._waiters.get(document_id)
+        if entry is None:
+            entry = self._waiters[document_id] = [asyncio.Event(), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, document_id: str, waiter: asyncio.Event):
+        """Drop a waiter; the entry goes away once nobody is waiting on it."""
+        entry = self._waiters.get(document_id)
+        if entry is not None and entry[0] is waiter:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._waiters[document_id]
+
+    async def handle_event(self, event: dict):
+        document_id = event.get("document_id")
+        if not document_id:
+            return
+        self._etags.pop(document_id, None)
+        entry = self._waiters.pop(document_id, None)
+        if entry is not None:
+            entry[0].set()
+
+status_versions = StatusVersions()
+event_bus.subscribe(status_versions.handle_event)
@@ -0,0 +1,191 @@
+import os
+import hashlib
+import logging
+import aiofiles
+import magic
+from typing import List
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Bytes buffered before sniffing the MIME type of an upload
+SNIFF_BYTES = 2048
+MAX_FIELD_SIZE = 64 * 1024
+
+class UploadError(Exception):
+    """Raised when a streamed upload is rejected; carries the HTTP status to return."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+class StreamedUpload:
+    def __init__(self, filename: str, mime_type: str, size: int, sha256: str, path: str, fields: dict):
+        self.filename = filename
+        self.mime_type = mime_type
+        self.size = size
+        self.sha256 = sha256
+        self.path = path
+        self.fields = fields
+
+async def receive_upload(
+    request,
+    dest_path: str,
+    max_size: int,
+    allowed_mime_types: List[str],
+    file_field: str = "file"
+) -> StreamedUpload:
+    """
+    Parse a multipart/form-data request body incrementally and write the
+    file part straight to dest_path in one pass: the MIME type is sniffed
+    from the first bytes, the size limit is enforced as bytes arrive and the
+    SHA-256 is computed on the way through. Other form fields are returned
+    as strings. dest_path is removed if the upload is rejected.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError(400, "Expected a multipart/form-data body")
+
+    # Reject obviously oversized bodies before reading anything
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MAX_FIELD_SIZE:
+        raise UploadError(413, f"File too large (max {max_size // (1024 * 1024)}MB)")
+
+    events = []
+    header_field = bytearray()
+    header_value = bytearray()
+    part_headers = {}
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        part_headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        events.append(("headers", dict(part_headers)))
+        part_headers.clear()
+
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    fields = {}
+    out_file = None
+    digest = hashlib.sha256()
+    head = bytearray()
+    state = {"part": None, "name": None, "value": bytearray()}
+    upload = {"filename": None, "mime_type": None, "size": 0}
+
+    async def write_file(data: bytes):
+        upload["size"] += len(data)
+        if upload["size"] > max_size:
+            raise UploadError(413, f"File too large (max {max_size // (1024 * 1024)}MB)")
+        digest.update(data)
+        await out_file.write(data)
+
+    async def sniff_and_flush():
+        mime_type = magic.from_buffer(bytes(head), mime=True)
+        if mime_type not in allowed_mime_types:
+            raise UploadError(400, f"Invalid file type: {mime_type}. Only PDF, DOCX, JPG allowed.")
+        upload["mime_type"] = mime_type
+        await write_file(bytes(head))
+        head.clear()
+
+    async def handle(kind, payload):
+        nonlocal out_file
+        if kind == "headers":
+            _, disposition = parse_options_header(payload.get(b"content-disposition", b""))
+            name = disposition.get(b"name", b"").decode("utf-8", "replace")
+            filename = disposition.get(b"filename")
+
+            if name == file_field and filename is not None:
+                if upload["filename"] is not None:
+                    raise UploadError(400, "Only one file may be uploaded per request")
+                upload["filename"] = filename.decode("utf-8", "replace")
+                out_file = await aiofiles.open(dest_path, "wb")
+                state["part"] = "file"
+            else:
+                state["part"] = "field"
+                state["name"] = name
+                state["value"] = bytearray()
+
+        elif kind == "data":
+            if state["part"] == "file":
+                if upload["mime_type"] is None:
+                    head.extend(payload)
+                    if len(head) >= SNIFF_BYTES:
+                        await sniff_and_flush()
+                else:
+                    await write_file(payload)
+            elif state["part"] == "field":
+                state["value"].extend(payload)
+                if len(state["value"]) > MAX_FIELD_SIZE:
+                    raise UploadError(413, f"Form field {state['name']} too large")
+
+        elif kind == "end":
+            if state["part"] == "file":
+                if upload["mime_type"] is None:
+                    await sniff_and_flush()
+                await out_file.close()
+            elif state["part"] == "field":
+                fields[state["name"]] = state["value"].decode("utf-8", "replace")
+            state["part"] = None
+
+    def feed(chunk: bytes = None):
+        try:
+            if chunk is None:
+                parser.finalize()
+            else:
+                parser.write(chunk)
+        except Exception as e:
+            raise UploadError(400, f"Malformed multipart body: {e}")
+
+    try:
+        async for chunk in request.stream():
+            feed(chunk)
+            for kind, payload in events:
+                await handle(kind, payload)
+            events.clear()
+        feed()
+        for kind, payload in events:
+            await handle(kind, payload)
+
+        if upload["filename"] is None:
+            raise UploadError(400, f"Missing file field '{file_field}'")
+    except BaseException:
+        if out_file is not None:
+            await out_file.close()
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+
+    return StreamedUpload(
+        filename=upload["filename"],
+        mime_type=upload["mime_type"],
+        size=upload["size"],
+        sha256=digest.hexdigest(),
+        path=dest_path,
+        fields=fields
+    )
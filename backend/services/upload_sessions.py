@@ -0,0 +1,59 @@
+import os
+import asyncio
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Resumable upload sessions (see routers/upload_sessions.py) write their
+# chunks into <SESSION_DIR>/<session_id>.part until they are finalized
+SESSION_DIR = os.path.join("uploads", "sessions")
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+UPLOAD_SESSION_SWEEP_SECONDS = float(os.getenv("UPLOAD_SESSION_SWEEP_SECONDS", "600"))
+
+def remove_temp_file(temp_path: str):
+    try:
+        os.remove(temp_path)
+    except FileNotFoundError:
+        pass
+
+class UploadSessionSweeper:
+    """Periodically deletes expired upload sessions and their partial files."""
+
+    def __init__(self):
+        self.db = None
+        self._task = None
+        os.makedirs(SESSION_DIR, exist_ok=True)
+
+    async def start(self, db):
+        self.db = db
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.sweep(self.db)
+            except Exception as e:
+                logger.error(f"Upload session sweep failed: {e}")
+            await asyncio.sleep(UPLOAD_SESSION_SWEEP_SECONDS)
+
+    async def sweep(self, db) -> int:
+        """Delete every expired session and its partial file. Returns the number deleted."""
+        now = datetime.utcnow()
+        removed = 0
+        async for session in db["upload_sessions"].find({"expires_at": {"$lt": now}}, {"temp_path": 1}):
+            # Claim it first: finalize removes the session the same way
+            if await db["upload_sessions"].find_one_and_delete({"_id": session["_id"], "expires_at": {"$lt": now}}):
+                remove_temp_file(session["temp_path"])
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} expired upload session(s)")
+        return removed
+
+session_sweeper = UploadSessionSweeper()
@@ -0,0 +1,88 @@
+import os
+import sys
+import asyncio
+import tempfile
+from datetime import datetime
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+# Uploads, blobs and upload sessions live under the working directory (the
+# routers create their directories on import); keep them out of the source tree
+WORK_DIR = tempfile.mkdtemp(prefix="auto-printer-tests-")
+_cwd = os.getcwd()
+os.chdir(WORK_DIR)
+try:
+    from fastapi.testclient import TestClient
+    from mongomock_motor import AsyncMongoMockClient, AsyncMongoMockCollection
+    from main import app
+    from database import get_database
+    from models import PrintStatus
+    from services.admission import WeightedRoundRobin
+    from services.print_queue import print_queue
+finally:
+    os.chdir(_cwd)
+
+async def _bulk_write(self, requests, ordered=True):
+    # mongomock cannot take UpdateOne objects from current pymongo releases;
+    # apply them one at a time (the only bulk operation the API uses)
+    for request in requests:
+        await self.update_one(request._filter, request._doc, upsert=request._upsert)
+
+AsyncMongoMockCollection.bulk_write = _bulk_write
+
+def run(coro):
+    """Run a coroutine to completion from a synchronous test."""
+    return asyncio.run(coro)
+
+def add_document(db, status: PrintStatus = PrintStatus.UPLOADED, **fields) -> dict:
+    """Insert a stored document record directly, bypassing the upload endpoints."""
+    record = {
+        "filename": "doc.pdf",
+        "original_filename": "doc.pdf",
+        "file_size": 1024,
+        "file_type": "application/pdf",
+        "file_path": os.path.join("uploads", "doc.pdf"),
+        "upload_time": datetime.utcnow(),
+        "status": status,
+        "print_options": {"copies": 1, "color_mode": "bw", "page_range": None},
+        "machine_id": None,
+        "user_id": None,
+        "page_count": 1,
+        "status_history": [],
+        "version": 1,
+        **fields
+    }
+    run(db["documents"].insert_one(record))
+    return record
+
+@pytest.fixture(autouse=True)
+def work_dir(monkeypatch):
+    monkeypatch.chdir(WORK_DIR)
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["auto_printer_test"]
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    """The print queue bound to the test database, with no workers running."""
+    monkeypatch.setattr(print_queue, "db", db)
+    monkeypatch.setattr(print_queue, "_printers", [None])
+    monkeypatch.setattr(print_queue, "_rotation", WeightedRoundRobin())
+    return print_queue
+
+@pytest.fixture
+def client(db, queue):
+    """
+    API client on the test database. Startup hooks are not run, so print
+    workers stay stopped and tests drive the queue themselves.
+    """
+    async def get_test_database():
+        return db
+
+    app.dependency_overrides[get_database] = get_test_database
+    yield TestClient(app)
+    app.dependency_overrides.clear()
@@ -0,0 +1,89 @@
+import pytest
+from conftest import run, add_document
+from models import PrintStatus
+from services import admission
+from services.admission import AdmissionController, AdmissionRejected, WeightedRoundRobin
+from services.scheduler import JOB_UNKNOWN
+
+def _job(machine_id, pages, status=PrintStatus.QUEUED, user_id=None) -> dict:
+    return {"machine_id": machine_id, "user_id": user_id, "pages": pages, "status": status}
+
+def _doc(machine_id=None, pages=1, user_id=None) -> dict:
+    return {
+        "machine_id": machine_id, "user_id": user_id, "page_count": pages,
+        "print_options": {"copies": 1, "color_mode": "bw", "page_range": None}
+    }
+
+def _admit(db, *docs):
+    async def scenario():
+        async with AdmissionController().admit(db, *docs):
+            pass
+    run(scenario())
+
+def test_round_robin_gives_each_machine_its_weight_in_turns(monkeypatch):
+    monkeypatch.setattr(admission, "MACHINE_WEIGHTS", {"a": 2})
+    rotation = WeightedRoundRobin()
+    picks = [rotation.pick(["b", None, "a"]) for _ in range(8)]
+    assert picks == ["a", "a", "b", None, "a", "a", "b", None]
+
+def test_round_robin_moves_on_when_the_machine_runs_dry(monkeypatch):
+    monkeypatch.setattr(admission, "MACHINE_WEIGHTS", {"a": 3})
+    rotation = WeightedRoundRobin()
+    assert rotation.pick(["a", "c"]) == "a"
+    assert rotation.pick(["b", "c"]) == "b"
+    assert rotation.pick([]) is None
+
+def test_in_flight_counts_unfinished_and_parked_jobs(db):
+    run(db["print_jobs"].insert_many([
+        _job("k1", 5, user_id="u1"), _job("k1", 3, PrintStatus.PRINTING), _job("k2", 4, JOB_UNKNOWN),
+        _job("k2", 100, PrintStatus.COMPLETED), _job("k2", 100, PrintStatus.FAILED)
+    ]))
+    load = run(AdmissionController().get_in_flight(db))
+    assert load == {"total": 12, "machines": {"k1": 8, "k2": 4}, "users": {"u1": 5}}
+
+def test_machine_quota(db, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_MACHINE_MAX_PAGES", 10)
+    run(db["print_jobs"].insert_one(_job("k1", 8)))
+    _admit(db, _doc("k1", pages=2))
+    with pytest.raises(AdmissionRejected) as rejected:
+        _admit(db, _doc("k1", pages=3))
+    assert rejected.value.retry_after >= admission.ADMISSION_MIN_RETRY_AFTER
+    # Other kiosks are unaffected
+    _admit(db, _doc("k2", pages=3))
+
+def test_single_large_job_is_admitted_when_nothing_is_in_flight(db, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_MACHINE_MAX_PAGES", 10)
+    monkeypatch.setattr(admission, "ADMISSION_USER_MAX_PAGES", 10)
+    _admit(db, _doc("k1", pages=50, user_id="u1"))
+
+def test_saturated_fleet_limits_kiosks_to_their_weighted_share(db, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_CAPACITY_PAGES", 100)
+    monkeypatch.setattr(admission, "MACHINE_WEIGHTS", {"heavy": 1, "light": 1})
+    run(db["print_jobs"].insert_many([_job("heavy", 90), _job("light", 5)]))
+
+    with pytest.raises(AdmissionRejected, match="fair share"):
+        _admit(db, _doc("heavy", pages=10))
+    _admit(db, _doc("light", pages=10))
+
+def test_batches_and_concurrent_admissions_count_reservations(db, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_MACHINE_MAX_PAGES", 10)
+    with pytest.raises(AdmissionRejected):
+        _admit(db, _doc("k1", pages=6), _doc("k1", pages=6))
+
+    async def scenario():
+        controller = AdmissionController()
+        async with controller.admit(db, _doc("k1", pages=6)):
+            with pytest.raises(AdmissionRejected):
+                async with controller.admit(db, _doc("k1", pages=6)):
+                    pass
+        assert controller._reserved == {}
+    run(scenario())
+
+def test_print_answers_429_with_retry_after(client, db, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_MACHINE_MAX_PAGES", 1)
+    run(db["print_jobs"].insert_one(_job("kiosk-1", 1)))
+    doc = add_document(db, machine_id="kiosk-1")
+
+    response = client.post("/print", json={"document_id": str(doc["_id"])})
+    assert response.status_code == 429 and int(response.headers["Retry-After"]) > 0
+    assert run(db["documents"].find_one({"_id": doc["_id"]}))["status"] == PrintStatus.UPLOADED
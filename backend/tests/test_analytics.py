@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from conftest import run
+from routers.admin import create_access_token
+from services import analytics as analytics_module
+from services.analytics import Analytics
+from services.stats import ROLLUPS, bucket_start
+
+ADMIN = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+
+def _interval_start(bucket: datetime, seconds: int) -> datetime:
+    epoch = datetime(1970, 1, 1)
+    offset = (bucket - epoch).total_seconds() % seconds
+    return bucket - timedelta(seconds=offset)
+
+def _seed(db) -> datetime:
+    now = bucket_start(datetime.utcnow())
+    run(db[ROLLUPS].insert_many([
+        {"bucket": now, "machine_id": "kiosk-1", "uploads": 3, "queued": 3, "started": 2, "completed": 1,
+         "failed": 1, "pages": 4, "copies": 2, "queue_wait_seconds": 30, "print_seconds": 20, "print_count": 2},
+        {"bucket": now - timedelta(minutes=20), "machine_id": None, "uploads": 2},
+        # Outside a 60 minute window
+        {"bucket": now - timedelta(hours=2), "machine_id": "kiosk-1", "uploads": 50, "failed": 50}
+    ]))
+    return now
+
+def test_totals_series_and_machines(db):
+    now = _seed(db)
+    result = run(Analytics().get(db, window_minutes=60, interval_seconds=300))
+
+    totals = result["totals"]
+    assert totals["uploads"] == 5 and totals["failed"] == 1
+    assert totals["uploads_per_minute"] == 5 / 60
+    assert totals["failure_rate"] == 0.5
+    assert totals["avg_queue_wait_seconds"] == 15 and totals["avg_print_seconds"] == 10
+
+    assert [point["time"] for point in result["series"]] == [
+        _interval_start(now - timedelta(minutes=20), 300), _interval_start(now, 300)
+    ]
+    assert result["series"][1]["uploads_per_minute"] == 3 / 5
+    assert set(result["machines"]) == {"kiosk-1", "unassigned"}
+    assert result["machines"]["unassigned"]["avg_queue_wait_seconds"] is None
+
+def test_machine_filter_and_interval_rounding(db):
+    _seed(db)
+    result = run(Analytics().get(db, window_minutes=60, interval_seconds=90, machine_id="kiosk-1"))
+    assert result["interval_seconds"] == 60
+    assert result["totals"]["uploads"] == 3 and list(result["machines"]) == ["kiosk-1"]
+
+def test_windows_are_served_from_memory_until_they_expire(db, monkeypatch):
+    _seed(db)
+    analytics = Analytics()
+    first = run(analytics.get(db, 60, 300))
+    first["totals"]["uploads"] = -1
+    run(db[ROLLUPS].insert_one({"bucket": bucket_start(datetime.utcnow()), "machine_id": None, "uploads": 10}))
+
+    assert run(analytics.get(db, 60, 300))["totals"]["uploads"] == 5
+    monkeypatch.setattr(analytics_module, "ANALYTICS_CACHE_TTL_SECONDS", -1)
+    assert run(analytics.get(db, 60, 300))["totals"]["uploads"] == 15
+
+def test_empty_window(db):
+    result = run(Analytics().get(db, 60, 300))
+    assert result["series"] == [] and result["machines"] == {}
+    assert result["totals"]["failure_rate"] == 0.0
+
+def test_endpoint_requires_an_admin(client, db):
+    assert client.get("/admin/analytics").status_code == 401
+    response = client.get("/admin/analytics", params={"window_minutes": 30}, headers=ADMIN)
+    assert response.status_code == 200 and "totals" in response.json()
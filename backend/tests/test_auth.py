@@ -0,0 +1,75 @@
+import time
+from datetime import timedelta
+import pytest
+from bson import ObjectId
+from jose import JWTError
+from conftest import run
+from routers.admin import create_access_token
+from services.auth import auth_cache, AuthCache, SECRET_KEY, ALGORITHM
+
+PASSWORD = "secret-pass"
+
+def _login(client, email: str = "ada@example.com", password: str = PASSWORD):
+    return client.post("/user/login", data={"username": email, "password": password})
+
+@pytest.fixture
+def token(client):
+    client.post("/user/register", json={"name": "Ada", "email": "ada@example.com", "password": PASSWORD})
+    return _login(client).json()["access_token"]
+
+def _me(client, token: str):
+    return client.get("/user/me", headers={"Authorization": f"Bearer {token}"})
+
+def test_profile_is_served_from_the_cache_without_private_fields(client, db, token):
+    assert _me(client, token).status_code == 200
+    user_id = auth_cache.decode(token, SECRET_KEY, ALGORITHM)["sub"]
+    hits = auth_cache.users.stats["hits"]
+
+    assert _me(client, token).json()["email"] == "ada@example.com"
+    assert auth_cache.users.stats["hits"] == hits + 1
+    assert "password_hash" not in auth_cache.users.get(user_id)
+
+def test_logout_revokes_every_session(client, token):
+    other = _login(client).json()["access_token"]
+    assert client.post("/user/logout", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert _me(client, token).status_code == 401
+    assert _me(client, other).status_code == 401
+    assert _me(client, _login(client).json()["access_token"]).status_code == 200
+
+def test_password_change_keeps_only_the_new_token(client, token):
+    other = _login(client).json()["access_token"]
+    response = client.post(
+        "/user/change-password", headers={"Authorization": f"Bearer {token}"},
+        json={"current_password": PASSWORD, "new_password": "another-pass"}
+    )
+    assert response.status_code == 200
+    assert _me(client, token).status_code == 401 and _me(client, other).status_code == 401
+    assert _me(client, response.json()["access_token"]).status_code == 200
+    assert _login(client).status_code == 401
+    assert _login(client, password="another-pass").status_code == 200
+
+def test_revocation_from_another_worker_applies_once_the_profile_is_reloaded(client, db, token):
+    assert _me(client, token).status_code == 200
+    user_id = auth_cache.decode(token, SECRET_KEY, ALGORITHM)["sub"]
+    run(db["users"].update_one({"_id": ObjectId(user_id)}, {"$inc": {"token_version": 1}}))
+
+    # Within AUTH_CACHE_TTL_SECONDS the cached profile still vouches for it
+    assert _me(client, token).status_code == 200
+    auth_cache.invalidate_user(user_id)
+    assert _me(client, token).status_code == 401
+
+def test_claims_are_never_cached_past_the_token_expiry():
+    cache = AuthCache(ttl=30)
+    token = create_access_token({"sub": "someone"}, expires_delta=timedelta(seconds=2))
+    cache.decode(token, SECRET_KEY, ALGORITHM)
+    expires_at = cache.claims._entries[token][1]
+    assert expires_at - time.monotonic() <= 2
+
+def test_invalid_tokens_are_not_cached():
+    cache = AuthCache()
+    with pytest.raises(JWTError):
+        cache.decode("not-a-token", SECRET_KEY, ALGORITHM)
+    expired = create_access_token({"sub": "someone"}, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(JWTError):
+        cache.decode(expired, SECRET_KEY, ALGORITHM)
+    assert len(cache.claims) == 0
@@ -0,0 +1,74 @@
+from bson import ObjectId
+from conftest import run, add_document
+from models import PrintStatus
+from services.status_machine import transition
+
+def _batch(client, *items):
+    return client.post("/print/batch", json={"items": list(items)})
+
+def _status(db, doc) -> str:
+    return run(db["documents"].find_one({"_id": doc["_id"]}))["status"]
+
+def test_batch_queues_every_document(client, db):
+    first, second = add_document(db), add_document(db, page_count=10)
+
+    response = _batch(
+        client,
+        {"document_id": str(first["_id"])},
+        {"document_id": str(second["_id"]), "copies": 3, "page_range": "2-4"}
+    )
+    assert response.status_code == 202
+    assert response.json()["queued"] == 2
+    assert [result["status"] for result in response.json()["results"]] == [PrintStatus.QUEUED] * 2
+
+    job = run(db["print_jobs"].find_one({"document_id": second["_id"]}))
+    assert (job["copies"], job["page_range"], job["pages"]) == (3, "2-4", 9)
+    assert _status(db, first) == _status(db, second) == PrintStatus.QUEUED
+
+def test_invalid_items_reject_the_whole_batch(client, db):
+    valid = add_document(db)
+    queued = add_document(db, status=PrintStatus.QUEUED)
+    short = add_document(db, page_count=2)
+    reversed_range = add_document(db)
+
+    response = _batch(
+        client,
+        {"document_id": str(valid["_id"])},
+        {"document_id": str(valid["_id"])},
+        {"document_id": "not-an-id"},
+        {"document_id": str(ObjectId())},
+        {"document_id": str(queued["_id"])},
+        {"document_id": str(short["_id"]), "page_range": "5-6"},
+        {"document_id": str(reversed_range["_id"]), "page_range": "3-1"},
+    )
+    assert response.status_code == 422
+    results = response.json()["detail"]["results"]
+    assert [result.get("status_code") for result in results] == [None, 422, 400, 404, 409, 422, 422]
+    assert results[0]["status"] == "valid"
+    assert all(result["status"] == "rejected" for result in results[1:])
+
+    # Nothing was queued, not even the valid item
+    assert _status(db, valid) == PrintStatus.UPLOADED
+    assert run(db["print_jobs"].count_documents({})) == 0
+
+def test_document_taken_during_the_batch_is_reported_per_item(client, db, queue, monkeypatch):
+    taken, free = add_document(db), add_document(db)
+    enqueue_many = queue.enqueue_many
+
+    async def racing_enqueue_many(docs):
+        # A concurrent /print queues one document after validation passed
+        await transition(db, taken["_id"], PrintStatus.QUEUED)
+        return await enqueue_many(docs)
+
+    monkeypatch.setattr(queue, "enqueue_many", racing_enqueue_many)
+    response = _batch(client, {"document_id": str(taken["_id"])}, {"document_id": str(free["_id"])})
+
+    assert response.status_code == 202
+    assert response.json()["queued"] == 1
+    rejected, accepted = response.json()["results"]
+    assert (rejected["status"], rejected["status_code"]) == ("rejected", 409)
+    assert accepted["status"] == PrintStatus.QUEUED and accepted["job_id"]
+    assert run(db["print_jobs"].count_documents({"document_id": taken["_id"]})) == 0
+
+def test_empty_batch_is_rejected(client):
+    assert client.post("/print/batch", json={"items": []}).status_code == 422
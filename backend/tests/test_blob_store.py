@@ -0,0 +1,88 @@
+import io
+import os
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from PIL import Image
+from conftest import run, add_document
+from routers.admin import create_access_token
+from services import blob_store as blob_store_module
+from services.blob_store import blob_store
+
+ADMIN = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+
+def _png(color: str = "red") -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (20, 20), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def store(db, monkeypatch):
+    monkeypatch.setattr(blob_store, "db", db)
+    return blob_store
+
+def _stored(db, document: dict) -> dict:
+    return run(db["documents"].find_one({"_id": ObjectId(document["_id"])}))
+
+def _blob(db, blob_id: str) -> dict:
+    return run(db["blobs"].find_one({"_id": blob_id}))
+
+def test_identical_uploads_share_one_blob(client, db):
+    png = _png()
+    first = _stored(db, client.post("/upload", files={"file": ("a.png", png, "image/png")}).json())
+    second = _stored(db, client.post("/upload", files={"file": ("b.png", png, "image/png")}).json())
+
+    assert first["file_path"] == second["file_path"] and os.path.exists(first["file_path"])
+    assert _blob(db, first["blob_id"])["refcount"] == 2
+
+def test_merged_pdfs_are_committed_to_the_blob_store(client, db):
+    files = [("files", ("a.png", _png("red"), "image/png")), ("files", ("b.png", _png("blue"), "image/png"))]
+    first = client.post("/merge-and-upload", files=files)
+    assert first.status_code == 200
+    second = _stored(db, client.post("/merge-and-upload", files=files).json())
+    first = _stored(db, first.json())
+
+    assert first["blob_id"] and first["file_path"] == second["file_path"]
+    assert first["file_path"].startswith(blob_store.root)
+    assert _blob(db, first["blob_id"])["refcount"] == 2
+    assert os.listdir(blob_store.tmp_dir) == []
+
+def test_deleting_the_last_document_lets_the_collector_remove_the_blob(client, db, store, monkeypatch):
+    png = _png("green")
+    documents = [_stored(db, client.post("/upload", files={"file": ("a.png", png, "image/png")}).json()) for _ in range(2)]
+    blob_id, path = documents[0]["blob_id"], documents[0]["file_path"]
+    monkeypatch.setattr(blob_store_module, "BLOB_GC_GRACE_SECONDS", -1)
+
+    assert client.delete(f"/admin/documents/{documents[0]['_id']}", headers=ADMIN).status_code == 204
+    assert run(store.collect_garbage()) == 0 and os.path.exists(path)
+
+    assert client.delete(f"/admin/documents/{documents[1]['_id']}", headers=ADMIN).status_code == 204
+    assert _blob(db, blob_id)["refcount"] == 0
+    assert run(store.collect_garbage()) == 1
+    assert not os.path.exists(path) and _blob(db, blob_id) is None
+
+def test_unused_blobs_are_kept_for_the_grace_period(db, store):
+    path = store.path_for("ab" * 32, ".pdf")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    run(db["blobs"].insert_one({"_id": "ab" * 32, "path": path, "refcount": 0, "last_used": datetime.utcnow()}))
+
+    assert run(store.collect_garbage()) == 0 and os.path.exists(path)
+
+def test_collector_puts_back_a_file_a_concurrent_commit_kept(db, store):
+    blob_id = "cd" * 32
+    path = store.path_for(blob_id, ".pdf")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4")
+    # commit() recreated the record between the collector's delete and unlink
+    run(db["blobs"].insert_one({"_id": blob_id, "path": path, "refcount": 1, "last_used": datetime.utcnow()}))
+
+    assert run(store._remove_file(db, {"_id": blob_id, "path": path})) is False
+    assert open(path, "rb").read() == b"%PDF-1.4"
+
+def test_busy_documents_cannot_be_deleted(client, db):
+    doc_id = add_document(db, status="queued")["_id"]
+    assert client.delete(f"/admin/documents/{doc_id}", headers=ADMIN).status_code == 409
+    assert client.delete("/admin/documents/not-an-id", headers=ADMIN).status_code == 400
+    assert client.delete(f"/admin/documents/{'0' * 24}", headers=ADMIN).status_code == 404
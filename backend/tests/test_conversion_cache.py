@@ -0,0 +1,71 @@
+import io
+import os
+import pytest
+from PIL import Image
+from conftest import run
+from services import converter
+from services.conversion_cache import ConversionCache
+from services.converter import converter_service
+
+def _file(path, content: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(content)
+    return str(path)
+
+@pytest.fixture
+def cache(tmp_path):
+    return ConversionCache(str(tmp_path / "cache"), max_bytes=1024)
+
+def test_key_covers_content_version_and_options(cache, tmp_path):
+    a = _file(tmp_path / "a.docx", b"same")
+    b = _file(tmp_path / "b.docx", b"same")
+    c = _file(tmp_path / "c.docx", b"other")
+
+    assert run(cache.key_for(a, "1")) == run(cache.key_for(b, "1"))
+    assert len({run(cache.key_for(a, "1")), run(cache.key_for(c, "1")),
+                run(cache.key_for(a, "2")), run(cache.key_for(a, "1", ".png"))}) == 4
+
+def test_hit_places_an_independent_copy(cache, tmp_path):
+    pdf = _file(tmp_path / "out.pdf", b"%PDF converted")
+    assert run(cache.fetch("k", str(tmp_path / "miss.pdf"))) is None
+    run(cache.store("k", pdf))
+
+    target = str(tmp_path / "target.pdf")
+    assert run(cache.fetch("k", target)) == target
+    _file(target, b"changed")
+    assert run(cache.fetch("k", target)) and open(target, "rb").read() == b"%PDF converted"
+    assert cache.get_stats()["hits"] == 2 and cache.get_stats()["misses"] == 1
+
+def test_least_recently_used_entries_are_evicted(cache, tmp_path):
+    for key in ["a", "b"]:
+        run(cache.store(key, _file(tmp_path / f"{key}.pdf", b"x" * 400)))
+    run(cache.fetch("a", str(tmp_path / "a-copy.pdf")))
+    run(cache.store("c", _file(tmp_path / "c.pdf", b"x" * 400)))
+
+    assert list(cache._entries) == ["a", "c"]
+    assert not os.path.exists(cache._path("b"))
+    assert cache.get_stats()["evictions"] == 1 and cache.get_stats()["bytes"] == 800
+
+def test_index_is_rebuilt_from_disk(cache, tmp_path):
+    run(cache.store("k", _file(tmp_path / "out.pdf", b"%PDF")))
+    reopened = ConversionCache(cache.cache_dir, cache.max_bytes)
+    assert run(reopened.fetch("k", str(tmp_path / "target.pdf")))
+
+def test_repeat_conversions_are_served_from_the_cache(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(converter, "conversion_cache", cache)
+    conversions = []
+    convert = converter_service._convert_image_to_pdf
+
+    async def counting_convert(path):
+        conversions.append(path)
+        return await convert(path)
+    monkeypatch.setattr(converter_service, "_convert_image_to_pdf", counting_convert)
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 10), "red").save(buffer, "PNG")
+    first = run(converter_service.convert_to_pdf(_file(tmp_path / "first.png", buffer.getvalue())))
+    second = run(converter_service.convert_to_pdf(_file(tmp_path / "second.png", buffer.getvalue())))
+
+    assert len(conversions) == 1
+    assert second == str(tmp_path / "second.pdf")
+    assert open(first, "rb").read() == open(second, "rb").read()
@@ -0,0 +1,101 @@
+import io
+import os
+import time
+import signal
+import asyncio
+import pytest
+from PIL import Image
+from conftest import run
+from services import conversion_engine as conversion_engine_module
+from services.conversion_engine import ConversionEngine
+from services.converter import converter_service, ConversionError
+
+# Run inside the worker processes, so module-level
+
+def _double(value):
+    return value * 2
+
+def _slow(seconds, value):
+    time.sleep(seconds)
+    return value
+
+def _wedged(pid_path):
+    # Native code stuck past the timeout: SIGALRM never gets through
+    with open(pid_path, "w") as f:
+        f.write(str(os.getpid()))
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+    time.sleep(60)
+
+def _alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # A killed child not yet reaped is a zombie
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+@pytest.fixture
+def engine():
+    engine = ConversionEngine(workers=2)
+    yield engine
+    engine.shutdown()
+
+def test_runs_in_a_worker_process(engine):
+    assert run(engine.run(_double, 21)) == 42
+
+def test_worker_timeout_is_raised(engine):
+    with pytest.raises(TimeoutError):
+        run(engine.run(_slow, 5, "late", timeout=0.3))
+    # The pool keeps working
+    assert run(engine.run(_double, 2)) == 4
+
+def test_wedged_worker_is_killed_without_failing_the_others(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(conversion_engine_module, "CONVERSION_TIMEOUT_GRACE_SECONDS", 0.5)
+    pid_path = str(tmp_path / "pid")
+
+    async def scenario():
+        other = asyncio.ensure_future(engine.run(_slow, 1.5, "done", timeout=10))
+        with pytest.raises(TimeoutError):
+            await engine.run(_wedged, pid_path, timeout=0.2)
+        # The conversion sharing the retired pool still completes
+        assert await other == "done"
+        await asyncio.gather(*engine._reapers)
+        # New work goes to a fresh pool
+        assert await engine.run(_double, 5) == 10
+
+    run(scenario())
+    with open(pid_path) as f:
+        pid = int(f.read())
+    deadline = time.monotonic() + 5
+    while _alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _alive(pid)
+
+def _image(tmp_path, name: str, content: bytes = None) -> str:
+    path = tmp_path / name
+    if content is None:
+        buffer = io.BytesIO()
+        Image.new("RGB", (50, 50), "red").save(buffer, "PNG")
+        content = buffer.getvalue()
+    path.write_bytes(content)
+    return str(path)
+
+def test_image_is_converted(tmp_path):
+    pdf_path = run(converter_service.convert_to_pdf(_image(tmp_path, "photo.png")))
+    assert pdf_path.endswith(".pdf")
+    with open(pdf_path, "rb") as f:
+        assert f.read(5) == b"%PDF-"
+
+def test_failed_conversion_is_raised_not_passed_through(tmp_path):
+    with pytest.raises(ConversionError):
+        run(converter_service.convert_to_pdf(_image(tmp_path, "broken.png", b"not a png")))
+
+def test_merge_of_an_unconvertible_file_is_rejected(client, tmp_path):
+    with open(_image(tmp_path, "photo.png"), "rb") as f:
+        good = f.read()
+    response = client.post("/merge-and-upload", files=[
+        ("files", ("a.png", good, "image/png")),
+        ("files", ("b.png", b"not a png", "image/png")),
+    ])
+    assert response.status_code == 422
+    assert "Could not convert" in response.json()["detail"]
@@ -0,0 +1,83 @@
+from bson import ObjectId
+from conftest import run
+from services import documents
+from services.document_cache import DocumentCache
+
+def _doc(version: int = 1, status: str = "uploaded") -> dict:
+    return {"_id": ObjectId("0123456789abcdef01234567"), "status": status, "version": version}
+
+def _event(doc: dict) -> dict:
+    return {"document_id": str(doc["_id"]), "status": doc["status"], "version": doc["version"]}
+
+def test_hits_are_copies():
+    cache = DocumentCache()
+    doc = _doc()
+    cache.put(doc, cache.generation())
+    cache.get(doc["_id"])["status"] = "mutated"
+    assert cache.get(str(doc["_id"]))["status"] == "uploaded"
+    assert cache.get_stats()["hits"] == 2
+
+def test_read_that_raced_an_event_is_not_cached():
+    cache = DocumentCache()
+    generation = cache.generation()
+    stale = _doc()
+    # The document changes while the read of the old record is in flight
+    run(cache.handle_event(_event(_doc(version=2, status="queued"))))
+    cache.put(stale, generation)
+    assert cache.get(stale["_id"]) is None
+    assert cache.get_stats()["stale_puts"] == 1
+
+def test_older_versions_do_not_replace_newer_ones():
+    cache = DocumentCache()
+    cache.put(_doc(version=3, status="printing"), cache.generation())
+    cache.put(_doc(version=2, status="queued"), cache.generation())
+    assert cache.get(_doc()["_id"])["version"] == 3
+
+def test_events_keep_entries_the_writer_already_stored():
+    cache = DocumentCache()
+    current = _doc(version=2, status="queued")
+    cache.put(current, cache.generation())
+    run(cache.handle_event(_event(current)))
+    assert cache.get(current["_id"]) is not None
+
+    # Another worker moved it on
+    run(cache.handle_event(_event(_doc(version=3, status="printing"))))
+    assert cache.get(current["_id"]) is None
+
+def test_forgotten_changes_still_count_as_changes():
+    cache = DocumentCache(max_entries=1)
+    generation = cache.generation()
+    run(cache.handle_event({"document_id": "a"}))
+    run(cache.handle_event({"document_id": "b"}))
+    assert cache.changed_since("a", generation) and cache.changed_since("b", generation)
+
+def test_entries_expire_and_are_evicted_least_recently_used_first():
+    cache = DocumentCache(max_entries=2, ttl=60)
+    ids = [ObjectId() for _ in range(3)]
+    for object_id in ids:
+        cache.put({"_id": object_id, "version": 1}, cache.generation())
+    assert cache.get(ids[0]) is None and cache.get(ids[2]) is not None
+    assert cache.get_stats()["evictions"] == 1
+
+    expired = DocumentCache(ttl=0)
+    expired.put(_doc(), expired.generation())
+    assert expired.get(_doc()["_id"]) is None
+
+class RacingCollection:
+    """find_one returns the old record after the document changed underneath."""
+
+    def __init__(self, cache: DocumentCache, record: dict):
+        self.cache = cache
+        self.record = record
+
+    async def find_one(self, query):
+        await self.cache.handle_event(_event(_doc(version=2, status="queued")))
+        return dict(self.record)
+
+def test_find_document_does_not_cache_a_stale_read(monkeypatch):
+    cache = DocumentCache()
+    monkeypatch.setattr(documents, "document_cache", cache)
+    db = {"documents": RacingCollection(cache, _doc())}
+
+    assert run(documents.find_document(db, str(_doc()["_id"])))["version"] == 1
+    assert cache.get(_doc()["_id"]) is None
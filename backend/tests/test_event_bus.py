@@ -0,0 +1,95 @@
+import asyncio
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import CollectionInvalid
+from services import event_bus as event_bus_module
+from services.event_bus import InMemoryEventBus, MongoEventBus, EVENT_BUS_COLLECTION
+
+def test_failing_handler_does_not_stop_the_others():
+    bus = InMemoryEventBus()
+    received = []
+
+    async def broken(event):
+        raise RuntimeError("boom")
+
+    async def working(event):
+        received.append(event)
+
+    bus.subscribe(broken)
+    bus.subscribe(working)
+    asyncio.run(bus.publish({"document_id": "1"}))
+    assert received == [{"document_id": "1"}]
+
+def _shared_db():
+    db = AsyncMongoMockClient()["event_bus_test"]
+
+    async def create_collection(name, **options):
+        # mongomock has no capped collections; behave as if another worker created it
+        raise CollectionInvalid(f"collection {name} already exists")
+    db.create_collection = create_collection
+    return db
+
+async def _wait_for(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out waiting for events"
+        await asyncio.sleep(0.01)
+
+def test_mongo_bus_shares_events_between_processes(monkeypatch):
+    monkeypatch.setattr(event_bus_module, "EVENT_BUS_RETRY_SECONDS", 0.01)
+
+    async def scenario():
+        db = _shared_db()
+        # Published before either process started: must not be replayed
+        await db[EVENT_BUS_COLLECTION].insert_one({"origin": "old", "event": {"document_id": "old"}})
+
+        first, second = MongoEventBus(), MongoEventBus()
+        received = {"first": [], "second": []}
+        for name, bus in [("first", first), ("second", second)]:
+            async def handler(event, name=name):
+                received[name].append(event["document_id"])
+            bus.subscribe(handler)
+            await bus.start(db)
+
+        try:
+            await first.publish({"document_id": "a"})
+            await second.publish({"document_id": "b"})
+            await first.publish({"document_id": "c"})
+            await _wait_for(lambda: len(received["first"]) == 3 and len(received["second"]) == 3)
+            # Give the tails a few more rounds to show nothing is delivered twice
+            await asyncio.sleep(0.1)
+        finally:
+            await first.stop()
+            await second.stop()
+
+        # Local events are delivered at publish time, remote ones in publish order
+        assert received["first"] == ["a", "c", "b"]
+        assert received["second"] == ["b", "a", "c"]
+
+    asyncio.run(scenario())
+
+def test_mongo_bus_resumes_after_its_position_rolled_out(monkeypatch):
+    monkeypatch.setattr(event_bus_module, "EVENT_BUS_RETRY_SECONDS", 0.01)
+
+    async def scenario():
+        db = _shared_db()
+
+        publisher, listener = MongoEventBus(), MongoEventBus()
+        received = []
+
+        async def handler(event):
+            received.append(event["document_id"])
+        listener.subscribe(handler)
+        await publisher.start(db)
+        await listener.start(db)
+        try:
+            await publisher.publish({"document_id": "a"})
+            await _wait_for(lambda: received == ["a"])
+            # The capped collection overwrote everything the listener had seen
+            await db[EVENT_BUS_COLLECTION].delete_many({})
+            await publisher.publish({"document_id": "b"})
+            await _wait_for(lambda: received == ["a", "b"])
+        finally:
+            await publisher.stop()
+            await listener.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+import pytest
+from pydantic import ValidationError
+from models import PrintOptions, PrintOptionsInput
+from services.page_ranges import parse_page_range, format_page_ranges, selected_page_count
+
+def test_parse_sorts_and_merges_ranges():
+    assert parse_page_range("8, 1-3, 2-5") == [(1, 5), (8, 8)]
+
+def test_parse_merges_adjacent_ranges():
+    assert parse_page_range("1-2,3,5") == [(1, 3), (5, 5)]
+
+def test_parse_ignores_empty_parts():
+    assert parse_page_range(" 4 ,, 2 ") == [(2, 2), (4, 4)]
+
+def test_parse_clips_to_page_count():
+    assert parse_page_range("2-10", 4) == [(2, 4)]
+    assert parse_page_range("1,9-12", 4) == [(1, 1)]
+
+def test_parse_rejects_range_past_the_document():
+    with pytest.raises(ValueError, match="selects no pages"):
+        parse_page_range("5-8", 4)
+
+@pytest.mark.parametrize("page_range", ["", " , ", "0", "3-1", "a", "1-2-3", "-2", "2-", "1.5"])
+def test_parse_rejects_malformed_ranges(page_range):
+    with pytest.raises(ValueError):
+        parse_page_range(page_range)
+
+def test_format_page_ranges():
+    assert format_page_ranges([(1, 5), (8, 8)]) == "1-5,8"
+
+def test_selected_page_count():
+    assert selected_page_count("1-3,5", 10) == 4
+    assert selected_page_count("9-20", 10) == 2
+    assert selected_page_count(None, 10) == 10
+    # Unknown page count: only the range is known
+    assert selected_page_count("1-3", None) == 3
+
+def test_selected_page_count_falls_back_for_invalid_ranges():
+    assert selected_page_count("oops", 7) == 7
+
+def test_client_print_options_validate_page_range():
+    assert PrintOptionsInput(page_range="1-3").page_range == "1-3"
+    assert PrintOptionsInput(page_range="  ").page_range is None
+    with pytest.raises(ValidationError):
+        PrintOptionsInput(page_range="3-1")
+
+def test_stored_print_options_are_not_revalidated():
+    # Documents stored before stricter parsing must still load
+    assert PrintOptions(page_range="3-1").page_range == "3-1"
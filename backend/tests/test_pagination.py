@@ -0,0 +1,78 @@
+import base64
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from conftest import run, add_document
+from routers.admin import create_access_token
+from services.documents import encode_cursor, decode_cursor, list_documents
+
+def _add_documents(db, count: int, ties: int = 1) -> list:
+    """`count` documents, `ties` of them sharing each upload_time; newest first."""
+    start = datetime(2024, 1, 1)
+    records = [add_document(db, upload_time=start + timedelta(minutes=i // ties)) for i in range(count)]
+    return sorted(records, key=lambda r: (r["upload_time"], r["_id"]), reverse=True)
+
+def _all_pages(db, limit: int, **kwargs) -> list:
+    pages, cursor = [], None
+    while True:
+        records, cursor = run(list_documents(db, {}, limit=limit, cursor=cursor, **kwargs))
+        pages.append([record["_id"] for record in records])
+        if cursor is None:
+            return pages
+
+def test_cursor_round_trip():
+    record = {"upload_time": datetime(2024, 5, 1, 12, 30, 15, 250000), "_id": ObjectId()}
+    assert decode_cursor(encode_cursor(record)) == (record["upload_time"], record["_id"])
+
+@pytest.mark.parametrize("token", [
+    "not a cursor",
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    base64.urlsafe_b64encode(b'{"t": "2024-01-01T00:00:00"}').decode(),
+    base64.urlsafe_b64encode(b'{"t": "yesterday", "id": "65a000000000000000000000"}').decode(),
+    base64.urlsafe_b64encode(b'{"t": "2024-01-01T00:00:00", "id": "nope"}').decode(),
+])
+def test_invalid_cursor(token):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(token)
+
+def test_pages_cover_every_document_once_newest_first(db):
+    expected = [str(record["_id"]) for record in _add_documents(db, 7)]
+    pages = _all_pages(db, limit=3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == expected
+
+def test_pages_break_upload_time_ties_by_id(db):
+    # Pages end in the middle of a group of documents uploaded at the same time
+    expected = [str(record["_id"]) for record in _add_documents(db, 9, ties=4)]
+    assert sum(_all_pages(db, limit=2), []) == expected
+
+def test_last_full_page_has_no_next_cursor(db):
+    _add_documents(db, 6)
+    assert [len(page) for page in _all_pages(db, limit=3)] == [3, 3]
+
+def test_cursor_continues_with_the_query(db):
+    for machine_id in ["a", "b", "a", "a", "b"]:
+        add_document(db, machine_id=machine_id)
+    records, cursor = run(list_documents(db, {"machine_id": "a"}, limit=2))
+    more, cursor = run(list_documents(db, {"machine_id": "a"}, limit=2, cursor=cursor))
+    assert len(records) == 2 and len(more) == 1 and cursor is None
+    assert all(record["machine_id"] == "a" for record in records + more)
+
+def test_upload_time_only_returned_when_selected(db):
+    _add_documents(db, 3)
+    records, cursor = run(list_documents(db, {}, limit=2, fields=["status"]))
+    assert set(records[0]) == {"_id", "status"}
+    # The cursor is still built from upload_time
+    assert decode_cursor(cursor)[1] == ObjectId(records[-1]["_id"])
+
+def test_admin_documents_pages_and_rejects_bad_cursor(client, db):
+    _add_documents(db, 3)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+
+    first = client.get("/admin/documents", params={"limit": 2}, headers=headers)
+    assert first.status_code == 200
+    second = client.get("/admin/documents", params={"limit": 2, "cursor": first.json()["next_cursor"]}, headers=headers)
+    assert len(second.json()["documents"]) == 1 and second.json()["next_cursor"] is None
+
+    response = client.get("/admin/documents", params={"cursor": "garbage"}, headers=headers)
+    assert response.status_code == 400
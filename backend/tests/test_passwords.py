@@ -0,0 +1,52 @@
+import time
+import asyncio
+import pytest
+from conftest import run
+from services import passwords
+from services.passwords import PasswordHasher, PasswordHasherBusy
+
+def test_hash_and_verify_round_trip():
+    hasher = PasswordHasher()
+    hashed = run(hasher.hash("secret-pass"))
+    assert run(hasher.verify("secret-pass", hashed)) is True
+    assert run(hasher.verify("wrong", hashed)) is False
+    assert hasher.get_metrics()["calls"] == 3 and hasher.get_metrics()["pending"] == 0
+
+def test_hashing_does_not_block_the_event_loop():
+    async def scenario():
+        hasher = PasswordHasher()
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await hasher.hash("secret-pass")
+        task.cancel()
+        return ticks
+
+    assert run(scenario()) > 3
+
+def test_backlog_beyond_the_limit_is_shed(monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_MAX_PENDING", 2)
+
+    async def scenario():
+        hasher = PasswordHasher()
+        calls = [hasher._run(time.sleep, 0.1) for _ in range(3)]
+        return hasher, await asyncio.gather(*calls, return_exceptions=True)
+
+    hasher, results = run(scenario())
+    assert [isinstance(result, PasswordHasherBusy) for result in results] == [False, False, True]
+    assert hasher.get_metrics()["rejected"] == 1 and hasher.get_metrics()["pending"] == 0
+
+@pytest.mark.parametrize("path, username", [("/user/login", "ada@example.com"), ("/admin/login", "admin")])
+def test_busy_hasher_answers_503_with_retry_after(client, monkeypatch, path, username):
+    client.post("/user/register", json={"name": "Ada", "email": "ada@example.com", "password": "secret-pass"})
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_MAX_PENDING", 0)
+
+    response = client.post(path, data={"username": username, "password": "secret-pass"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(passwords.PASSWORD_HASH_RETRY_AFTER)
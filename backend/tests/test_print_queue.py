@@ -0,0 +1,216 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from conftest import run, add_document
+from models import PrintStatus
+from services import print_queue as print_queue_module
+from services.print_queue import JOB_UNKNOWN
+from services.printer import printer_service, PrintSubmitUnknown
+
+def _enqueue(queue, db, **fields) -> dict:
+    doc = add_document(db, **fields)
+    run(queue.enqueue(doc))
+    return doc
+
+def _status(db, doc) -> str:
+    return run(db["documents"].find_one({"_id": doc["_id"]}))["status"]
+
+def test_claim_leases_the_oldest_job(queue, db):
+    first = _enqueue(queue, db)
+    _enqueue(queue, db)
+
+    job = run(queue._claim(None))
+    assert job["document_id"] == first["_id"]
+    assert job["status"] == PrintStatus.PRINTING
+    assert job["attempts"] == 1
+    assert job["lease_until"] > datetime.utcnow()
+
+def test_claimed_job_is_not_claimed_again(queue, db):
+    _enqueue(queue, db)
+    assert run(queue._claim(None)) is not None
+    assert run(queue._claim(None)) is None
+
+def test_expired_lease_is_recovered(queue, db):
+    doc = _enqueue(queue, db)
+    job = run(queue._claim(None))
+    run(db["print_jobs"].update_one(
+        {"_id": job["_id"]}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}}
+    ))
+
+    recovered = run(queue._claim(None))
+    assert recovered["_id"] == job["_id"] and recovered["document_id"] == doc["_id"]
+    assert recovered["attempts"] == 2
+    assert recovered["lease_until"] > datetime.utcnow()
+
+def test_expired_lease_is_recovered_before_queued_jobs(queue, db):
+    _enqueue(queue, db)
+    job = run(queue._claim(None))
+    _enqueue(queue, db)
+    run(db["print_jobs"].update_one(
+        {"_id": job["_id"]}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}}
+    ))
+    assert run(queue._claim(None))["_id"] == job["_id"]
+
+def test_claim_only_takes_jobs_for_this_printer(queue, db):
+    doc = add_document(db)
+    run(queue.enqueue(doc, printer_name="office"))
+    assert run(queue._claim("lobby")) is None
+    assert run(queue._claim("office"))["document_id"] == doc["_id"]
+
+def test_claim_rotates_between_machines(queue, db):
+    for machine_id in ["a", "a", "a", "b"]:
+        _enqueue(queue, db, machine_id=machine_id)
+    claimed = [run(queue._claim(None))["machine_id"] for _ in range(4)]
+    assert claimed == ["a", "b", "a", "a"]
+
+def test_run_completes_the_document(queue, db, monkeypatch):
+    async def print_file(file_path, **kwargs):
+        return None
+    monkeypatch.setattr(printer_service, "print_file", print_file)
+    doc = _enqueue(queue, db)
+
+    job = run(queue._claim(None))
+    run(queue._run(job, None))
+    assert _status(db, doc) == PrintStatus.COMPLETED
+    assert run(db["print_jobs"].find_one({"_id": job["_id"]}))["status"] == PrintStatus.COMPLETED
+
+def test_dropped_job_is_finished_so_retention_expires_it(queue, db):
+    doc = _enqueue(queue, db)
+    job = run(queue._claim(None))
+    # The document moved on without this job
+    run(db["documents"].update_one({"_id": doc["_id"]}, {"$set": {"status": PrintStatus.COMPLETED}}))
+
+    run(queue._run(job, None))
+    dropped = run(db["print_jobs"].find_one({"_id": job["_id"]}))
+    assert dropped["status"] == PrintStatus.FAILED
+    assert dropped["finished_at"] is not None and dropped["lease_until"] is None
+
+def test_job_abandoned_after_repeated_interruptions(queue, db, monkeypatch):
+    monkeypatch.setattr(print_queue_module, "PRINT_JOB_MAX_ATTEMPTS", 1)
+    doc = _enqueue(queue, db)
+    run(db["print_jobs"].update_one({"document_id": doc["_id"]}, {"$set": {"attempts": 1}}))
+
+    job = run(queue._claim(None))
+    run(queue._run(job, None))
+    assert _status(db, doc) == PrintStatus.FAILED
+
+def test_timed_out_submission_is_reconciled_not_retried(queue, db, monkeypatch):
+    async def print_file(file_path, title=None, **kwargs):
+        raise PrintSubmitUnknown("Spooler call timed out", title)
+
+    async def find_job(title):
+        return None
+
+    monkeypatch.setattr(printer_service, "print_file", print_file)
+    monkeypatch.setattr(printer_service, "find_job", find_job)
+    monkeypatch.setattr(print_queue_module, "PRINT_JOB_RECONCILE_SECONDS", 0)
+    doc = _enqueue(queue, db)
+
+    job = run(queue._claim(None))
+    run(queue._run(job, None))
+    stored = run(db["print_jobs"].find_one({"_id": job["_id"]}))
+    assert stored["status"] == JOB_UNKNOWN
+    assert _status(db, doc) == PrintStatus.PRINTING
+    # Neither claimable nor recovered as an expired lease
+    assert run(queue._claim(None)) is None
+
+    assert run(queue._reconcile(None)) is True
+    assert _status(db, doc) == PrintStatus.FAILED
+    assert run(queue._reconcile(None)) is False
+
+def test_wake_up_before_waiting_is_not_lost(queue, monkeypatch):
+    monkeypatch.setattr(print_queue_module, "PRINT_QUEUE_POLL_SECONDS", 5)
+
+    async def scenario():
+        monkeypatch.setattr(queue, "_wakeup", asyncio.Condition())
+        monkeypatch.setattr(queue, "_wakeups", 0)
+        seen = queue._wakeups
+        # A job arrives while the worker is still claiming
+        await queue._wake()
+        await asyncio.wait_for(queue._wait_for_work(seen), timeout=1)
+
+    run(scenario())
+
+def test_wake_up_reaches_every_idle_worker(queue, monkeypatch):
+    monkeypatch.setattr(print_queue_module, "PRINT_QUEUE_POLL_SECONDS", 5)
+
+    async def scenario():
+        monkeypatch.setattr(queue, "_wakeup", asyncio.Condition())
+        monkeypatch.setattr(queue, "_wakeups", 0)
+        waiters = [asyncio.create_task(queue._wait_for_work(0)) for _ in range(3)]
+        await asyncio.sleep(0)
+        await queue._wake(3)
+        await asyncio.wait_for(asyncio.gather(*waiters), timeout=1)
+
+    run(scenario())
+
+def test_lease_is_renewed_while_the_job_runs(queue, db, monkeypatch):
+    monkeypatch.setattr(print_queue_module, "PRINT_JOB_LEASE_SECONDS", 0.3)
+    _enqueue(queue, db)
+    job = run(queue._claim(None))
+
+    async def slow_job():
+        async with queue._hold(job["_id"], PrintStatus.PRINTING, "lease_until"):
+            await asyncio.sleep(0.5)
+
+    run(slow_job())
+    renewed = run(db["print_jobs"].find_one({"_id": job["_id"]}))["lease_until"]
+    assert renewed > job["lease_until"]
+    # Past the original lease, yet nobody else can take the job
+    assert renewed > datetime.utcnow() - timedelta(seconds=0.1)
+
+def _trimmed_print(queue, db, monkeypatch, print_file) -> str:
+    """Run a page-range job whose PDF is trimmed; returns the trimmed copy's path."""
+    trimmed = []
+
+    async def extract_pages(pdf_path, ranges, output_path):
+        with open(output_path, "wb") as f:
+            f.write(b"%PDF-1.4")
+        trimmed.append(output_path)
+        return output_path
+
+    monkeypatch.setattr(print_queue_module, "extract_pages", extract_pages)
+    monkeypatch.setattr(printer_service, "print_file", print_file)
+    _enqueue(queue, db, page_count=5, print_options={"copies": 1, "color_mode": "bw", "page_range": "2-3"})
+    run(queue._run(run(queue._claim(None)), None))
+    return trimmed[0]
+
+def test_trimmed_copy_is_removed_after_submit(queue, db, monkeypatch):
+    async def print_file(file_path, **kwargs):
+        return None
+    assert not os.path.exists(_trimmed_print(queue, db, monkeypatch, print_file))
+
+def test_trimmed_copy_is_kept_while_a_timed_out_submit_may_read_it(queue, db, monkeypatch):
+    async def print_file(file_path, title=None, **kwargs):
+        raise PrintSubmitUnknown("Spooler call timed out", title)
+    assert os.path.exists(_trimmed_print(queue, db, monkeypatch, print_file))
+
+def test_spooler_wait_timeout_is_reconciled_not_failed(queue, db, monkeypatch):
+    async def print_file(file_path, **kwargs):
+        return 42
+
+    async def wait_for_job(job_id):
+        raise TimeoutError("CUPS job 42 still pending")
+
+    async def find_job(title):
+        raise AssertionError("the recorded spooler job id is used")
+
+    monkeypatch.setattr(printer_service, "print_file", print_file)
+    monkeypatch.setattr(printer_service, "wait_for_job", wait_for_job)
+    monkeypatch.setattr(printer_service, "find_job", find_job)
+    monkeypatch.setattr(print_queue_module, "PRINT_JOB_RECONCILE_SECONDS", 0)
+    doc = _enqueue(queue, db)
+
+    job = run(queue._claim(None))
+    run(queue._run(job, None))
+    stored = run(db["print_jobs"].find_one({"_id": job["_id"]}))
+    assert (stored["status"], stored["spooler_job_id"]) == (JOB_UNKNOWN, 42)
+    assert _status(db, doc) == PrintStatus.PRINTING
+
+    async def finished(job_id):
+        assert job_id == 42
+
+    monkeypatch.setattr(printer_service, "wait_for_job", finished)
+    assert run(queue._reconcile(None)) is True
+    assert _status(db, doc) == PrintStatus.COMPLETED
@@ -0,0 +1,60 @@
+import sys
+import types
+import pytest
+from conftest import run
+from services.printer import PrinterService, PrintSubmitUnknown
+
+class FakeConnection:
+    """CUPS connection whose first `fail` calls break like a dropped socket."""
+
+    def __init__(self, cups, fail: int):
+        self.cups = cups
+        self.fail = fail
+
+    def _call(self, method, result):
+        self.cups.calls.append(method)
+        if len(self.cups.calls) <= self.fail:
+            raise self.cups.HTTPError(-1)
+        return result
+
+    def printFile(self, printer, path, title, options):
+        return self._call("printFile", 42)
+
+    def getJobs(self, **kwargs):
+        return self._call("getJobs", {7: {"job-name": "Kiosk Print Job a"}, 9: {"job-name": "other"}})
+
+@pytest.fixture
+def fake_cups(monkeypatch):
+    cups = types.ModuleType("cups")
+    cups.HTTPError = type("HTTPError", (Exception,), {})
+    cups.calls = []
+    cups.fail = 0
+    cups.Connection = lambda: FakeConnection(cups, cups.fail)
+    monkeypatch.setitem(sys.modules, "cups", cups)
+    return cups
+
+@pytest.fixture
+def printer():
+    service = PrinterService()
+    service.is_linux, service.is_windows = True, False
+    yield service
+    service.shutdown()
+
+def test_submit_returns_the_cups_job_id(printer, fake_cups, tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.4")
+    assert run(printer.print_file(str(path), printer_name="office")) == 42
+
+def test_broken_submit_is_not_retried(printer, fake_cups, tmp_path):
+    fake_cups.fail = 1
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.4")
+    with pytest.raises(PrintSubmitUnknown) as error:
+        run(printer.print_file(str(path), printer_name="office", title="Kiosk Print Job a"))
+    assert error.value.title == "Kiosk Print Job a"
+    assert fake_cups.calls == ["printFile"]
+
+def test_idempotent_calls_reconnect_and_retry(printer, fake_cups):
+    fake_cups.fail = 1
+    assert run(printer.find_job("Kiosk Print Job a")) == 7
+    assert fake_cups.calls == ["getJobs", "getJobs"]
@@ -0,0 +1,40 @@
+import pytest
+from starlette.requests import Request
+from routers.admin import create_access_token
+from services import rate_limit
+from services.rate_limit import limiter, client_key, LOGIN_RATE_LIMIT
+
+LOGIN_LIMIT = int(LOGIN_RATE_LIMIT.split("/")[0])
+
+@pytest.fixture
+def limited(monkeypatch):
+    monkeypatch.setattr(limiter, "enabled", True)
+    limiter.reset()
+    yield
+    limiter.reset()
+
+def _request(headers: dict = None, query: str = "") -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "query_string": query.encode(),
+        "client": ("10.0.0.7", 1234)
+    })
+
+@pytest.mark.parametrize("path, username", [("/admin/login", "nobody"), ("/user/login", "nobody@example.com")])
+def test_login_attempts_are_limited_per_address(client, limited, path, username):
+    for _ in range(LOGIN_LIMIT):
+        response = client.post(path, data={"username": username, "password": "guess"})
+        assert response.status_code == 401
+    assert client.post(path, data={"username": username, "password": "guess"}).status_code == 429
+
+def test_limits_are_off_when_disabled(client):
+    for _ in range(LOGIN_LIMIT + 1):
+        assert client.post("/admin/login", data={"username": "nobody", "password": "guess"}).status_code == 401
+
+def test_client_key_prefers_user_then_machine_then_address():
+    token = create_access_token({"sub": "ada@example.com"})
+    assert client_key(_request({"Authorization": f"Bearer {token}", "X-Machine-ID": "kiosk-1"})) == "user:ada@example.com"
+    assert client_key(_request({"X-Machine-ID": "kiosk-1"})) == "machine:kiosk-1"
+    assert client_key(_request(query="machine_id=kiosk-2")) == "machine:kiosk-2"
+    assert client_key(_request({"Authorization": "Bearer garbage"})) == "ip:10.0.0.7"
@@ -0,0 +1,53 @@
+import time
+import pytest
+from conftest import run
+from models import PrintStatus, ColorMode
+from services import scheduler
+from services.scheduler import printer_scheduler, PrinterBusyError, JOB_UNKNOWN
+
+@pytest.fixture
+def inventory(monkeypatch):
+    def set_inventory(printers: dict):
+        monkeypatch.setattr(printer_scheduler, "_inventory", printers)
+        monkeypatch.setattr(printer_scheduler, "_refreshed_at", time.monotonic())
+    set_inventory({})
+    return set_inventory
+
+def _job(printer_name, status=PrintStatus.QUEUED, pages=1):
+    return {"printer_name": printer_name, "status": status, "pages": pages}
+
+def test_least_loaded_printer_is_picked(db, inventory):
+    inventory({"a": {}, "b": {}})
+    assert run(printer_scheduler.select_printer(db, load={"a": {"jobs": 1, "pages": 9}, "b": {"jobs": 1, "pages": 5}})) == "b"
+    assert run(printer_scheduler.select_printer(db, load={"a": {"jobs": 1, "pages": 1}, "b": {"jobs": 2, "pages": 2}})) == "a"
+
+def test_color_jobs_go_to_color_printers_and_bw_jobs_keep_them_free(db, inventory):
+    inventory({"mono": {"color": False}, "color": {"color": True}})
+    assert run(printer_scheduler.select_printer(db, color_mode=ColorMode.COLOR)) == "color"
+    assert run(printer_scheduler.select_printer(db, color_mode=ColorMode.BW)) == "mono"
+
+def test_parked_jobs_count_towards_the_load(db, inventory):
+    run(db["print_jobs"].insert_many([
+        _job("a", JOB_UNKNOWN, pages=3), _job("a", PrintStatus.PRINTING, pages=2), _job("a", PrintStatus.COMPLETED)
+    ]))
+    assert run(printer_scheduler.get_load(db)) == {"a": {"jobs": 2, "pages": 5}}
+
+def test_full_printers_are_refused(db, inventory, monkeypatch):
+    inventory({"a": {}})
+    monkeypatch.setattr(scheduler, "PRINTER_MAX_QUEUE_DEPTH", 1)
+    run(db["print_jobs"].insert_one(_job("a", JOB_UNKNOWN)))
+    with pytest.raises(PrinterBusyError):
+        run(printer_scheduler.select_printer(db))
+
+def test_empty_inventory_means_the_system_default(db, inventory):
+    assert run(printer_scheduler.select_printer(db, allowed=["a"])) is None
+
+def test_configured_printers_missing_from_the_inventory_are_not_silently_replaced(db, inventory):
+    inventory({"other": {}})
+    with pytest.raises(PrinterBusyError, match="configured"):
+        run(printer_scheduler.select_printer(db, allowed=["a"]))
+
+def test_no_accepting_printer_is_busy_not_the_default(db, inventory):
+    inventory({"a": {"accepting": False}, "b": {"accepting": False}})
+    with pytest.raises(PrinterBusyError, match="accepting"):
+        run(printer_scheduler.select_printer(db))
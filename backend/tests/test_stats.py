@@ -0,0 +1,76 @@
+import pytest
+from mongomock_motor import AsyncMongoMockCollection
+from conftest import run, add_document
+from models import DocumentCreate, PrintOptions, PrintStatus
+from services.documents import create_document
+from services.printer import printer_service
+from services.stats import stats_counters, ROLLUPS
+
+def _create(db, **fields):
+    doc = DocumentCreate(
+        filename="doc.pdf", original_filename="doc.pdf", file_size=10, file_type="application/pdf",
+        file_path="doc.pdf", print_options=PrintOptions(copies=2), page_count=3, **fields
+    )
+    return run(create_document(db, doc))
+
+@pytest.fixture
+def printed(queue, db, monkeypatch):
+    """Upload a document on kiosk k1 and print it to completion."""
+    async def print_file(file_path, **kwargs):
+        return None
+
+    monkeypatch.setattr(printer_service, "print_file", print_file)
+    document = _create(db, machine_id="k1")
+    record = run(db["documents"].find_one({}))
+    run(queue.enqueue(record))
+    run(queue._run(run(queue._claim(None)), None))
+    return document
+
+def test_counters_follow_the_document_through_printing(db, printed):
+    stats = run(stats_counters.get_stats(db))
+    for scope in (stats["global"], stats["machines"]["k1"]):
+        assert scope["documents"] == 1
+        assert scope["status"][PrintStatus.COMPLETED.value] == 1
+        assert sum(scope["status"].values()) == 1
+        assert (scope["prints_completed"], scope["pages"], scope["copies"]) == (1, 6, 2)
+    assert stats["today"]["pages"] == 6
+
+def test_rollups_record_queue_wait_and_print_time(db, printed):
+    rollups = run(db[ROLLUPS].find({"machine_id": "k1"}).to_list(None))
+    totals = {}
+    for rollup in rollups:
+        for key, value in rollup.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                totals[key] = totals.get(key, 0) + value
+    assert (totals["uploads"], totals["queued"], totals["started"], totals["completed"]) == (1, 1, 1, 1)
+    assert totals["print_count"] == 1
+    assert totals["queue_wait_seconds"] >= 0 and totals["print_seconds"] >= 0
+
+def test_counters_are_built_once_from_existing_documents(db):
+    add_document(db, machine_id="k1", status=PrintStatus.COMPLETED,
+                 print_options={"copies": 2, "color_mode": "bw", "page_range": None}, page_count=4)
+    add_document(db, machine_id="k2", status=PrintStatus.FAILED)
+    add_document(db)
+
+    run(stats_counters.ensure_counters(db))
+    stats = run(stats_counters.get_stats(db))
+    assert stats["global"]["documents"] == 3
+    assert stats["global"]["pages"] == 8
+    assert stats["machines"]["k1"]["prints_completed"] == 1
+    assert stats["machines"]["k2"]["prints_failed"] == 1
+
+    # Existing counters are left alone
+    add_document(db)
+    run(stats_counters.ensure_counters(db))
+    assert run(stats_counters.get_stats(db))["global"]["documents"] == 3
+
+def test_failed_counter_writes_are_counted(db, monkeypatch):
+    async def bulk_write(self, requests, ordered=True):
+        raise ConnectionError("counters unreachable")
+
+    monkeypatch.setattr(AsyncMongoMockCollection, "bulk_write", bulk_write)
+    monkeypatch.setattr(stats_counters, "write_failures", 0)
+    _create(db)
+    assert run(stats_counters.get_stats(db))["write_failures"] == 1
+    # The document itself was stored
+    assert run(db["documents"].count_documents({})) == 1
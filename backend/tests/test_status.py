@@ -0,0 +1,66 @@
+import asyncio
+from collections import OrderedDict
+import httpx
+import pytest
+from conftest import run, add_document, app
+from models import PrintStatus
+from services.status_machine import transition
+from services.status_versions import status_versions
+
+@pytest.fixture(autouse=True)
+def fresh_versions(monkeypatch):
+    monkeypatch.setattr(status_versions, "_etags", OrderedDict())
+    monkeypatch.setattr(status_versions, "_waiters", {})
+
+def test_unchanged_document_is_not_modified(client, db):
+    doc_id = str(add_document(db)["_id"])
+    first = client.get(f"/status/{doc_id}")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.json()["status"] == PrintStatus.UPLOADED
+
+    assert client.get(f"/status/{doc_id}", headers={"If-None-Match": etag}).status_code == 304
+
+def test_not_modified_is_answered_without_reading_the_document(client, db):
+    doc = add_document(db)
+    etag = client.get(f"/status/{doc['_id']}").headers["ETag"]
+    run(db["documents"].delete_one({"_id": doc["_id"]}))
+    assert client.get(f"/status/{doc['_id']}", headers={"If-None-Match": etag}).status_code == 304
+
+def test_a_status_change_invalidates_the_etag(client, db):
+    doc = add_document(db)
+    etag = client.get(f"/status/{doc['_id']}").headers["ETag"]
+    run(transition(db, doc["_id"], PrintStatus.QUEUED))
+
+    response = client.get(f"/status/{doc['_id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.json()["status"] == PrintStatus.QUEUED
+    assert response.headers["ETag"] != etag
+
+def _long_poll(db, doc: dict, wait: float, change=None):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            etag = (await http.get(f"/status/{doc['_id']}")).headers["ETag"]
+            poll = asyncio.create_task(
+                http.get(f"/status/{doc['_id']}", params={"wait": wait}, headers={"If-None-Match": etag})
+            )
+            await asyncio.sleep(0.05)
+            assert not poll.done()
+            if change:
+                await change()
+            return await asyncio.wait_for(poll, timeout=5)
+    return run(scenario())
+
+def test_long_poll_returns_as_soon_as_the_document_changes(client, db):
+    doc = add_document(db)
+    response = _long_poll(db, doc, wait=30, change=lambda: transition(db, doc["_id"], PrintStatus.QUEUED))
+    assert response.status_code == 200 and response.json()["status"] == PrintStatus.QUEUED
+    assert status_versions._waiters == {}
+
+def test_long_poll_times_out_as_not_modified(client, db):
+    doc = add_document(db)
+    assert _long_poll(db, doc, wait=0.2).status_code == 304
+    assert status_versions._waiters == {}
+
+def test_bad_ids(client):
+    assert client.get("/status/nope").status_code == 400
+    assert client.get(f"/status/{'0' * 24}").status_code == 404
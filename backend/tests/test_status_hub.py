@@ -0,0 +1,118 @@
+import json
+import asyncio
+from services import status_hub
+from services.status_hub import ConnectionManager, status_topics
+
+class FakeWebSocket:
+    def __init__(self, stalled: bool = False):
+        self.sent = []
+        self.closed_with = None
+        self.stalled = stalled
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(json.loads(message))
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+async def _settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+async def _disconnect_all(manager: ConnectionManager):
+    senders = [subscriber.sender for subscriber in manager.active_connections.values()]
+    for websocket in list(manager.active_connections):
+        manager.disconnect(websocket)
+    await asyncio.gather(*senders, return_exceptions=True)
+
+def test_events_reach_matching_topics_and_unfiltered_connections():
+    async def scenario():
+        manager = ConnectionManager()
+        everything, document, machine, user = (FakeWebSocket() for _ in range(4))
+        await manager.connect(everything)
+        await manager.connect(document, status_topics(document_id="d1"))
+        await manager.connect(machine, status_topics(machine_id="m1"))
+        await manager.connect(user, status_topics(user_id="u1"))
+
+        await manager.handle_event({"document_id": "d1", "status": "queued", "machine_id": "m2", "user_id": "u1"})
+        await manager.handle_event({"document_id": "d2", "status": "queued", "machine_id": "m1", "user_id": None})
+        await _settle()
+
+        assert [m["document_id"] for m in everything.sent] == ["d1", "d2"]
+        assert [m["document_id"] for m in document.sent] == ["d1"]
+        assert [m["document_id"] for m in machine.sent] == ["d2"]
+        assert [m["document_id"] for m in user.sent] == ["d1"]
+        # Other users' ids are not broadcast
+        assert all("user_id" not in m for m in everything.sent)
+        await _disconnect_all(manager)
+
+    asyncio.run(scenario())
+
+def test_subscriptions_can_change_and_are_cleaned_up():
+    async def scenario():
+        manager = ConnectionManager()
+        websocket = FakeWebSocket()
+        subscriber = await manager.connect(websocket, ["document:d1"])
+        manager.subscribe(subscriber, ["document:d2"])
+        manager.unsubscribe(subscriber, ["document:d1"])
+        assert set(manager.topics) == {"document:d2"}
+
+        manager.disconnect(websocket)
+        await _settle()
+        assert manager.topics == {} and manager.active_connections == {}
+        assert subscriber.sender.cancelled()
+
+    asyncio.run(scenario())
+
+def test_slow_consumer_is_evicted_without_holding_up_the_others(monkeypatch):
+    monkeypatch.setattr(status_hub, "WS_SEND_QUEUE_SIZE", 2)
+
+    async def scenario():
+        manager = ConnectionManager()
+        slow, fast = FakeWebSocket(stalled=True), FakeWebSocket()
+        await manager.connect(slow)
+        await manager.connect(fast)
+
+        for index in range(5):
+            manager.publish(json.dumps({"document_id": str(index)}))
+            await _settle()
+
+        assert slow.closed_with == 1013
+        assert slow not in manager.active_connections and fast in manager.active_connections
+        assert [m["document_id"] for m in fast.sent] == ["0", "1", "2", "3", "4"]
+        await _disconnect_all(manager)
+
+    asyncio.run(scenario())
+
+def test_send_timeout_drops_the_connection(monkeypatch):
+    monkeypatch.setattr(status_hub, "WS_SEND_TIMEOUT_SECONDS", 0.01)
+
+    async def scenario():
+        manager = ConnectionManager()
+        stuck = FakeWebSocket(stalled=True)
+        await manager.connect(stuck)
+        manager.publish(json.dumps({"document_id": "d1"}))
+        await asyncio.sleep(0.05)
+        assert stuck.closed_with == 1013 and manager.active_connections == {}
+
+    asyncio.run(scenario())
+
+def test_disconnect_stops_the_sender_even_mid_send():
+    async def scenario():
+        manager = ConnectionManager()
+        websocket = FakeWebSocket()
+        subscriber = await manager.connect(websocket)
+        for index in range(3):
+            manager.publish(json.dumps({"document_id": str(index)}))
+            await asyncio.sleep(0)
+        # The sender is inside wait_for, where the cancel can be swallowed
+        manager.disconnect(websocket)
+        await asyncio.wait_for(asyncio.gather(subscriber.sender, return_exceptions=True), timeout=1)
+        assert subscriber.sender.done()
+
+    asyncio.run(scenario())
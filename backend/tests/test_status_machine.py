@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from conftest import run, add_document
+from models import PrintStatus
+from services.event_bus import event_bus
+from services.stats import stats_counters
+from services.status_machine import transition, InvalidTransition
+
+def test_transition_updates_status_history_and_version(db):
+    doc = add_document(db)
+    updated = run(transition(db, doc["_id"], PrintStatus.QUEUED, fields={"print_job_id": "job"}))
+
+    stored = run(db["documents"].find_one({"_id": doc["_id"]}))
+    assert stored["status"] == updated["status"] == PrintStatus.QUEUED
+    assert stored["print_job_id"] == updated["print_job_id"] == "job"
+    assert stored["version"] == updated["version"] == 2
+    assert [entry["status"] for entry in stored["status_history"]] == [PrintStatus.QUEUED]
+
+def test_illegal_transition_reports_current_status(db):
+    doc = add_document(db)
+    with pytest.raises(InvalidTransition) as error:
+        run(transition(db, doc["_id"], PrintStatus.COMPLETED))
+    assert error.value.current == PrintStatus.UPLOADED
+    assert run(db["documents"].find_one({"_id": doc["_id"]}))["status"] == PrintStatus.UPLOADED
+
+def test_transition_of_unknown_document(db):
+    with pytest.raises(InvalidTransition) as error:
+        run(transition(db, ObjectId(), PrintStatus.QUEUED))
+    assert error.value.current is None
+
+def test_expected_statuses_must_be_legal_sources(db):
+    doc = add_document(db)
+    with pytest.raises(ValueError):
+        run(transition(db, doc["_id"], PrintStatus.COMPLETED, expected=[PrintStatus.UPLOADED]))
+
+def test_concurrent_transitions_have_one_winner(db):
+    doc = add_document(db)
+
+    async def race():
+        return await asyncio.gather(
+            *[transition(db, doc["_id"], PrintStatus.QUEUED) for _ in range(5)],
+            return_exceptions=True
+        )
+
+    results = run(race())
+    winners = [result for result in results if isinstance(result, dict)]
+    losers = [result for result in results if isinstance(result, InvalidTransition)]
+    assert len(winners) == 1 and len(losers) == 4
+    assert all(loser.current == PrintStatus.QUEUED for loser in losers)
+    assert run(db["documents"].find_one({"_id": doc["_id"]}))["version"] == 2
+
+def test_print_twice_conflicts(client, db):
+    doc = add_document(db)
+    first = client.post("/print", json={"document_id": str(doc["_id"])})
+    assert first.status_code == 202
+    assert first.json()["status"] == PrintStatus.QUEUED
+
+    second = client.post("/print", json={"document_id": str(doc["_id"])})
+    assert second.status_code == 409
+    assert run(db["print_jobs"].count_documents({"document_id": doc["_id"]})) == 1
+
+def test_print_unknown_or_malformed_document(client):
+    assert client.post("/print", json={"document_id": str(ObjectId())}).status_code == 404
+    assert client.post("/print", json={"document_id": "not-an-id"}).status_code == 400
+
+def test_failed_side_effects_do_not_undo_a_committed_transition(client, db, monkeypatch):
+    async def publish(event):
+        raise ConnectionError("event bus unreachable")
+
+    async def record_transition(*args, **kwargs):
+        raise ConnectionError("stats unreachable")
+
+    monkeypatch.setattr(event_bus, "publish", publish)
+    monkeypatch.setattr(stats_counters, "record_transition", record_transition)
+    doc = add_document(db)
+
+    assert client.post("/print", json={"document_id": str(doc["_id"])}).status_code == 202
+    assert run(db["documents"].find_one({"_id": doc["_id"]}))["status"] == PrintStatus.QUEUED
+    assert run(db["print_jobs"].count_documents({"document_id": doc["_id"]})) == 1
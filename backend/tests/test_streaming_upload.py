@@ -0,0 +1,91 @@
+import io
+import os
+import hashlib
+import pytest
+from PIL import Image
+from conftest import run
+from services.streaming_upload import receive_upload, UploadError, MAX_FIELD_SIZE
+
+BOUNDARY = "test-boundary"
+ALLOWED = ["image/png", "application/pdf"]
+
+class FakeRequest:
+    """Just enough of a Starlette request for receive_upload, fed in fixed-size chunks."""
+
+    def __init__(self, body: bytes, chunk_size: int = 7, content_type: str = f"multipart/form-data; boundary={BOUNDARY}"):
+        self.headers = {"content-type": content_type, "content-length": str(len(body))}
+        self._body = body
+        self._chunk_size = chunk_size
+
+    async def stream(self):
+        for start in range(0, len(self._body), self._chunk_size):
+            yield self._body[start:start + self._chunk_size]
+
+def _png(size: int = 64) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+def _body(*parts) -> bytes:
+    """parts are (name, value) for fields or (name, filename, content) for files."""
+    body = b""
+    for part in parts:
+        body += f"--{BOUNDARY}\r\n".encode()
+        if len(part) == 2:
+            body += f'Content-Disposition: form-data; name="{part[0]}"\r\n\r\n{part[1]}\r\n'.encode()
+        else:
+            body += f'Content-Disposition: form-data; name="{part[0]}"; filename="{part[1]}"\r\n'.encode()
+            body += b"Content-Type: application/octet-stream\r\n\r\n" + part[2] + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+@pytest.fixture
+def dest(tmp_path):
+    return str(tmp_path / "upload.part")
+
+def _receive(body: bytes, dest: str, max_size: int = 1024 * 1024, **kwargs):
+    return run(receive_upload(FakeRequest(body, **kwargs), dest, max_size, ALLOWED))
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096, 1 << 20])
+def test_file_and_fields_survive_any_chunking(dest, chunk_size):
+    png = _png()
+    upload = _receive(_body(("copies", "3"), ("file", "photo.png", png), ("color_mode", "color")), dest, chunk_size=chunk_size)
+
+    assert upload.filename == "photo.png" and upload.mime_type == "image/png"
+    assert upload.size == len(png) and upload.sha256 == hashlib.sha256(png).hexdigest()
+    assert upload.fields == {"copies": "3", "color_mode": "color"}
+    assert open(dest, "rb").read() == png
+
+def test_files_shorter_than_the_sniff_window_are_typed_at_the_end(dest):
+    pdf = b"%PDF-1.4\n%%EOF\n"
+    upload = _receive(_body(("file", "tiny.pdf", pdf)), dest)
+    assert upload.mime_type == "application/pdf" and open(dest, "rb").read() == pdf
+
+def _rejected(body: bytes, dest: str, **kwargs) -> UploadError:
+    with pytest.raises(UploadError) as error:
+        _receive(body, dest, **kwargs)
+    assert not os.path.exists(dest)
+    return error.value
+
+def test_disallowed_type_is_rejected_and_removed(dest):
+    assert _rejected(_body(("file", "notes.txt", b"plain text " * 500)), dest).status_code == 400
+
+def test_size_limit_is_enforced_while_streaming(dest):
+    png = _png(256)
+    error = _rejected(_body(("file", "big.png", png)), dest, max_size=len(png) - 1)
+    assert error.status_code == 413
+
+def test_declared_oversized_body_is_refused_before_reading(dest):
+    request = FakeRequest(b"")
+    request.headers["content-length"] = str(10 + MAX_FIELD_SIZE + 1)
+    with pytest.raises(UploadError) as error:
+        run(receive_upload(request, dest, 10, ALLOWED))
+    assert error.value.status_code == 413
+
+@pytest.mark.parametrize("body, kwargs", [
+    (_body(("copies", "1")), {}),
+    (_body(("file", "a.png", _png()), ("file", "b.png", _png())), {}),
+    (b"not multipart", {"content_type": "application/octet-stream"}),
+    (_body(("field", "x" * (MAX_FIELD_SIZE + 1))), {"chunk_size": 4096}),
+])
+def test_malformed_requests_are_rejected(dest, body, kwargs):
+    assert _rejected(body, dest, **kwargs).status_code in (400, 413)
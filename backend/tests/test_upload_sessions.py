@@ -0,0 +1,118 @@
+import io
+import os
+from datetime import datetime
+import pytest
+from PIL import Image
+from conftest import run
+from services.blob_store import BLOB_DIR, blob_store
+from services.upload_sessions import session_sweeper
+
+def _png() -> bytes:
+    # Noise does not compress, so the file spans several chunks
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def png():
+    return _png()
+
+def _create(client, size: int, **options) -> str:
+    response = client.post("/upload/sessions", json={"filename": "photo.png", "file_size": size, **options})
+    assert response.status_code == 201
+    assert response.json()["received"] == 0
+    return response.json()["session_id"]
+
+def _put(client, session_id: str, offset: int, body: bytes):
+    return client.put(f"/upload/sessions/{session_id}", params={"offset": offset}, content=body)
+
+def test_chunks_resume_from_the_reported_offset(client, png):
+    session_id = _create(client, len(png), copies=2)
+
+    response = _put(client, session_id, 0, png[:5000])
+    assert response.status_code == 200 and response.json()["received"] == 5000
+    assert client.get(f"/upload/sessions/{session_id}").json()["received"] == 5000
+
+    response = _put(client, session_id, 5000, png[5000:])
+    assert response.json()["received"] == len(png)
+
+    document = client.post(f"/upload/sessions/{session_id}/finalize")
+    assert document.status_code == 200
+    assert document.json()["file_size"] == len(png)
+    assert document.json()["page_count"] == 1
+    assert document.json()["print_options"]["copies"] == 2
+    assert client.get(f"/upload/sessions/{session_id}").status_code == 404
+
+@pytest.mark.parametrize("offset", [0, 4000, 6000])
+def test_chunk_at_the_wrong_offset_conflicts(client, png, offset):
+    session_id = _create(client, len(png))
+    _put(client, session_id, 0, png[:5000])
+
+    response = _put(client, session_id, offset, png[offset:offset + 1000])
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "5000"
+    assert client.get(f"/upload/sessions/{session_id}").json()["received"] == 5000
+
+def test_finalize_before_the_last_chunk_conflicts(client, png):
+    session_id = _create(client, len(png))
+    _put(client, session_id, 0, png[:5000])
+
+    response = client.post(f"/upload/sessions/{session_id}/finalize")
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "5000"
+
+def test_chunk_past_the_declared_size_is_rejected(client, png):
+    session_id = _create(client, 3000)
+    assert _put(client, session_id, 0, png[:4000]).status_code == 413
+    assert client.get(f"/upload/sessions/{session_id}").json()["received"] == 0
+
+def test_chunks_shorter_than_the_sniff_window_are_kept(client, png):
+    session_id = _create(client, len(png))
+    offset = 0
+    for size in [100, 900, 1000, 1000]:
+        response = _put(client, session_id, offset, png[offset:offset + size])
+        offset += size
+        assert response.status_code == 200 and response.json()["received"] == offset
+    _put(client, session_id, offset, png[offset:])
+
+    document = client.post(f"/upload/sessions/{session_id}/finalize")
+    assert document.status_code == 200
+    assert document.json()["file_type"] == "image/png"
+    with open(os.path.join(BLOB_DIR, document.json()["filename"][:2], document.json()["filename"]), "rb") as f:
+        assert f.read() == png
+
+def test_short_chunks_are_sniffed_once_enough_arrived(client):
+    session_id = _create(client, 4096)
+    assert _put(client, session_id, 0, b"#!/bin/sh\n" + b"x" * 990).json()["received"] == 1000
+    assert _put(client, session_id, 1000, b"x" * 1500).status_code == 400
+
+def test_disallowed_file_type_is_rejected(client):
+    session_id = _create(client, 4096)
+    assert _put(client, session_id, 0, b"#!/bin/sh\n" + b"x" * 4086).status_code == 400
+
+def test_invalid_page_range_is_rejected_up_front(client):
+    response = client.post("/upload/sessions", json={"filename": "a.pdf", "file_size": 10, "page_range": "5-2"})
+    assert response.status_code == 422
+
+def test_failed_finalize_removes_the_partial_file(client, db, png, monkeypatch):
+    session_id = _create(client, len(png))
+    _put(client, session_id, 0, png)
+    temp_path = run(db["upload_sessions"].find_one({"_id": session_id}))["temp_path"]
+
+    async def commit(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(blob_store, "commit", commit)
+    with pytest.raises(OSError):
+        client.post(f"/upload/sessions/{session_id}/finalize")
+    assert not os.path.exists(temp_path)
+
+def test_sweep_removes_expired_sessions(client, db, png):
+    expired, live = _create(client, len(png)), _create(client, len(png))
+    run(db["upload_sessions"].update_one({"_id": expired}, {"$set": {"expires_at": datetime(2000, 1, 1)}}))
+    temp_path = run(db["upload_sessions"].find_one({"_id": expired}))["temp_path"]
+
+    assert run(session_sweeper.sweep(db)) == 1
+    assert not os.path.exists(temp_path)
+    assert client.get(f"/upload/sessions/{expired}").status_code == 404
+    assert client.get(f"/upload/sessions/{live}").status_code == 200
@@ -0,0 +1,51 @@
+import io
+import pytest
+from PIL import Image
+from conftest import run, add_document
+from services import admission
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (20, 20), "blue").save(buffer, "PNG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def token(client):
+    client.post("/user/register", json={"name": "Ada", "email": "ada@example.com", "password": "secret-pass"})
+    response = client.post("/user/login", data={"username": "ada@example.com", "password": "secret-pass"})
+    return response.json()["access_token"]
+
+def _upload(client, token: str = None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return client.post("/upload", files={"file": ("a.png", _png(), "image/png")}, headers=headers)
+
+def test_signed_in_uploads_are_listed_under_my_documents(client, token):
+    mine = _upload(client, token)
+    assert mine.status_code == 200 and mine.json()["user_id"]
+    assert _upload(client).json()["user_id"] is None
+
+    listing = client.get("/user/my-documents", headers={"Authorization": f"Bearer {token}"})
+    assert [document["_id"] for document in listing.json()["documents"]] == [mine.json()["_id"]]
+
+def test_resumable_upload_keeps_the_uploader(client, token):
+    png = _png()
+    created = client.post(
+        "/upload/sessions", json={"filename": "a.png", "file_size": len(png)},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    session_id = created.json()["session_id"]
+    client.put(f"/upload/sessions/{session_id}", params={"offset": 0}, content=png)
+    document = client.post(f"/upload/sessions/{session_id}/finalize")
+    assert document.json()["user_id"] == _upload(client, token).json()["user_id"]
+
+def test_invalid_token_is_rejected_rather_than_ignored(client):
+    assert _upload(client, "not-a-token").status_code == 401
+
+def test_per_user_quota_applies_to_signed_in_uploads(client, db, token, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_USER_MAX_PAGES", 1)
+    first, second = _upload(client, token).json(), _upload(client, token).json()
+
+    assert client.post("/print", json={"document_id": first["_id"]}).status_code == 202
+    response = client.post("/print", json={"document_id": second["_id"]})
+    assert response.status_code == 429
+    assert "user" in response.json()["detail"]
@@ -34,7 +34,7 @@ const Status: React.FC = () => {
 
     // WebSocket Connection
     useEffect(() => {
-        const ws = new WebSocket('ws://localhost:8000/ws/status');
+        const ws = new WebSocket(`ws://localhost:8000/ws/status?document_id=${id}`);
 
         ws.onmessage = (event) => {
             const data = JSON.parse(event.data);
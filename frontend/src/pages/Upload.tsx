@@ -45,6 +45,10 @@ const Upload: React.FC = () => {
         setIsUploading(true);
         setError(null);
 
+        // Signed-in users find their uploads under My Documents
+        const token = localStorage.getItem('user_token');
+        const config = token ? { headers: { Authorization: `Bearer ${token}` } } : undefined;
+
         try {
             if (mergeFiles && files.length > 1) {
                 // Merge multiple files
@@ -54,7 +58,7 @@ const Upload: React.FC = () => {
                 formData.append('color_mode', colorMode);
                 if (machineId) formData.append('machine_id', machineId);
 
-                const response = await axios.post('http://localhost:8000/merge-and-upload', formData);
+                const response = await axios.post('http://localhost:8000/merge-and-upload', formData, config);
                 navigate(`/status/${response.data._id}`);
             } else {
                 // Upload single file or multiple separate files
@@ -64,7 +68,7 @@ const Upload: React.FC = () => {
                 formData.append('color_mode', colorMode);
                 if (machineId) formData.append('machine_id', machineId);
 
-                const response = await axios.post('http://localhost:8000/upload', formData);
+                const response = await axios.post('http://localhost:8000/upload', formData, config);
                 navigate(`/status/${response.data._id}`);
             }
         } catch (err: any) {